@@ -1,16 +1,22 @@
 import streamlit as st
 import pandas as pd
 import re
-import os
-from datetime import datetime
-import io
-
-# Set page config
-st.set_page_config(
-    page_title="Excel Phone Data Processor", 
-    page_icon="📞", 
-    layout="wide"
+import itertools
+
+from file_io import (
+    INPUT_TYPES, OUTPUT_FORMATS, STREAM_CHUNK_ROWS, ZIP_MIME, estimate_excel_rows, excel_info, excel_sheets,
+    ingest_types, iter_excel_chunks, iter_sheets, outputs_zip, phone_output_names, place_partitions, preview_excel,
+    qa_report_export, read_excel_cached, selected_sheet_positions, sheet_file_names, stage_uploads, table_export
 )
+from consolidation import consolidate_owners, consolidation_summary, parcel_rows
+from dedup_index import index_stats, match_key, record_on_download
+from jobs import current_job, detached_upload, remember_job, show_job
+from instrumentation import METRICS_MIME, finish_run, metrics_frame, metrics_json, stage, stage_chunks, start_run
+from phone_engine import classify_phones, combine_split_parts, sum_phone_counts
+from pipeline import consolidate_outputs, consolidate_step, run_pipeline, scrub_step, set_aside_exported
+from results import download_data, job_weights, run_key, show_export_time, submit_run
+from sharding import APP_SHARDS, map_shards, row_shards, shard_plan, shard_slot
+from suppression import load_suppression
 
 # ---------- CONFIGURATION ----------
 phone_columns = [
@@ -25,6 +31,37 @@ phone_columns = [
 allowed_types = ['mobile', 'voip']
 landline_types = ['landline', 'pager', 'specialservice']
 
+# Columns that repeat a handful of labels, loaded as categoricals
+category_columns = [type_col for _, type_col in phone_columns] + [
+    'Mail City', 'Mail State', 'Parcel City', 'Parcel State', 'Parcel County'
+]
+
+# Rough share of the work in each stage (see benchmark.py), so the progress bar follows the work done
+stage_weights = {
+    'read': 40, 'scrub': 1, 'classify': 4, 'extract': 2, 'build output': 3, 'dedup': 1, 'consolidate': 1, 'qa': 1,
+    'write': 50
+}
+
+# FIXED: Column mapping without spaces to match Launch Control template
+column_mapping = {
+    'Owner 1 First Name': 'FirstName',
+    'Owner 1 Last Name': 'LastName',
+    'Mail Full Address': 'MailingAddress',
+    'Mail City': 'MailingCity',
+    'Mail State': 'MailingState',
+    'Mail Zip': 'MailingZip',
+    'Parcel Full Address': 'PropertyAddress',
+    'Parcel City': 'PropertyCity',
+    'Parcel State': 'PropertyState',
+    'Parcel Zip': 'PropertyZip',
+    'APN': 'APN',
+    'Parcel County': 'PropertyCounty',
+    'Lot Acres': 'Acreage'
+}
+
+# Entity owners (utilities, governments, churches...) are matched on the full owner name
+owner_column = 'Owner 1 Full Name'
+
 # ---------- HELPER FUNCTIONS ----------
 def normalize_phone(phone):
     if pd.isnull(phone) or phone == '':
@@ -101,221 +138,287 @@ def has_valid_phones(row):
     return False
 
 def get_match_key(row):
-    apn = str(row.get('APN', '')).strip() if pd.notnull(row.get('APN')) else ''
-    if apn and apn != 'nan':
-        return apn
-    else:
-        full = str(row.get('Owner 1 Full Name', '')).strip()
-        first = str(row.get('Owner 1 First Name', '')).strip()
-        last = str(row.get('Owner 1 Last Name', '')).strip()
-        
-        if full and full != 'nan':
-            return full
-        else:
-            name = f"{first} {last}".strip()
-            return name if name != ' ' else 'NO_NAME'
+    """Dedup key of one input row: APN (within its county), else owner full name, else first + last name.
 
-def process_excel_file(df):
-    """Main processing function with progress tracking"""
-    
+    None for rows with neither; dedup_index.match_keys builds the same keys for whole frames.
+    """
+    return match_key(
+        row.get('APN'), row.get('Owner 1 Full Name'), row.get('Owner 1 First Name'), row.get('Owner 1 Last Name'),
+        row.get('Parcel State'), row.get('Parcel County')
+    )
+
+def streamlit_progress():
+    """Progress callback that drives a Streamlit progress bar and status line"""
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    # Step 1: Identify rows with valid phones
-    status_text.text("🔍 Identifying rows with mobile/voip phones...")
-    progress_bar.progress(10)
-    
-    has_phones_results = []
-    for idx, row in df.iterrows():
-        has_phones_results.append(has_valid_phones(row))
-        if (idx + 1) % 1000 == 0:
-            status_text.text(f"🔍 Processed {idx + 1:,} rows...")
-    
-    has_phones_mask = pd.Series(has_phones_results, index=df.index)
-    rows_with_phones = df[has_phones_mask].copy()
-    rows_without_phones = df[~has_phones_mask].copy()
-    
-    st.info(f"📱 Found {len(rows_with_phones):,} rows with mobile/voip phones")
-    st.info(f"📞 Found {len(rows_without_phones):,} rows without mobile/voip phones")
-    
-    progress_bar.progress(30)
-    
-    # Step 2: Process cleaned file
-    status_text.text("📱 Processing cleaned file...")
-    
-    df_final = pd.DataFrame()
-    if not rows_with_phones.empty:
-        phones_results = []
-        for idx, row in rows_with_phones.iterrows():
-            phones_results.append(extract_valid_phones(row))
-            if len(phones_results) % 500 == 0:
-                status_text.text(f"📱 Extracted phones from {len(phones_results):,} rows...")
-        
-        phones_df = pd.DataFrame(phones_results, index=rows_with_phones.index)
-        df_with_phones = pd.concat([rows_with_phones, phones_df], axis=1)
-        df_with_phones = df_with_phones.dropna(subset=['Phone1'])
-        
-        # FIXED: Column mapping without spaces to match Launch Control template
-        column_mapping = {
-            'Owner 1 First Name': 'FirstName',
-            'Owner 1 Last Name': 'LastName',
-            'Mail Full Address': 'MailingAddress',
-            'Mail City': 'MailingCity',
-            'Mail State': 'MailingState',
-            'Mail Zip': 'MailingZip',
-            'Parcel Full Address': 'PropertyAddress',
-            'Parcel City': 'PropertyCity',
-            'Parcel State': 'PropertyState',
-            'Parcel Zip': 'PropertyZip',
-            'APN': 'APN',
-            'Parcel County': 'PropertyCounty',
-            'Lot Acres': 'Acreage'
-        }
-        
-        available_cols = [col for col in column_mapping.keys() if col in df_with_phones.columns]
-        phone_cols = ['Phone1', 'Phone2', 'Phone3']
-        selected_cols = available_cols + phone_cols
-        
-        df_cleaned = df_with_phones[selected_cols].copy()
-        df_cleaned = df_cleaned.rename(columns=column_mapping)
-        
-        # Handle names - FIXED: Using column names without spaces
-        df_cleaned['FirstName'] = df_cleaned.get('FirstName', pd.Series(dtype=object)).fillna('')
-        df_cleaned['LastName'] = df_cleaned.get('LastName', pd.Series(dtype=object)).fillna('')
-        
-        if 'Owner 1 Full Name' in df_with_phones.columns:
-            mask = (df_cleaned['FirstName'] == '') & (df_cleaned['LastName'] == '')
-            if mask.any():
-                df_cleaned.loc[mask, 'FirstName'] = df_with_phones.loc[mask, 'Owner 1 Full Name'].fillna('')
-        
-        # FIXED: Add required Email column for Launch Control
-        df_cleaned['Email'] = ''
-        
-        # FIXED: Final columns to match Launch Control template exactly
-        final_columns = [
-            'FirstName', 'LastName', 'Email', 'MailingAddress', 'MailingCity', 'MailingState', 'MailingZip',
-            'PropertyAddress', 'PropertyCity', 'PropertyState', 'PropertyZip',
-            'Phone1', 'Phone2', 'Phone3', 'APN', 'PropertyCounty', 'Acreage'
-        ]
-        
-        for col in final_columns:
-            if col not in df_cleaned.columns:
-                df_cleaned[col] = ''
-        
-        df_final = df_cleaned[final_columns]
+    def update(percent, message):
+        progress_bar.progress(percent)
+        status_text.text(message)
     
-    progress_bar.progress(60)
+    return update
+
+def input_columns(columns=None):
+    """Columns of an upload the processor reads, in file order (all it can read when the columns are unknown)"""
+    needed = [col for pair in phone_columns for col in pair] + list(column_mapping) + [owner_column]
+    if columns is None:
+        return needed
+    return [col for col in columns if col in set(needed)]
+
+def typed_input(df):
+    """Typed ingestion: phone columns as strings, line types and places as categoricals"""
+    return ingest_types(df, [phone_col for phone_col, _ in phone_columns], category_columns)
+
+def split_phone_rows(df, metrics, suppressed=None):
+    """Build the cleaned and discard layouts of a frame; returns both plus its per-row QA counters and missing phones"""
     
-    # Step 3: Process discard file
-    status_text.text("📞 Processing discard file...")
+    # Step 1: Identify rows with valid phones
+    with stage(metrics, 'classify', len(df), "🔍 Identifying rows with mobile/voip phones...") as tick:
+        classified = classify_phones(
+            df, phone_columns, allowed_types, landline_types, tick=tick, suppressed=suppressed
+        )
+    has_phones_mask = classified['has_mobile']
     
-    df_discards_final = pd.DataFrame()
-    if not rows_without_phones.empty:
-        landlines_results = []
-        for idx, row in rows_without_phones.iterrows():
-            landlines_results.append(extract_landlines_with_types(row))
-            if len(landlines_results) % 500 == 0:
-                status_text.text(f"📞 Extracted landlines from {len(landlines_results):,} rows...")
+    # Step 2: Split the rows and attach their phone picks
+    with stage(metrics, 'extract', len(df), "✂️ Splitting rows by phone type..."):
+        rows_with_phones = df[has_phones_mask].copy()
+        rows_without_phones = df[~has_phones_mask].copy()
         
-        landlines_df = pd.DataFrame(landlines_results, index=rows_without_phones.index)
-        df_discards_combined = pd.concat([rows_without_phones, landlines_df], axis=1)
+        if not rows_with_phones.empty:
+            phones_df = classified['phones'][has_phones_mask]
+            df_with_phones = pd.concat([rows_with_phones, phones_df], axis=1)
+            df_with_phones = df_with_phones.dropna(subset=['Phone1'])
         
-        # Apply same column mapping - FIXED: No spaces in column names
-        available_cols = [col for col in column_mapping.keys() if col in df_discards_combined.columns]
-        phone_cols_discard = ['Phone1', 'Phone2', 'Phone3', 'Phone4', 'Phone5']
-        phone_type_cols = ['Phone1_Type', 'Phone2_Type', 'Phone3_Type', 'Phone4_Type', 'Phone5_Type']
-        df_discards_formatted = df_discards_combined[available_cols + phone_cols_discard + phone_type_cols].copy()
-        df_discards_formatted = df_discards_formatted.rename(columns=column_mapping)
-        
-        # Handle names - FIXED: Using column names without spaces
-        df_discards_formatted['FirstName'] = df_discards_formatted.get('FirstName', pd.Series(dtype=object)).fillna('')
-        df_discards_formatted['LastName'] = df_discards_formatted.get('LastName', pd.Series(dtype=object)).fillna('')
-        
-        if 'Owner 1 Full Name' in rows_without_phones.columns:
-            mask_np = (df_discards_formatted['FirstName'] == '') & (df_discards_formatted['LastName'] == '')
-            if mask_np.any():
-                df_discards_formatted.loc[mask_np, 'FirstName'] = rows_without_phones.loc[mask_np, 'Owner 1 Full Name'].fillna('')
-        
-        # FIXED: Add Email column to discard file too
-        df_discards_formatted['Email'] = ''
+        if not rows_without_phones.empty:
+            landlines_df = classified['landlines'][~has_phones_mask]
+            df_discards_combined = pd.concat([rows_without_phones, landlines_df], axis=1)
+    
+    # Step 3: Build the cleaned and discard layouts
+    with stage(
+        metrics, 'build output', len(df),
+        f"📱 Building cleaned ({len(rows_with_phones):,} rows) and discard ({len(rows_without_phones):,} rows) files..."
+    ):
+        df_final = pd.DataFrame()
+        if not rows_with_phones.empty:
+            available_cols = [col for col in column_mapping.keys() if col in df_with_phones.columns]
+            phone_cols = ['Phone1', 'Phone2', 'Phone3']
+            selected_cols = available_cols + phone_cols
+            
+            df_cleaned = df_with_phones[selected_cols].copy()
+            df_cleaned = df_cleaned.rename(columns=column_mapping)
+            
+            # Handle names - FIXED: Using column names without spaces
+            df_cleaned['FirstName'] = df_cleaned.get('FirstName', pd.Series(dtype=object)).fillna('')
+            df_cleaned['LastName'] = df_cleaned.get('LastName', pd.Series(dtype=object)).fillna('')
+            
+            if 'Owner 1 Full Name' in df_with_phones.columns:
+                mask = (df_cleaned['FirstName'] == '') & (df_cleaned['LastName'] == '')
+                if mask.any():
+                    df_cleaned.loc[mask, 'FirstName'] = df_with_phones.loc[mask, 'Owner 1 Full Name'].fillna('')
+            
+            # FIXED: Add required Email column for Launch Control
+            df_cleaned['Email'] = ''
+            
+            # FIXED: Final columns to match Launch Control template exactly
+            final_columns = [
+                'FirstName', 'LastName', 'Email', 'MailingAddress', 'MailingCity', 'MailingState', 'MailingZip',
+                'PropertyAddress', 'PropertyCity', 'PropertyState', 'PropertyZip',
+                'Phone1', 'Phone2', 'Phone3', 'APN', 'PropertyCounty', 'Acreage'
+            ]
+            
+            for col in final_columns:
+                if col not in df_cleaned.columns:
+                    df_cleaned[col] = ''
+            
+            df_final = df_cleaned[final_columns]
         
-        # FIXED: Column names without spaces and including Email
-        ordered_discard_columns = [
-            'FirstName', 'LastName', 'Email', 'MailingAddress', 'MailingCity', 'MailingState', 'MailingZip',
-            'PropertyAddress', 'PropertyCity', 'PropertyState', 'PropertyZip',
-            'Phone1', 'Phone1_Type', 'Phone2', 'Phone2_Type', 'Phone3', 'Phone3_Type', 
-            'Phone4', 'Phone4_Type', 'Phone5', 'Phone5_Type', 'APN', 'PropertyCounty', 'Acreage'
-        ]
+        df_discards_final = pd.DataFrame()
+        if not rows_without_phones.empty:
+            # Apply same column mapping - FIXED: No spaces in column names
+            available_cols = [col for col in column_mapping.keys() if col in df_discards_combined.columns]
+            phone_cols_discard = ['Phone1', 'Phone2', 'Phone3', 'Phone4', 'Phone5']
+            phone_type_cols = ['Phone1_Type', 'Phone2_Type', 'Phone3_Type', 'Phone4_Type', 'Phone5_Type']
+            df_discards_formatted = df_discards_combined[available_cols + phone_cols_discard + phone_type_cols].copy()
+            df_discards_formatted = df_discards_formatted.rename(columns=column_mapping)
+            
+            # Handle names - FIXED: Using column names without spaces
+            df_discards_formatted['FirstName'] = df_discards_formatted.get('FirstName', pd.Series(dtype=object)).fillna('')
+            df_discards_formatted['LastName'] = df_discards_formatted.get('LastName', pd.Series(dtype=object)).fillna('')
+            
+            if 'Owner 1 Full Name' in rows_without_phones.columns:
+                mask_np = (df_discards_formatted['FirstName'] == '') & (df_discards_formatted['LastName'] == '')
+                if mask_np.any():
+                    df_discards_formatted.loc[mask_np, 'FirstName'] = rows_without_phones.loc[mask_np, 'Owner 1 Full Name'].fillna('')
+            
+            # FIXED: Add Email column to discard file too
+            df_discards_formatted['Email'] = ''
+            
+            # FIXED: Column names without spaces and including Email
+            ordered_discard_columns = [
+                'FirstName', 'LastName', 'Email', 'MailingAddress', 'MailingCity', 'MailingState', 'MailingZip',
+                'PropertyAddress', 'PropertyCity', 'PropertyState', 'PropertyZip',
+                'Phone1', 'Phone1_Type', 'Phone2', 'Phone2_Type', 'Phone3', 'Phone3_Type', 
+                'Phone4', 'Phone4_Type', 'Phone5', 'Phone5_Type', 'APN', 'PropertyCounty', 'Acreage'
+            ]
+            
+            for col in ordered_discard_columns:
+                if col not in df_discards_formatted.columns:
+                    df_discards_formatted[col] = ''
+            
+            df_discards_final = df_discards_formatted[ordered_discard_columns]
         
-        for col in ordered_discard_columns:
-            if col not in df_discards_formatted.columns:
-                df_discards_formatted[col] = ''
+        df_missing = missing_phone_details(df, classified['missing'])
+    
+    return df_final, df_discards_final, classified['counts'], df_missing
+
+def split_shard(df, suppressed=None):
+    """Worker: split_phone_rows of one row shard, timed in a run of its own"""
+    return split_phone_rows(df, start_run(lambda percent, message: None, {}, len(df)), suppressed)
+
+def split_rows(df, metrics, suppressed=None, shards=None, workers=None):
+    """split_phone_rows of a frame, over row shards in worker processes when asked for and it is large enough.
+
+    Shard outputs and per-row QA counters are put back in row order, so the
+    result is the same as a serial split_phone_rows. While another split of
+    this process is sharded, this one runs serially (see shard_slot).
+    """
+    with shard_slot(shard_plan(len(df), shards, workers)) as plan:
+        if plan is None:
+            return split_phone_rows(df, metrics, suppressed)
+        shards, workers = plan
         
-        df_discards_final = df_discards_formatted[ordered_discard_columns]
+        parts = []
+        with stage(
+            metrics, 'classify', len(df), f"🔍 Classifying {len(df):,} rows in {shards} shards on {workers} cores..."
+        ) as tick:
+            for part in map_shards(__file__, 'split_shard', row_shards(df, shards), (suppressed,), workers):
+                parts.append(part)
+                tick(len(parts), shards)
+        return combine_split_parts(parts)
+
+def processing_run(progress, total_rows=None):
+    """Metrics for a processing call made without a run of its own (no read or write stages)"""
+    if progress is None:
+        progress = streamlit_progress()
+    weights = {name: weight for name, weight in stage_weights.items() if name not in ('read', 'scrub', 'write')}
+    return start_run(progress, weights, total_rows)
+
+def phone_outputs(df, metrics, skip_exported=False, suppressed=None, scrubbed_df=None, shards=None, workers=None,
+                  record_as=None):
+    """Cleaned, discard, previous, QA summary/details and per-row QA counters ('phone_counts') of a frame's rows.
+
+    Large frames are split in `shards` row shards on `workers` processes
+    (see sharding.py; serial unless shards are asked for, and below SHARD_MIN_ROWS rows).
+    With skip_exported and record_as, the new contacts are recorded as
+    exported from record_as as they are checked (see set_aside_exported).
+    """
+    df_final, df_discards_final, phone_counts, df_missing = split_rows(df, metrics, suppressed, shards, workers)
     
-    progress_bar.progress(90)
+    df_final, df_previous = set_aside_exported(df_final, metrics, skip_exported, record_as)
     
     # Step 4: Generate QA report
-    status_text.text("📊 Generating QA report...")
-    qa_summary, qa_details = generate_qa_data(df, df_final, df_discards_final)
+    with stage(metrics, 'qa', len(df), "📊 Generating QA report..."):
+        qa_summary, qa_details = generate_qa_data(
+            df, df_final, df_discards_final, phone_stats=sum_phone_counts(phone_counts),
+            previous_df=df_previous if skip_exported else None, missing_df=df_missing, scrubbed_df=scrubbed_df
+        )
+    
+    return {
+        'cleaned': df_final, 'discard': df_discards_final, 'previous': df_previous,
+        'qa_summary': qa_summary, 'qa_details': qa_details, 'phone_counts': phone_counts,
+    }
+
+def process_excel_file(df, progress=None, metrics=None, skip_exported=False, suppressed=None, scrubbed_df=None,
+                       shards=None, workers=None, record_as=None):
+    """Main processing function with progress tracking; scrubbed_df holds entity rows dropped beforehand (see phone_outputs)"""
+    
+    own_run = metrics is None
+    if own_run:
+        metrics = processing_run(progress, len(df))
     
-    progress_bar.progress(100)
-    status_text.text("✅ Processing complete!")
+    outputs = phone_outputs(df, metrics, skip_exported, suppressed, scrubbed_df, shards, workers, record_as)
     
-    return df_final, df_discards_final, qa_summary, qa_details
+    if own_run:
+        finish_run(metrics, "✅ Processing complete!")
+    
+    return tuple(outputs[name] for name in ('cleaned', 'discard', 'qa_summary', 'qa_details', 'previous'))
 
-def generate_qa_data(original_df, cleaned_df, discard_df):
-    """Generate QA report data"""
+def process_excel_chunks(chunks, progress=None, total_rows=None, metrics=None, skip_exported=False,
+                         suppressed=None, record_as=None):
+    """Chunked process_excel_file: outputs and QA counters are built up one chunk at a time"""
     
-    # Count phone types in original data
-    phone_type_counts = {}
-    total_phones_original = 0
+    own_run = metrics is None
+    if own_run:
+        metrics = processing_run(progress, total_rows)
     
-    for phone_col, type_col in phone_columns:
-        if phone_col in original_df.columns and type_col in original_df.columns:
-            for idx, row in original_df.iterrows():
-                phone = normalize_phone(row[phone_col])
-                phone_type = str(row[type_col]).strip() if pd.notnull(row[type_col]) else ''
-                if phone and phone_type:
-                    total_phones_original += 1
-                    if phone_type not in phone_type_counts:
-                        phone_type_counts[phone_type] = 0
-                    phone_type_counts[phone_type] += 1
-    
-    # Count mobile phones in discard file
-    discard_mobile_contacts = 0
-    discard_mobile_phones = 0
+    df_final, df_discards_final, phone_counts, df_missing = combine_split_parts(
+        [split_phone_rows(chunk, metrics, suppressed) for chunk in chunks]
+    )
+    phone_stats = sum_phone_counts(phone_counts)
     
-    if not discard_df.empty:
-        for idx, row in discard_df.iterrows():
-            contact_has_mobile = False
-            for i in range(1, 6):  # Phone1 through Phone5
-                phone_col = f'Phone{i}'
-                type_col = f'Phone{i}_Type'
-                
-                if phone_col in discard_df.columns and type_col in discard_df.columns:
-                    phone = row.get(phone_col)
-                    phone_type = str(row.get(type_col, '')).strip()
-                    
-                    if pd.notnull(phone) and phone != '' and phone_type.lower() == 'mobile':
-                        discard_mobile_phones += 1
-                        contact_has_mobile = True
-            
-            if contact_has_mobile:
-                discard_mobile_contacts += 1
+    df_final, df_previous = set_aside_exported(df_final, metrics, skip_exported, record_as)
+    
+    with stage(metrics, 'qa', phone_stats['total_rows'], "📊 Generating QA report..."):
+        qa_summary, qa_details = generate_qa_data(
+            None, df_final, df_discards_final, phone_stats=phone_stats,
+            previous_df=df_previous if skip_exported else None, missing_df=df_missing
+        )
+    
+    if own_run:
+        finish_run(metrics, "✅ Processing complete!")
     
-    # Calculate unique contacts processed
-    cleaned_contacts = len(cleaned_df) if not cleaned_df.empty else 0
+    return df_final, df_discards_final, qa_summary, qa_details, df_previous
+
+def count_phone_stats(original_df):
+    """QA counters of a frame processed without them, from the same classify_phones pass a run makes"""
+    return classify_phones(original_df, phone_columns, allowed_types, landline_types)['stats']
+
+def missing_phone_details(df, missing):
+    """Missing Phones rows: each contact's name and APN around the mobile/VoIP numbers it did not export"""
+    names = pd.DataFrame(index=missing.index)
+    for col in ['Owner 1 First Name', 'Owner 1 Last Name', 'APN']:
+        names[column_mapping[col]] = df.loc[missing.index, col].fillna('') if col in df.columns else ''
+    phone_cols = [col for col in missing.columns if col != 'Reason']
+    return pd.concat(
+        [names[['FirstName', 'LastName']], missing[phone_cols], names[['APN']], missing[['Reason']]], axis=1
+    )
+
+def generate_qa_data(original_df, cleaned_df, discard_df, phone_stats=None, previous_df=None, missing_df=None,
+                     scrubbed_df=None):
+    """Generate QA report data"""
+    
+    # Counters come from the run's classification pass, else from the same pass over the original rows
+    if phone_stats is None:
+        phone_stats = count_phone_stats(original_df)
+    
+    phone_type_counts = phone_stats['phone_type_counts']
+    total_phones_original = phone_stats['total_phones']
+    discard_mobile_contacts = phone_stats['discard_mobile_contacts']
+    discard_mobile_phones = phone_stats['discard_mobile_phones']
+    # Entity rows scrubbed before phone processing were in the original file too
+    scrubbed_contacts = len(scrubbed_df) if scrubbed_df is not None else 0
+    total_original = phone_stats['total_rows'] + scrubbed_contacts
+    
+    # Calculate unique contacts processed (a consolidated owner counts each of its parcels)
+    cleaned_contacts = parcel_rows(cleaned_df) if not cleaned_df.empty else 0
     discard_contacts = len(discard_df) if not discard_df.empty else 0
-    total_processed = cleaned_contacts + discard_contacts
+    previous_contacts = len(previous_df) if previous_df is not None else 0
+    total_processed = cleaned_contacts + discard_contacts + previous_contacts + scrubbed_contacts
     
     # Create summary data
     summary_data = [
-        ['Total Contacts in Original File', f"{len(original_df):,}"],
+        ['Total Contacts in Original File', f"{total_original:,}"],
         ['Contacts in Cleaned File', f"{cleaned_contacts:,}"],
         ['Contacts in Discard File', f"{discard_contacts:,}"],
+    ]
+    # Only runs that checked the dedup index report previously exported contacts
+    if previous_df is not None:
+        summary_data.append(['Contacts Previously Exported', f"{previous_contacts:,}"])
+    if scrubbed_df is not None:
+        summary_data.append(['Contacts Scrubbed (Entity Owners)', f"{scrubbed_contacts:,}"])
+    summary_data += [
         ['Total Contacts Processed', f"{total_processed:,}"],
-        ['Contact Count Verification', '✅ MATCH' if len(original_df) == total_processed else '❌ MISMATCH'],
+        ['Contact Count Verification', '✅ MATCH' if total_original == total_processed else '❌ MISMATCH'],
         ['', ''],
         ['Total Phone Numbers (All Types)', f"{total_phones_original:,}"],
     ]
@@ -329,16 +432,492 @@ def generate_qa_data(original_df, cleaned_df, discard_df):
         ['Contacts with Mobile Phones in Discard File', f"{discard_mobile_contacts:,}"],
         ['Total Mobile Phone Numbers in Discard File', f"{discard_mobile_phones:,}"],
     ])
+    if missing_df is not None:
+        missing_phones = int(missing_df.filter(like='Phone ').notna().to_numpy().sum())
+        summary_data.append(['Mobile/VoIP Numbers Not Exported (Missing Phones)', f"{missing_phones:,}"])
+    
+    # Only runs with a suppression list count suppressed numbers
+    if 'suppressed_phones' in phone_stats:
+        summary_data.extend([
+            ['', ''],
+            ['Mobile/VoIP Numbers Suppressed (DNC)', f"{phone_stats['suppressed_phones']:,}"],
+            ['Contacts Moved to Discard by Suppression', f"{phone_stats['suppressed_contacts']:,}"],
+        ])
     
-    summary = pd.DataFrame(summary_data, columns=['QA CHECK', 'RESULT'])
+    summary = consolidation_summary(pd.DataFrame(summary_data, columns=['QA CHECK', 'RESULT']), cleaned_df)
     
-    # Placeholder for detailed missing phones (simplified for now)
-    details = pd.DataFrame(columns=['FirstName', 'LastName', 'Phone 1', 'Phone 2', 'Phone 3', 'APN'])
+    # Mobile/VoIP numbers the run found but did not export (empty for outside results)
+    if missing_df is None:
+        missing_df = pd.DataFrame(columns=['FirstName', 'LastName', 'Phone 1', 'Phone 2', 'Phone 3', 'APN', 'Reason'])
+    details = missing_df
     
     return summary, details
 
+def place_outputs(df, cleaned_df, discard_df, previous_df, missing_df, phone_counts, skip_exported=False,
+                  scrubbed_df=None):
+    """Yield ((state, county), cleaned, discard, previous, scrubbed, QA summary, QA details) for each place in the input.
+
+    Output rows keep the index of the input row they came from, so one
+    groupby of each output on the input rows' place codes splits them all,
+    the run's per-row QA counters (phone_counts) included.
+    Places are built one at a time, so only one place's copies are alive.
+    """
+    missing_column = pd.Series(index=df.index, dtype=object)
+    codes, places = place_partitions(
+        df.get('Parcel State', missing_column), df.get('Parcel County', missing_column)
+    )
+    codes = pd.Series(codes, index=df.index)
+    # Scrubbed rows never reached phone processing, so phone_counts has no rows for them
+    scrubbed = scrubbed_df if scrubbed_df is not None else df.iloc[:0]
+    frames = [phone_counts, cleaned_df, discard_df, previous_df, missing_df, scrubbed]
+    groups = [frame.groupby(codes.loc[frame.index].to_numpy()).indices if len(frame) else {} for frame in frames]
+    
+    for code, place in enumerate(places):
+        counts, cleaned, discard, previous, missing, place_scrubbed = [
+            frame.iloc[group.get(code, [])] for frame, group in zip(frames, groups)
+        ]
+        qa_summary, qa_details = generate_qa_data(
+            None, cleaned, discard, phone_stats=sum_phone_counts(counts),
+            previous_df=previous if skip_exported else None, missing_df=missing,
+            scrubbed_df=place_scrubbed if scrubbed_df is not None else None
+        )
+        yield place, cleaned, discard, previous, place_scrubbed, qa_summary, qa_details
+
+# ---------- PIPELINE ----------
+def phone_step(skip_exported=False, suppressed=None, shards=None, workers=None, record_as=None):
+    """Pipeline step: phone processing of the rows earlier steps kept, with their scrubbed rows in the QA counts"""
+    def step(df, outputs, metrics):
+        outputs.update(phone_outputs(
+            df, metrics, skip_exported, suppressed, outputs.get('scrubbed'), shards, workers, record_as
+        ))
+        return outputs['cleaned']
+    return step
+
+def processing_steps(scrub_owners=False, keywords=None, skip_exported=False, suppressed=None, consolidate=False,
+                     consolidate_by=None):
+    """Pipeline of a run: entity owners scrubbed first when asked, then phone processing, then owner consolidation"""
+    steps = [scrub_step(owner_column, keywords)] if scrub_owners else []
+    steps.append(phone_step(skip_exported, suppressed, shards=APP_SHARDS))
+    if consolidate:
+        steps.append(consolidate_step(consolidate_by))
+    return steps
+
+# ---------- BACKGROUND JOBS ----------
+def process_upload(source, columns=None, total_rows=None, chunk_rows=None, skip_exported=False, suppressed=None,
+                   scrub_owners=False, keywords=None, sheet_names=None, consolidate=False, progress=None):
+    """Job: read and process one upload; returns everything the results view shows.
+
+    With chunk_rows the workbook is streamed in chunks of that many rows,
+    through each of sheet_names in turn when given; otherwise only the
+    needed columns are read from the staged upload and run through the
+    pipeline, which scrubs entity owners first and consolidates owners with
+    several parcels last if asked. Output files are written when they are
+    downloaded (see results.py).
+    """
+    metrics = start_run(progress, job_weights(stage_weights), total_rows)
+    scrubbed_df = parcels_df = None
+    if chunk_rows:
+        chunks = itertools.chain.from_iterable(
+            iter_excel_chunks(source, chunk_size=chunk_rows, sheet_name=sheet_name)
+            for sheet_name in (sheet_names or [None])
+        )
+        chunks = stage_chunks(metrics, 'read', map(typed_input, chunks), "📖 Streaming rows from the workbook...")
+        cleaned_df, discard_df, qa_summary, qa_details, previous_df = process_excel_chunks(
+            chunks, metrics=metrics, skip_exported=skip_exported, suppressed=suppressed
+        )
+        if consolidate:
+            cleaned_df, parcels_df, qa_summary = consolidate_outputs(cleaned_df, qa_summary, metrics)
+    else:
+        with stage(metrics, 'read', total_rows, "📖 Loading columns..."):
+            df = typed_input(read_excel_cached(source, columns=input_columns(columns)))
+        outputs = run_pipeline(
+            df, processing_steps(scrub_owners, keywords, skip_exported, suppressed, consolidate), metrics
+        )
+        cleaned_df, discard_df, previous_df = outputs['cleaned'], outputs['discard'], outputs['previous']
+        qa_summary, qa_details, scrubbed_df = outputs['qa_summary'], outputs['qa_details'], outputs.get('scrubbed')
+        parcels_df = outputs.get('parcels')
+    
+    finish_run(metrics, "✅ Processing complete!")
+    return {
+        'cleaned_df': cleaned_df,
+        'parcels_df': parcels_df,
+        'discard_df': discard_df,
+        'previous_df': previous_df,
+        'scrubbed_df': scrubbed_df,
+        'qa_summary': qa_summary,
+        'qa_details': qa_details,
+        'metrics': metrics,
+    }
+
+def process_sheets(source, sheets, sheet_names, total_rows=None, skip_exported=False, suppressed=None,
+                   scrub_owners=False, keywords=None, consolidate=False, progress=None):
+    """Job: the sheets at positions `sheets` of a workbook as one run, with combined outputs and QA.
+
+    Sheets are parsed side by side in worker processes (see iter_sheets),
+    and each one is scrubbed and split as soon as it is parsed, while the
+    next ones are still parsing. Row labels carry on from sheet to sheet, so
+    the combined outputs split back per sheet (see sheet_outputs); owners
+    are consolidated within each sheet.
+    """
+    metrics = start_run(progress, job_weights(stage_weights), total_rows)
+    steps = [scrub_step(owner_column, keywords)] if scrub_owners else []
+    parts, scrubbed_parts, bounds = [], [], []
+    offset = 0
+    for sheet_df in stage_chunks(
+        metrics, 'read', iter_sheets(source, sheets, input_columns()), f"📖 Parsing {len(sheets)} sheets..."
+    ):
+        df = typed_input(sheet_df)
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        bounds.append((offset, offset + len(df)))
+        offset += len(df)
+        outputs = run_pipeline(df, steps, metrics)
+        scrubbed_parts.append(outputs.get('scrubbed'))
+        parts.append(split_rows(outputs['rows'], metrics, suppressed, APP_SHARDS))
+    
+    cleaned_df, discard_df, phone_counts, missing_df = combine_split_parts(parts)
+    phone_stats = sum_phone_counts(phone_counts)
+    scrubbed_df = pd.concat(scrubbed_parts) if scrub_owners else None
+    
+    cleaned_df, previous_df = set_aside_exported(cleaned_df, metrics, skip_exported)
+    
+    parcels_df = None
+    if consolidate:
+        with stage(metrics, 'consolidate', len(cleaned_df), "🧩 Consolidating owners with several parcels..."):
+            parcels_df = cleaned_df
+            sheet_numbers = pd.Index([end for _, end in bounds]).searchsorted(cleaned_df.index, side='right')
+            cleaned_df = consolidate_owners(cleaned_df, by=[sheet_numbers])
+    
+    with stage(metrics, 'qa', offset, "📊 Generating QA report..."):
+        qa_summary, qa_details = generate_qa_data(
+            None, cleaned_df, discard_df, phone_stats=phone_stats, previous_df=previous_df if skip_exported else None,
+            missing_df=missing_df, scrubbed_df=scrubbed_df
+        )
+    
+    result = {
+        'cleaned_df': cleaned_df,
+        'parcels_df': parcels_df,
+        'discard_df': discard_df,
+        'previous_df': previous_df,
+        'scrubbed_df': scrubbed_df,
+        'qa_summary': qa_summary,
+        'qa_details': qa_details,
+        'skip_exported': skip_exported,
+        'sheet_names': sheet_names,
+        'sheet_bounds': bounds,
+        'sheet_stats': [sum_phone_counts(counts) for _, _, counts, _ in parts],
+        'metrics': metrics,
+    }
+    sheet_rows = []
+    for name, cleaned, discard, previous, scrubbed, _, _ in sheet_outputs(result):
+        sheet_row = {'Sheet': name, 'Cleaned': len(cleaned), 'Discard': len(discard), 'Previously Exported': len(previous)}
+        if scrubbed_df is not None:
+            sheet_row['Scrubbed'] = len(scrubbed)
+        sheet_rows.append(sheet_row)
+    result['sheets'] = pd.DataFrame(sheet_rows)
+    
+    finish_run(metrics, "✅ Processing complete!")
+    return result
+
+def sheet_outputs(result):
+    """Yield (sheet name, cleaned, discard, previous, scrubbed, QA summary, QA details) for each sheet of a run"""
+    skip_exported, scrubbed_df = result['skip_exported'], result['scrubbed_df']
+    frames = [result['cleaned_df'], result['discard_df'], result['previous_df'], result['qa_details']]
+    if scrubbed_df is not None:
+        frames.append(scrubbed_df)
+    for name, (start, end), stats in zip(result['sheet_names'], result['sheet_bounds'], result['sheet_stats']):
+        sheet_frames = [frame[(frame.index >= start) & (frame.index < end)] for frame in frames]
+        cleaned, discard, previous, missing = sheet_frames[:4]
+        scrubbed = sheet_frames[4] if scrubbed_df is not None else pd.DataFrame()
+        qa_summary, qa_details = generate_qa_data(
+            None, cleaned, discard, phone_stats=stats, previous_df=previous if skip_exported else None,
+            missing_df=missing, scrubbed_df=scrubbed if scrubbed_df is not None else None
+        )
+        yield name, cleaned, discard, previous, scrubbed, qa_summary, qa_details
+
+def process_place_split(sources, file_columns, skip_exported=False, suppressed=None, scrub_owners=False, keywords=None,
+                        consolidate=False, progress=None):
+    """Job: process several uploads as one run, with a cleaned/discard/QA set per (state, county) zipped on download.
+
+    Owners are consolidated within each (state, county), so every contact belongs to one place.
+    """
+    total_rows = sum(rows for _, rows in file_columns)
+    metrics = start_run(progress, job_weights(stage_weights), total_rows)
+    with stage(metrics, 'read', total_rows, "📖 Loading columns..."):
+        df = typed_input(pd.concat([
+            read_excel_cached(source, columns=input_columns(columns))
+            for source, (columns, _) in zip(sources, file_columns)
+        ], ignore_index=True))
+    outputs = run_pipeline(df, processing_steps(
+        scrub_owners, keywords, skip_exported, suppressed, consolidate, consolidate_by=['PropertyState', 'PropertyCounty']
+    ), metrics)
+    scrubbed_df = outputs.get('scrubbed')
+    
+    place_rows = []
+    for place, cleaned, discard, previous, scrubbed, _, _ in place_outputs(
+        df, outputs['cleaned'], outputs['discard'], outputs['previous'], outputs['qa_details'], outputs['phone_counts'],
+        skip_exported, scrubbed_df
+    ):
+        place_row = {
+            'State': place[0], 'County': place[1],
+            'Cleaned': len(cleaned), 'Discard': len(discard), 'Previously Exported': len(previous)
+        }
+        if scrubbed_df is not None:
+            place_row['Scrubbed'] = len(scrubbed)
+        place_rows.append(place_row)
+    
+    finish_run(metrics, "✅ Processing complete!")
+    return {
+        'df': df,
+        'cleaned_df': outputs['cleaned'],
+        'parcels_df': outputs.get('parcels'),
+        'discard_df': outputs['discard'],
+        'previous_df': outputs['previous'],
+        'scrubbed_df': scrubbed_df,
+        'qa_summary': outputs['qa_summary'],
+        'qa_details': outputs['qa_details'],
+        'phone_counts': outputs['phone_counts'],
+        'skip_exported': skip_exported,
+        'places': pd.DataFrame(place_rows),
+        'metrics': metrics,
+    }
+
+def place_zip(result, output_format):
+    """Zip of a place split result: the combined QA report, then one set of files per (state, county)"""
+    return outputs_zip(
+        place_outputs(
+            result['df'], result['cleaned_df'], result['discard_df'], result['previous_df'], result['qa_details'],
+            result['phone_counts'], result['skip_exported'], result['scrubbed_df']
+        ),
+        result['qa_summary'], result['qa_details'], output_format
+    )
+
+def sheet_zip(result, output_format):
+    """Zip of a multi-sheet result: the combined QA report, then one set of files per sheet, named after it"""
+    prefixes = sheet_file_names(result['sheet_names'])
+    return outputs_zip(
+        (((prefix, ''),) + outputs[1:] for prefix, outputs in zip(prefixes, sheet_outputs(result))),
+        result['qa_summary'], result['qa_details'], output_format
+    )
+
 # ---------- STREAMLIT APP ----------
+def show_place_split(uploaded_files, skip_exported=False, suppressed=None, scrub_owners=False, keywords=None,
+                     consolidate=False):
+    """Several uploads processed as one run, with a cleaned/discard/QA set per (state, county) in one zip"""
+    try:
+        # Workbooks not seen before are parsed side by side, one process each
+        with st.spinner(f"📖 Loading {len(uploaded_files)} files..."):
+            stage_uploads(uploaded_files)
+            file_columns = [excel_info(uploaded_file) for uploaded_file in uploaded_files]
+        total_rows = sum(rows for _, rows in file_columns)
+        
+        st.success(f"✅ {len(uploaded_files)} files loaded successfully!")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Files", f"{len(uploaded_files):,}")
+        with col2:
+            st.metric("Total Rows", f"{total_rows:,}")
+        with col3:
+            st.metric("Total Size", f"{sum(f.size for f in uploaded_files) / 1024 / 1024:.1f} MB")
+        
+        if st.button("🚀 Process Files", type="primary", use_container_width=True):
+            # The same files with the same settings show the stored result again
+            key = run_key(
+                list(uploaded_files), skip_exported=skip_exported, suppressed=suppressed, scrub_owners=scrub_owners,
+                keywords=keywords, consolidate=consolidate, exported=index_stats() if skip_exported else None
+            )
+            job_id = submit_run(
+                key, process_place_split, [detached_upload(uploaded_file) for uploaded_file in uploaded_files],
+                file_columns, skip_exported=skip_exported, suppressed=suppressed,
+                scrub_owners=scrub_owners, keywords=keywords, consolidate=consolidate
+            )
+            remember_job(job_id)
+    
+    except Exception as e:
+        st.error(f"❌ Error processing files: {str(e)}")
+        with st.expander("Error Details"):
+            st.exception(e)
+
+def show_run_summary(result):
+    """Record counts, previously exported note and QA summary of a finished job"""
+    cleaned_df, discard_df, previous_df = result['cleaned_df'], result['discard_df'], result['previous_df']
+    
+    st.markdown("## 📊 Processing Results")
+    
+    # Metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("📱 Cleaned Records", f"{len(cleaned_df):,}" if not cleaned_df.empty else "0")
+    with col2:
+        st.metric("📞 Discard Records", f"{len(discard_df):,}" if not discard_df.empty else "0")
+    with col3:
+        total_processed = len(cleaned_df) + len(discard_df) + len(previous_df)
+        st.metric("📋 Total Processed", f"{total_processed:,}")
+    
+    if not previous_df.empty:
+        st.info(f"🔁 {len(previous_df):,} contacts were already in an earlier cleaned file and were set aside")
+    scrubbed_df = result.get('scrubbed_df')
+    if scrubbed_df is not None:
+        st.info(f"🧹 {len(scrubbed_df):,} entity owners were scrubbed before phone processing")
+    if result.get('parcels_df') is not None:
+        st.info(f"🧩 {len(result['parcels_df']):,} cleaned parcel rows were consolidated into {len(cleaned_df):,} owner contacts")
+    
+    # QA Summary
+    st.markdown("### 📋 QA Summary" + (" (All Files)" if 'places' in result else ""))
+    st.dataframe(result['qa_summary'], use_container_width=True, hide_index=True)
+
+def show_run_metrics(result, output_names):
+    """Per-stage timing and memory of a finished job, with the files written so far"""
+    with st.expander("⏱️ Performance Metrics", expanded=False):
+        st.dataframe(metrics_frame(result['metrics']), use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📈 Download Metrics (JSON)",
+            data=metrics_json(result['metrics']),
+            file_name=output_names['metrics'],
+            mime=METRICS_MIME
+        )
+
+def show_phone_results(result, output_format='Excel'):
+    """Results view of a finished single-file job; files are written in output_format when downloaded"""
+    cleaned_df, discard_df, previous_df = result['cleaned_df'], result['discard_df'], result['previous_df']
+    qa_summary, qa_details, scrubbed_df = result['qa_summary'], result['qa_details'], result['scrubbed_df']
+    mime = OUTPUT_FORMATS[output_format][1]
+    show_run_summary(result)
+    
+    # Generate filenames from the state and county in the data
+    output_names = phone_output_names(cleaned_df if not cleaned_df.empty else previous_df, output_format=output_format)
+    
+    def table_download(label, name, frame, **kwargs):
+        key = (name, output_format)
+        st.download_button(
+            label=label,
+            data=download_data(result, key, lambda: table_export(frame, output_format), len(frame)),
+            file_name=output_names[name],
+            mime=mime,
+            use_container_width=True,
+            **kwargs
+        )
+        show_export_time(result, key)
+    
+    # Download files
+    st.markdown("### 📥 Download Files")
+    
+    # Create download buttons
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if not cleaned_df.empty:
+            table_download(
+                "📱 Download Cleaned File", 'cleaned', cleaned_df,
+                **record_on_download(cleaned_df, output_names['cleaned'], result.get('parcels_df'))
+            )
+        else:
+            st.info("No cleaned data to download")
+    
+    with col2:
+        if not discard_df.empty:
+            table_download("📞 Download Discard File", 'discard', discard_df)
+        else:
+            st.info("No discard data to download")
+    
+    with col3:
+        # QA Report
+        key = ('qa', output_format)
+        st.download_button(
+            label="📊 Download QA Report",
+            data=download_data(
+                result, key, lambda: qa_report_export(qa_summary, qa_details, output_format),
+                len(qa_summary) + len(qa_details)
+            ),
+            file_name=output_names['qa'],
+            mime=mime,
+            use_container_width=True
+        )
+        show_export_time(result, key)
+        # Outside Excel the QA report is one table, so the missing-phone details get their own file
+        if output_format != 'Excel' and not qa_details.empty:
+            table_download("❓ Download Missing Phones", 'missing', qa_details)
+    
+    if not previous_df.empty:
+        table_download("🔁 Download Previously Exported Contacts", 'previous', previous_df)
+    
+    if scrubbed_df is not None and not scrubbed_df.empty:
+        table_download("🧹 Download Scrubbed Entity Owners", 'scrubbed', scrubbed_df)
+    
+    if 'sheets' in result:
+        show_sheet_files(result, output_format)
+    
+    show_run_metrics(result, output_names)
+    
+    # Show data previews with Launch Control compatibility check
+    if not cleaned_df.empty:
+        with st.expander("📱 Cleaned Data Preview (Launch Control Compatible)", expanded=False):
+            st.success("✅ Column headers match Launch Control template")
+            st.dataframe(cleaned_df.head(20), use_container_width=True)
+            
+            # Show column mapping
+            st.markdown("**Column Headers:**")
+            col_display = st.columns(4)
+            for i, col in enumerate(cleaned_df.columns):
+                with col_display[i % 4]:
+                    st.write(f"✅ {col}")
+    
+    if not discard_df.empty:
+        with st.expander("📞 Discard Data Preview", expanded=False):
+            st.dataframe(discard_df.head(20), use_container_width=True)
+
+def show_sheet_files(result, output_format='Excel'):
+    """Per-sheet counts of a multi-sheet job, with one set of files per sheet in a zip written when downloaded"""
+    output_names = phone_output_names(None, place=('Sheets', ''), output_format=output_format)
+    
+    st.markdown("### 🗂️ Files by Sheet")
+    st.dataframe(result['sheets'], use_container_width=True, hide_index=True)
+    key = ('sheets', output_format)
+    st.download_button(
+        label=f"🗂️ Download Files by Sheet ({len(result['sheets'])} sheets, .zip)",
+        data=download_data(result, key, lambda: sheet_zip(result, output_format), result['metrics']['total_rows']),
+        file_name=output_names['zip'],
+        mime=ZIP_MIME,
+        use_container_width=True,
+        **record_on_download(result['cleaned_df'], output_names['zip'], result.get('parcels_df'))
+    )
+    show_export_time(result, key)
+
+def show_place_results(result, output_format='Excel'):
+    """Results view of a finished multi-file job split by state and county; the zip is written when downloaded"""
+    show_run_summary(result)
+    output_names = phone_output_names(None, place=('Combined', ''), output_format=output_format)
+    
+    st.markdown("### 🗂️ Files by State and County")
+    st.dataframe(result['places'], use_container_width=True, hide_index=True)
+    key = ('zip', output_format)
+    st.download_button(
+        label=f"🗂️ Download All Files ({len(result['places'])} counties, .zip)",
+        data=download_data(result, key, lambda: place_zip(result, output_format), result['metrics']['total_rows']),
+        file_name=output_names['zip'],
+        mime=ZIP_MIME,
+        use_container_width=True,
+        **record_on_download(result['cleaned_df'], output_names['zip'], result.get('parcels_df'))
+    )
+    show_export_time(result, key)
+    
+    show_run_metrics(result, output_names)
+
+def show_results(result, output_format='Excel'):
+    """Results view of a finished processing job, with its files in output_format"""
+    if 'places' in result:
+        show_place_results(result, output_format)
+    else:
+        show_phone_results(result, output_format)
+
 def main():
+    # Set page config
+    st.set_page_config(
+        page_title="Excel Phone Data Processor", 
+        page_icon="📞", 
+        layout="wide"
+    )
+    
     st.title("📞 Excel Phone Data Processor")
     st.markdown("Upload your Excel file to automatically separate mobile/VoIP numbers from landlines")
     st.info("🎯 **Launch Control Compatible** - Output files match the required template format")
@@ -365,31 +944,153 @@ def main():
         st.write("📱 Cleaned file (Mobile/VoIP)")
         st.write("📞 Discard file (Other types)")
         st.write("📊 QA Report")
+        st.write("🔁 Previously exported file (when skipping)")
+        st.write("🧹 Scrubbed entity owners (when scrubbing)")
+        output_format = st.selectbox(
+            "Output format:",
+            list(OUTPUT_FORMATS),
+            help="CSV and Parquet are much faster to write than Excel for large files; columns keep the Launch Control order"
+        )
+        
+        st.markdown("---")
+        st.markdown("**📦 Large Files:**")
+        stream_mode = st.checkbox(
+            "Process in chunks",
+            value=False,
+            help="Stream the workbook in fixed-size chunks so memory use depends on the chunk size, not the file size"
+        )
+        chunk_rows = st.number_input(
+            "Rows per chunk",
+            min_value=1_000,
+            max_value=500_000,
+            value=STREAM_CHUNK_ROWS,
+            step=10_000,
+            disabled=not stream_mode
+        )
+        
+        st.markdown("---")
+        st.markdown("**🗂️ Multiple Files:**")
+        split_places = st.checkbox(
+            "Split outputs by state and county",
+            value=False,
+            help="Upload several files at once; they are processed together and each (state, county) gets its own set of files in one zip"
+        )
+        
+        st.markdown("---")
+        st.markdown("**🧹 Entity Owners:**")
+        # The pipeline runs over one in-memory frame, so files processed in chunks are not scrubbed
+        scrub_available = split_places or not stream_mode
+        scrub_owners = st.checkbox(
+            "Scrub entity owners first",
+            value=False,
+            disabled=not scrub_available,
+            help="Rows whose owner is a utility, government, school, church... are set aside before phone processing"
+        ) and scrub_available
+        keywords = st.text_area(
+            "Additional keywords (one per line):",
+            placeholder="association\ntrust\nfoundation",
+            disabled=not scrub_owners
+        )
+        
+        st.markdown("---")
+        st.markdown("**🧩 Owners with Several Parcels:**")
+        consolidate = st.checkbox(
+            "One contact per owner",
+            value=False,
+            help="Cleaned rows with the same owner name and mailing address become one contact, with its parcel count, total acreage, APN list and up to 3 distinct phones"
+        )
+        
+        st.markdown("---")
+        st.markdown("**🔁 Previously Exported:**")
+        skip_exported = st.checkbox(
+            "Skip previously exported contacts",
+            value=True,
+            help="Contacts already in a downloaded cleaned file go to a separate file instead of the cleaned file"
+        )
+        indexed_contacts, indexed_exports = index_stats()
+        st.caption(f"{indexed_contacts:,} contacts from {indexed_exports:,} cleaned downloads on record")
+        
+        st.markdown("---")
+        st.markdown("**🚫 Suppression List:**")
+        suppression_file = st.file_uploader(
+            "Do-not-contact numbers",
+            type=['csv', 'txt', 'tsv', 'xlsx', 'xls'],
+            help="Mobile/VoIP numbers on this list are dropped before the first 3 are picked"
+        )
+        suppressed = None
+        if suppression_file is not None:
+            with st.spinner("🚫 Loading suppression list..."):
+                suppressed = load_suppression(suppression_file)
+            st.caption(f"{len(suppressed):,} numbers suppressed")
     
     # File upload
-    uploaded_file = st.file_uploader(
-        "Choose an Excel file", 
-        type=['xlsx', 'xls'],
-        help="Upload your Excel file containing contact and phone data"
-    )
+    uploaded_file, uploaded_files = None, []
+    if split_places:
+        uploaded_files = st.file_uploader(
+            "Choose Excel, CSV or Parquet files",
+            type=INPUT_TYPES,
+            accept_multiple_files=True,
+            help="Upload every file to process together; outputs are split by the property state and county"
+        )
+    else:
+        uploaded_file = st.file_uploader(
+            "Choose an Excel, CSV or Parquet file", 
+            type=INPUT_TYPES,
+            help="Upload your Excel, CSV/TSV (optionally .gz) or Parquet file containing contact and phone data"
+        )
+    
+    # A job started earlier (before a rerun or a reconnect) is picked back up
+    job_id = current_job()
     
-    if uploaded_file is not None:
+    if uploaded_files:
+        show_place_split(uploaded_files, skip_exported, suppressed, scrub_owners, keywords, consolidate)
+    
+    elif uploaded_file is not None:
         try:
-            # Load the file
-            with st.spinner("📖 Loading Excel file..."):
-                df = pd.read_excel(uploaded_file)
+            # Load the file (only a preview in chunked mode; rows are streamed when processing)
+            if stream_mode:
+                with st.spinner("📖 Reading file header..."):
+                    estimated_rows = estimate_excel_rows(uploaded_file)
+                    df = preview_excel(uploaded_file)
+                total_rows_label = f"~{estimated_rows:,}" if estimated_rows is not None else "Unknown"
+            else:
+                # The workbook is staged once; reruns only map in the rows and columns they show
+                with st.spinner("📖 Loading file..."):
+                    _, total_rows = excel_info(uploaded_file)
+                    df = read_excel_cached(uploaded_file, rows=10)
+                total_rows_label = f"{total_rows:,}"
             
             # Display file info
-            st.success(f"✅ File loaded successfully!")
+            st.success("✅ File loaded successfully!")
             
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total Rows", f"{len(df):,}")
+                st.metric("Total Rows", total_rows_label)
             with col2:
                 st.metric("Total Columns", f"{len(df.columns):,}")
             with col3:
                 st.metric("File Size", f"{uploaded_file.size / 1024 / 1024:.1f} MB")
             
+            # Workbooks with several sheets are processed sheet by sheet (the preview shows the first)
+            sheets = excel_sheets(uploaded_file)
+            sheet_names = [name for name, _ in sheets]
+            selected = sheet_names[:1]
+            if len(sheets) > 1:
+                selected = st.multiselect(
+                    f"🗂️ Sheets to process ({len(sheets)} in this workbook):",
+                    sheet_names,
+                    default=sheet_names,
+                    help="Selected sheets are processed together, with combined files and QA plus one set of files per sheet"
+                )
+                if not selected:
+                    st.warning("⚠️ Select at least one sheet to process")
+            positions = selected_sheet_positions(sheets, selected)
+            multi_sheet = positions not in ([], [0])
+            if multi_sheet:
+                sheet_rows = [rows for name, rows in sheets if name in selected]
+                if None not in sheet_rows:
+                    total_rows = estimated_rows = sum(sheet_rows)
+            
             # Show preview
             with st.expander("📋 Data Preview", expanded=False):
                 st.dataframe(df.head(10), use_container_width=True)
@@ -404,118 +1105,41 @@ def main():
                         st.write(f"... and {len(phone_cols_found) - 10} more")
             
             # Process button
-            if st.button("🚀 Process File", type="primary", use_container_width=True):
-                
-                # Process the file
-                cleaned_df, discard_df, qa_summary, qa_details = process_excel_file(df)
-                
-                # Display results
-                st.markdown("## 📊 Processing Results")
-                
-                # Metrics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("📱 Cleaned Records", f"{len(cleaned_df):,}" if not cleaned_df.empty else "0")
-                with col2:
-                    st.metric("📞 Discard Records", f"{len(discard_df):,}" if not discard_df.empty else "0")
-                with col3:
-                    total_processed = (len(cleaned_df) if not cleaned_df.empty else 0) + (len(discard_df) if not discard_df.empty else 0)
-                    st.metric("📋 Total Processed", f"{total_processed:,}")
-                
-                # QA Summary
-                st.markdown("### 📋 QA Summary")
-                st.dataframe(qa_summary, use_container_width=True, hide_index=True)
-                
-                # Download files
-                st.markdown("### 📥 Download Files")
-                
-                # Generate filenames
-                date_str = datetime.now().strftime("%b%d")
-                
-                # Extract state and county from data
-                if not cleaned_df.empty:
-                    state = cleaned_df['PropertyState'].dropna().iloc[0] if 'PropertyState' in cleaned_df.columns else 'Unknown'
-                    county_raw = cleaned_df['PropertyCounty'].dropna().iloc[0] if 'PropertyCounty' in cleaned_df.columns else 'Unknown'
-                    county = re.sub(r'\s+', '', str(county_raw))
+            if st.button("🚀 Process File", type="primary", use_container_width=True, disabled=not positions):
+                settings = {
+                    'skip_exported': skip_exported, 'suppressed': suppressed, 'scrub_owners': scrub_owners,
+                    'keywords': keywords, 'consolidate': consolidate
+                }
+                # Processing runs as a background job; the page polls its progress below. The same
+                # file with the same settings (and no downloads since) shows the stored result again
+                key = run_key(
+                    uploaded_file, exported=index_stats() if skip_exported else None, sheets=positions,
+                    chunk_rows=int(chunk_rows) if stream_mode else None, **settings
+                )
+                if stream_mode:
+                    # Chunked runs stream the selected sheets one after another into combined files
+                    job_id = submit_run(
+                        key, process_upload, detached_upload(uploaded_file), total_rows=estimated_rows,
+                        chunk_rows=int(chunk_rows), sheet_names=selected if multi_sheet else None, **settings
+                    )
+                elif multi_sheet:
+                    job_id = submit_run(
+                        key, process_sheets, detached_upload(uploaded_file), positions, selected,
+                        total_rows=total_rows, **settings
+                    )
                 else:
-                    state = "Unknown"
-                    county = "Unknown"
-                
-                # Create download buttons
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    if not cleaned_df.empty:
-                        cleaned_excel = io.BytesIO()
-                        cleaned_df.to_excel(cleaned_excel, index=False, engine='openpyxl')
-                        cleaned_excel.seek(0)
-                        
-                        st.download_button(
-                            label="📱 Download Cleaned File",
-                            data=cleaned_excel,
-                            file_name=f"{state}{county}{date_str}LCT.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            use_container_width=True
-                        )
-                    else:
-                        st.info("No cleaned data to download")
-                
-                with col2:
-                    if not discard_df.empty:
-                        discard_excel = io.BytesIO()
-                        discard_df.to_excel(discard_excel, index=False, engine='openpyxl')
-                        discard_excel.seek(0)
-                        
-                        st.download_button(
-                            label="📞 Download Discard File",
-                            data=discard_excel,
-                            file_name=f"{state}{county}{date_str}LandlinesNoNumber.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            use_container_width=True
-                        )
-                    else:
-                        st.info("No discard data to download")
-                
-                with col3:
-                    # QA Report
-                    qa_excel = io.BytesIO()
-                    with pd.ExcelWriter(qa_excel, engine='openpyxl') as writer:
-                        qa_summary.to_excel(writer, sheet_name="Summary", index=False)
-                        if not qa_details.empty:
-                            qa_details.to_excel(writer, sheet_name="Missing Phones", index=False)
-                    qa_excel.seek(0)
-                    
-                    st.download_button(
-                        label="📊 Download QA Report",
-                        data=qa_excel,
-                        file_name=f"{state}{county}{date_str}QAReport.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
+                    job_id = submit_run(
+                        key, process_upload, detached_upload(uploaded_file), columns=list(df.columns),
+                        total_rows=total_rows, **settings
                     )
-                
-                # Show data previews with Launch Control compatibility check
-                if not cleaned_df.empty:
-                    with st.expander("📱 Cleaned Data Preview (Launch Control Compatible)", expanded=False):
-                        st.success("✅ Column headers match Launch Control template")
-                        st.dataframe(cleaned_df.head(20), use_container_width=True)
-                        
-                        # Show column mapping
-                        st.markdown("**Column Headers:**")
-                        col_display = st.columns(4)
-                        for i, col in enumerate(cleaned_df.columns):
-                            with col_display[i % 4]:
-                                st.write(f"✅ {col}")
-                
-                if not discard_df.empty:
-                    with st.expander("📞 Discard Data Preview", expanded=False):
-                        st.dataframe(discard_df.head(20), use_container_width=True)
+                remember_job(job_id)
         
         except Exception as e:
             st.error(f"❌ Error processing file: {str(e)}")
             with st.expander("Error Details"):
                 st.exception(e)
     
-    else:
+    elif job_id is None:
         st.info("👆 Please upload an Excel file to get started")
         
         # Show instructions
@@ -537,10 +1161,16 @@ def main():
             - Columns in the exact order expected by Launch Control
             
             **Expected file format:**
-            - Excel file (.xlsx or .xls)
+            - Excel file (.xlsx or .xls), CSV/TSV file (optionally gzip-compressed, .csv.gz) or Parquet file
             - Contains columns like: Phone, Phone (Line Type), Alt Phone 1, etc.
             - Phone types should be: Mobile, Voip, Landline, Pager, etc.
             """)
+    
+    # Including a job the buttons above just started
+    job_id = current_job()
+    if job_id is not None:
+        # Files are written in the format picked now, so changing it needs no reprocessing
+        show_job(job_id, lambda result: show_results(result, output_format))
 
 if __name__ == "__main__":
     main()
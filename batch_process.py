@@ -0,0 +1,443 @@
+"""Headless batch runner for the phone processors and the land owner scrubber.
+
+Processes every input file in parallel across cores and writes the same
+outputs the Streamlit apps offer for download:
+
+    python batch_process.py phones "exports/*.xlsx" -o processed/
+    python batch_process.py mapped exports/ -o processed/ --mapping datatree.json
+    python batch_process.py phones "exports/*.xlsx" -o processed/ --skip-exported --suppress dnc_list.csv
+    python batch_process.py phones exports/ -o processed/ --scrub --keywords extra_keywords.txt
+    python batch_process.py phones "exports/*.csv.gz" -o processed/ --format parquet
+    python batch_process.py scrub exports/ -o scrubbed/ --keywords extra_keywords.txt
+"""
+import argparse
+import functools
+import glob
+import importlib.machinery
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import app
+from file_io import (
+    is_excel_file, iter_excel_chunks, phone_output_names, qa_report_export, read_table_file, table_columns,
+    table_export, timed_export
+)
+from instrumentation import start_run
+from mapping_profiles import load_profile
+from pipeline import consolidate_outputs, consolidate_step, run_pipeline, scrub_step
+from scrub_engine import default_owner_column, generate_filename, get_scrub_patterns, scrub_chunks, scrub_mask
+from staging import read_staged, stage_excel, staged_info
+from suppression import load_suppression
+
+# ---------- CONFIGURATION ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.tsv', '.csv.gz', '.tsv.gz', '.parquet')
+
+# --format choices and the output formats they stand for
+FORMAT_CHOICES = {'xlsx': 'Excel', 'csv': 'CSV', 'csv.gz': 'CSV (gzip)', 'parquet': 'Parquet'}
+
+# Outputs of the phone processors, in the order they return them
+PHONE_OUTPUTS = ('cleaned', 'discard', 'qa_summary', 'qa_details', 'previous')
+
+_newscrubber = None
+
+# ---------- HELPER FUNCTIONS ----------
+def load_newscrubber():
+    """Import the NEWSCRUBBER script (it has no .py extension) as a module"""
+    global _newscrubber
+    if _newscrubber is None:
+        loader = importlib.machinery.SourceFileLoader('newscrubber', os.path.join(BASE_DIR, 'NEWSCRUBBER'))
+        spec = importlib.util.spec_from_loader('newscrubber', loader)
+        module = importlib.util.module_from_spec(spec)
+        loader.exec_module(module)
+        _newscrubber = module
+    return _newscrubber
+
+def collect_inputs(sources):
+    """Expand directories and glob patterns into a sorted, de-duplicated list of input files"""
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in os.listdir(source)]
+        elif glob.has_magic(source):
+            matches = glob.glob(source)
+        else:
+            matches = [source]
+
+        for path in sorted(matches):
+            name = os.path.basename(path)
+            # Skip Excel lock files left next to open workbooks
+            if name.startswith('~$') or not name.lower().endswith(INPUT_EXTENSIONS):
+                continue
+            if path not in files:
+                files.append(path)
+    return files
+
+def quiet_progress(percent, message):
+    """Progress callback for headless runs"""
+
+def split_extension(file_name):
+    """os.path.splitext keeping two-part extensions like .csv.gz together"""
+    base, ext = os.path.splitext(file_name)
+    if ext.lower() == '.gz':
+        base, inner = os.path.splitext(base)
+        ext = inner + ext
+    return base, ext
+
+def write_output(out_dir, file_name, data, stem):
+    """Copy an exported file to disk without clobbering one another input already produced"""
+    base, ext = split_extension(file_name)
+    candidates = [file_name, f"{base}_{stem}{ext}"]
+    candidates += [f"{base}_{stem}_{i}{ext}" for i in range(2, 100)]
+
+    for candidate in candidates:
+        path = os.path.join(out_dir, candidate)
+        try:
+            with open(path, 'xb') as handle:
+                shutil.copyfileobj(data, handle)
+            return path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No free output name for {file_name} in {out_dir}")
+
+def timed_chunks(chunks, summary):
+    """Pass chunks through, adding the rows and the time spent reading them to the summary"""
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        summary['read_s'] += time.perf_counter() - started
+        if chunk is None:
+            return
+        summary['rows'] += len(chunk)
+        yield chunk
+
+def suggested_mapping(columns):
+    """Column and phone mapping from NEWSCRUBBER's smart suggestions, as the mapping UI pre-selects them"""
+    newscrubber = load_newscrubber()
+    suggestions, phone_suggestions = newscrubber.smart_column_suggestions(list(columns))
+
+    column_mapping = {output_col: suggestions.get(output_col) for output_col in newscrubber.OUTPUT_COLUMNS}
+    phone_mapping = []
+    for i in range(5):
+        phone_key = 'phone' if i == 0 else f'alt_phone_{i}'
+        type_key = 'phone_type' if i == 0 else f'alt_phone_{i}_type'
+        phone_mapping.append([phone_suggestions.get(phone_key, 'None'), phone_suggestions.get(type_key, 'None')])
+    return column_mapping, phone_mapping
+
+def default_mapping(columns):
+    """Mapping saved in the app for this header, else the smart suggestions"""
+    profile = load_profile(columns)
+    if profile is not None:
+        return profile['columns'], profile['phones']
+    return suggested_mapping(columns)
+
+def scrub_owner_column(mode, columns, options):
+    """Owner column a phone job scrubs entity owners on (--owner-column, else the processor's default)"""
+    if options.get('owner_column'):
+        return options['owner_column']
+    return app.owner_column if mode == 'phones' else load_newscrubber().owner_name_column(columns)
+
+def job_columns(mode, columns, options):
+    """Columns a job reads from a staged workbook or a CSV/Parquet file (None reads them all)"""
+    owner_column = scrub_owner_column(mode, columns, options) if options.get('scrub') else None
+    if mode == 'phones':
+        needed = set(app.input_columns(columns)) | {owner_column}
+        return [col for col in columns if col in needed]
+    if mode == 'mapped':
+        mapping = options['mapping']
+        return load_newscrubber().mapped_input_columns(
+            columns, mapping.get('columns', {}), mapping.get('phones', []), owner_column
+        )
+    # The scrubber writes every column back out
+    return None
+
+def export_output(out_dir, file_name, stem, export, *args, **kwargs):
+    """Export one file and write it; returns the path and the export time in seconds"""
+    data, export_s = timed_export(export, *args, **kwargs)
+    with data:
+        return write_output(out_dir, file_name, data, stem), export_s
+
+def write_phone_outputs(out_dir, stem, cleaned_df, discard_df, qa_summary, qa_details, previous_df, scrubbed_df=None,
+                        output_format='Excel'):
+    """Write the cleaned, discard, QA, previously exported and scrubbed-out files of one phone processing run"""
+    output_names = phone_output_names(cleaned_df if not cleaned_df.empty else previous_df, output_format=output_format)
+    written = []
+    for name, frame in (('cleaned', cleaned_df), ('discard', discard_df), ('previous', previous_df),
+                        ('scrubbed', scrubbed_df)):
+        if frame is not None and not frame.empty:
+            written.append(export_output(out_dir, output_names[name], stem, table_export, frame, output_format))
+    written.append(export_output(
+        out_dir, output_names['qa'], stem, qa_report_export, qa_summary, qa_details, output_format
+    ))
+    # Outside Excel the QA report is one table, so the missing-phone details get their own file
+    if output_format != 'Excel' and not qa_details.empty:
+        written.append(export_output(out_dir, output_names['missing'], stem, table_export, qa_details, output_format))
+    return written
+
+# ---------- PER-FILE JOBS ----------
+# Jobs take either a whole frame or an iterator of chunks (--chunk-rows); phone jobs return the outputs by name
+def peek_columns(data):
+    """Column names of a frame or chunk iterator, and the data with any peeked chunk put back"""
+    if isinstance(data, pd.DataFrame):
+        return data.columns, data
+    first = next(data, pd.DataFrame())
+    return first.columns, itertools.chain([first], data)
+
+def suppression_numbers(options):
+    """Memory-mapped do-not-contact numbers of the job, None without a suppression list"""
+    return load_suppression(options['suppress']) if options.get('suppress') else None
+
+def phone_pipeline(data, phone_step, mode, options):
+    """Run a whole frame through the entity scrub (with --scrub), a processor's phone step and owner consolidation
+    (with --consolidate)"""
+    steps = [phone_step]
+    if options.get('scrub'):
+        steps.insert(0, scrub_step(scrub_owner_column(mode, data.columns, options), options.get('keywords')))
+    if options.get('consolidate'):
+        steps.append(consolidate_step())
+    # Headless runs report no progress, so the stages need no weights
+    return run_pipeline(data, steps, start_run(quiet_progress, {}, len(data)))
+
+def chunked_outputs(results, options):
+    """Outputs by name of a chunked phone run, with owners consolidated afterwards (with --consolidate)"""
+    outputs = dict(zip(PHONE_OUTPUTS, results))
+    if options.get('consolidate'):
+        outputs['cleaned'], outputs['parcels'], outputs['qa_summary'] = consolidate_outputs(
+            outputs['cleaned'], outputs['qa_summary'], start_run(quiet_progress, {}, None)
+        )
+    return outputs
+
+def run_phones(data, options):
+    """Launch Control phone processing (app.py)"""
+    settings = {
+        'skip_exported': options.get('skip_exported'), 'suppressed': suppression_numbers(options),
+        'record_as': options.get('record_as')
+    }
+    if isinstance(data, pd.DataFrame):
+        phone_step = app.phone_step(shards=options.get('shards'), workers=options.get('shard_workers'), **settings)
+        return phone_pipeline(app.typed_input(data), phone_step, 'phones', options)
+    return chunked_outputs(app.process_excel_chunks(
+        map(app.typed_input, data), progress=quiet_progress, **settings
+    ), options)
+
+def run_mapped(data, options):
+    """Flexible-mapping phone processing (NEWSCRUBBER)"""
+    newscrubber = load_newscrubber()
+    columns, data = peek_columns(data)
+    if options.get('mapping'):
+        column_mapping = options['mapping'].get('columns', {})
+        phone_mapping = options['mapping'].get('phones', [])
+    else:
+        column_mapping, phone_mapping = default_mapping(columns)
+
+    required = [field for field, config in newscrubber.OUTPUT_COLUMNS.items() if config['required']]
+    missing = [field for field in required if not column_mapping.get(field)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    if not any(p != 'None' and t != 'None' for p, t in phone_mapping):
+        raise ValueError("At least one phone number and type column must be mapped")
+
+    def typed(df):
+        return newscrubber.typed_input_flexible(df, column_mapping, phone_mapping)
+
+    settings = {
+        'skip_exported': options.get('skip_exported'), 'suppressed': suppression_numbers(options),
+        'record_as': options.get('record_as')
+    }
+    if isinstance(data, pd.DataFrame):
+        phone_step = newscrubber.phone_step_flexible(
+            column_mapping, phone_mapping, shards=options.get('shards'), workers=options.get('shard_workers'), **settings
+        )
+        return phone_pipeline(typed(data), phone_step, 'mapped', options)
+    return chunked_outputs(newscrubber.process_data_chunks(
+        map(typed, data), column_mapping, phone_mapping, progress=quiet_progress, **settings
+    ), options)
+
+def run_scrub(data, options):
+    """Entity scrubbing (landowner_scrub_app.py); returns the kept rows and the removed row count"""
+    columns, data = peek_columns(data)
+    owner_column = options.get('owner_column') or default_owner_column(columns)
+    if owner_column not in columns:
+        raise ValueError(f"Owner column '{owner_column}' not found")
+    patterns = get_scrub_patterns(options.get('keywords'))
+
+    if isinstance(data, pd.DataFrame):
+        scrub = scrub_mask(data[owner_column], patterns, cached=True)
+        return data[~scrub], int(scrub.sum())
+    cleaned_df, removed_names, _ = scrub_chunks(data, owner_column, patterns, cached=True)
+    return cleaned_df, len(removed_names)
+
+def process_file(mode, path, out_dir, options):
+    """Process one input file and return its timing summary"""
+    stem = split_extension(os.path.basename(path))[0]
+    output_format = options.get('format', 'Excel')
+    summary = {'file': path, 'rows': 0, 'kept': 0, 'removed': 0, 'outputs': [], 'error': None}
+    started = time.perf_counter()
+
+    if options.get('skip_exported'):
+        # Written cleaned files count as exported, like a download in the apps. Contacts are recorded as they are
+        # checked, in one transaction per file, so files run side by side never both keep the same contact
+        options = {**options, 'record_as': os.path.basename(path)}
+
+    try:
+        if options.get('chunk_rows'):
+            # Reading and processing interleave; reads are timed chunk by chunk
+            summary['read_s'] = 0.0
+            data = timed_chunks(iter_excel_chunks(path, chunk_size=options['chunk_rows']), summary)
+        else:
+            if is_excel_file(path):
+                # Parsed once into the staging area; later runs on the same file skip the .xlsx parse
+                staged = stage_excel(path)
+                columns, _ = staged_info(staged)
+                read = functools.partial(read_staged, staged)
+            else:
+                # CSV and Parquet files are read directly by pyarrow, never staged
+                columns = table_columns(path)
+                read = functools.partial(read_table_file, path)
+            if mode == 'mapped' and not options.get('mapping'):
+                # Pick the mapping from the full header before projecting columns
+                column_mapping, phone_mapping = default_mapping(columns)
+                options = {**options, 'mapping': {'columns': column_mapping, 'phones': phone_mapping}}
+            data = read(columns=job_columns(mode, columns, options))
+            summary['rows'] = len(data)
+            summary['read_s'] = time.perf_counter() - started
+
+        step = time.perf_counter()
+        read_before = summary['read_s']
+        if mode == 'scrub':
+            cleaned_df, summary['removed'] = run_scrub(data, options)
+            summary['kept'] = len(cleaned_df)
+            summary['process_s'] = time.perf_counter() - step - (summary['read_s'] - read_before)
+
+            step = time.perf_counter()
+            file_name = generate_filename(os.path.basename(path), False, '', output_format)
+            summary['outputs'] = [
+                export_output(out_dir, file_name, stem, table_export, cleaned_df, output_format, sheet_name='Cleaned_Data')
+            ]
+        else:
+            run = run_phones if mode == 'phones' else run_mapped
+            outputs = run(data, options)
+            cleaned_df, scrubbed_df = outputs['cleaned'], outputs.get('scrubbed')
+            summary['kept'] = len(cleaned_df)
+            summary['removed'] = len(outputs['discard']) + (len(scrubbed_df) if scrubbed_df is not None else 0)
+            summary['process_s'] = time.perf_counter() - step - (summary['read_s'] - read_before)
+
+            step = time.perf_counter()
+            summary['outputs'] = write_phone_outputs(
+                out_dir, stem, cleaned_df, outputs['discard'], outputs['qa_summary'], outputs['qa_details'],
+                outputs['previous'], scrubbed_df, output_format
+            )
+        summary['write_s'] = time.perf_counter() - step
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+
+    summary['total_s'] = time.perf_counter() - started
+    return summary
+
+# ---------- COMMAND LINE ----------
+def print_summary(results, wall_time):
+    """Print a per-file timing table"""
+    header = f"{'File':<40} {'Rows':>9} {'Kept':>9} {'Removed':>9} {'Read s':>8} {'Proc s':>8} {'Write s':>8} {'Total s':>8}"
+    print()
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        name = os.path.basename(result['file'])[:40]
+        if result['error']:
+            print(f"{name:<40} ❌ {result['error']}")
+            continue
+        print(
+            f"{name:<40} {result['rows']:>9,} {result['kept']:>9,} {result['removed']:>9,} "
+            f"{result['read_s']:>8.2f} {result['process_s']:>8.2f} {result['write_s']:>8.2f} {result['total_s']:>8.2f}"
+        )
+        for path, export_s in result['outputs']:
+            print(f"  ↳ {os.path.basename(path)} exported in {export_s:.2f}s")
+    print('-' * len(header))
+    total_rows = sum(result['rows'] for result in results)
+    print(f"{len(results)} file(s), {total_rows:,} rows in {wall_time:.2f}s wall time")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process land lists without the Streamlit UI")
+    parser.add_argument('mode', choices=['phones', 'mapped', 'scrub'],
+                        help="phones: app.py processor, mapped: NEWSCRUBBER processor, scrub: entity scrubber")
+    parser.add_argument('inputs', nargs='+', help="Input files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', required=True, help="Directory for the output files")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--mapping', help="mapped mode: JSON file with 'columns' and 'phones' mappings "
+                                          "(default: the mapping saved for the file's header, else suggestions)")
+    parser.add_argument('--owner-column', help="scrub mode and --scrub: owner name column (default: auto-detect)")
+    parser.add_argument('--keywords', help="scrub mode and --scrub: text file with additional keywords, one per line")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help="Stream each input file in chunks of this many rows to bound memory on large files")
+    parser.add_argument('--skip-exported', action='store_true',
+                        help="phones/mapped: set aside contacts already in earlier cleaned files, and record the new ones")
+    parser.add_argument('--suppress', help="phones/mapped: do-not-contact list (.csv/.txt/.xlsx) whose numbers are dropped")
+    parser.add_argument('--scrub', action='store_true',
+                        help="phones/mapped: drop entity owners before phone processing and write them to their own file")
+    parser.add_argument('--consolidate', action='store_true',
+                        help="phones/mapped: one cleaned contact per owner name + mailing address, with its parcel "
+                             "count, total acreage and APN list")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="phones/mapped: split a single file of LANDLIST_SHARD_MIN_ROWS rows or more into this many "
+                             "row shards across the workers (default: not split)")
+    parser.add_argument('--format', choices=list(FORMAT_CHOICES), default='xlsx',
+                        help="Format of the output files (default: xlsx)")
+    args = parser.parse_args(argv)
+    if args.scrub and args.mode == 'scrub':
+        parser.error("--scrub only applies to phones and mapped modes")
+    if args.consolidate and args.mode == 'scrub':
+        parser.error("--consolidate only applies to phones and mapped modes")
+    if args.shards and args.chunk_rows:
+        parser.error("--shards cannot be combined with --chunk-rows")
+    if args.scrub and args.chunk_rows:
+        # The pipeline runs over one in-memory frame
+        parser.error("--scrub cannot be combined with --chunk-rows")
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        parser.error("no .xlsx/.xls/.csv/.tsv/.csv.gz/.tsv.gz/.parquet input files found")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = min(args.workers or os.cpu_count() or 1, len(files))
+    options = {
+        'owner_column': args.owner_column, 'chunk_rows': args.chunk_rows, 'skip_exported': args.skip_exported,
+        'scrub': args.scrub, 'consolidate': args.consolidate, 'format': FORMAT_CHOICES[args.format],
+        'shards': args.shards,
+        # Several files already keep the cores busy one file each; a single file is sharded across them instead
+        'shard_workers': (args.workers or os.cpu_count() or 1) if len(files) == 1 else 1
+    }
+    if args.mapping:
+        with open(args.mapping, encoding='utf-8') as handle:
+            options['mapping'] = json.load(handle)
+    if args.keywords:
+        with open(args.keywords, encoding='utf-8') as handle:
+            options['keywords'] = handle.read()
+    if args.suppress:
+        # Saved once here, so the workers only map the array in
+        print(f"🚫 {len(load_suppression(args.suppress)):,} numbers suppressed")
+        options['suppress'] = args.suppress
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, args.mode, path, args.output_dir, options) for path in files]
+        for future in as_completed(futures):
+            result = future.result()
+            status = f"❌ {result['error']}" if result['error'] else f"✅ {result['total_s']:.2f}s"
+            print(f"{os.path.basename(result['file'])}: {status}", flush=True)
+            results.append(result)
+
+    results.sort(key=lambda result: files.index(result['file']))
+    print_summary(results, time.perf_counter() - started)
+    return 1 if any(result['error'] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
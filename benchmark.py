@@ -0,0 +1,243 @@
+"""Benchmark suite for the processing hot paths, on synthetic land lists.
+
+Times the phone processors, the QA report, the entity scrubber, owner
+consolidation and Excel read/write at several list sizes and writes the results as JSON, so runs on
+different commits can be compared:
+
+    python benchmark.py -o bench_main.json
+    python benchmark.py -o bench_branch.json --baseline bench_main.json
+    python benchmark.py --sizes 10000 --only process_excel_file,needs_scrub
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import app
+from batch_process import load_newscrubber
+from consolidation import consolidate_owners
+from dedup_index import record_exported, split_previously_exported
+from file_io import excel_export
+from scrub_engine import get_scrub_patterns, needs_scrub, scrub_mask
+from suppression import phone_numbers
+from synthetic_data import column_mapping, make_land_list
+
+# ---------- CONFIGURATION ----------
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Excel read/write manage a few thousand rows/s, so larger sizes are skipped unless asked for
+DEFAULT_EXCEL_MAX_ROWS = 100_000
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ---------- HELPER FUNCTIONS ----------
+def quiet_progress(percent, message):
+    """Progress callback for benchmark runs"""
+
+def git_commit():
+    """Short hash of the checked-out commit, marked -dirty with uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+def best_time(func, repeat):
+    """Fastest of `repeat` runs of func, in seconds"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+# ---------- BENCHMARKS ----------
+def bench_process_excel_file(data):
+    df = data['landportal']
+    return lambda: app.process_excel_file(app.typed_input(df), progress=quiet_progress)
+
+def bench_process_data_with_mapping(data):
+    newscrubber = load_newscrubber()
+    df = data['custom']
+    mapping = column_mapping('custom')
+    columns, phones = mapping['columns'], mapping['phones']
+
+    def run():
+        typed = newscrubber.typed_input_flexible(df, columns, phones)
+        return newscrubber.process_data_with_mapping(typed, columns, phones, progress=quiet_progress)
+    return run
+
+def bench_process_suppressed(data):
+    df = data['landportal']
+    # A do-not-contact list ten times the list size, holding about one in ten of its numbers
+    rng = np.random.default_rng(data['seed'])
+    listed = phone_numbers(df[[phone_col for phone_col, _ in app.phone_columns]])
+    listed = listed[rng.random(len(listed)) < 0.1]
+    filler = rng.integers(2_000_000_000, 9_999_999_999, size=10 * len(df))
+    suppressed = np.unique(np.concatenate([listed, filler]))
+    return lambda: app.process_excel_file(app.typed_input(df), progress=quiet_progress, suppressed=suppressed)
+
+def bench_generate_qa_data(data):
+    df = data['landportal']
+    cleaned_df, discard_df, _, _, _ = app.process_excel_file(app.typed_input(df), progress=quiet_progress)
+    # Without the classifier's counters, as the QA report is built for outside results
+    return lambda: app.generate_qa_data(df, cleaned_df, discard_df)
+
+def bench_dedup_lookup(data):
+    cleaned_df = app.process_excel_file(app.typed_input(data['landportal']), progress=quiet_progress)[0]
+    # An index holding the list's own contacts plus as many again from another pull
+    handle, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    data.setdefault('cleanup', []).extend([path, path + '-wal', path + '-shm'])
+    other_pull = make_land_list(len(data['landportal']), seed=data['seed'] + 1)
+    other_df = app.process_excel_file(app.typed_input(other_pull), progress=quiet_progress)[0]
+    record_exported(other_df, 'other pull', path)
+    record_exported(cleaned_df, 'this pull', path)
+    return lambda: split_previously_exported(cleaned_df, path)
+
+def bench_needs_scrub(data):
+    names = data['landportal']['Owner 1 Full Name'].tolist()
+    patterns = get_scrub_patterns()
+    return lambda: [needs_scrub(name, patterns) for name in names]
+
+def bench_scrub_mask(data):
+    names = data['landportal']['Owner 1 Full Name']
+    patterns = get_scrub_patterns()
+    return lambda: scrub_mask(names, patterns)
+
+def bench_scrub_mask_cached(data):
+    names = data['landportal']['Owner 1 Full Name']
+    patterns = get_scrub_patterns()
+    # Verdicts saved by an earlier file from the same region, then by this file's first run
+    cache_dir = tempfile.mkdtemp()
+    data.setdefault('cleanup', []).append(cache_dir)
+    other_pull = make_land_list(len(names), seed=data['seed'] + 1)
+    scrub_mask(other_pull['Owner 1 Full Name'], patterns, cached=True, cache_dir=cache_dir)
+    scrub_mask(names, patterns, cached=True, cache_dir=cache_dir)
+    return lambda: scrub_mask(names, patterns, cached=True, cache_dir=cache_dir)
+
+def bench_consolidate_owners(data):
+    cleaned_df = app.process_excel_file(app.typed_input(data['landportal']), progress=quiet_progress)[0]
+    # Owners are grouped by their key codes, so rows/s stays flat from one size to the next
+    return lambda: consolidate_owners(cleaned_df)
+
+def bench_excel_write(data):
+    df = data['landportal']
+    return lambda: excel_export(df).close()
+
+def bench_excel_read(data):
+    with excel_export(data['landportal']) as exported:
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        with os.fdopen(handle, 'wb') as output:
+            output.write(exported.read())
+    data.setdefault('cleanup', []).append(path)
+    return lambda: pd.read_excel(path)
+
+# name: (setup returning the timed callable, reads or writes Excel)
+BENCHMARKS = {
+    'process_excel_file': (bench_process_excel_file, False),
+    'process_data_with_mapping': (bench_process_data_with_mapping, False),
+    'process_suppressed': (bench_process_suppressed, False),
+    'generate_qa_data': (bench_generate_qa_data, False),
+    'dedup_lookup': (bench_dedup_lookup, False),
+    'needs_scrub': (bench_needs_scrub, False),
+    'scrub_mask': (bench_scrub_mask, False),
+    'scrub_mask_cached': (bench_scrub_mask_cached, False),
+    'consolidate_owners': (bench_consolidate_owners, False),
+    'excel_write': (bench_excel_write, True),
+    'excel_read': (bench_excel_read, True),
+}
+
+def run_size(rows, names, repeat, excel_max_rows, seed):
+    """Run the selected benchmarks on one synthetic list size"""
+    data = {
+        'landportal': make_land_list(rows, seed=seed),
+        'custom': make_land_list(rows, seed=seed, layout='custom'),
+        'seed': seed,
+    }
+    results = []
+    try:
+        for name in names:
+            setup, uses_excel = BENCHMARKS[name]
+            if uses_excel and rows > excel_max_rows:
+                print(f"{name:<28}{rows:>12,}  skipped (--excel-max-rows {excel_max_rows:,})", flush=True)
+                continue
+            seconds = best_time(setup(data), repeat)
+            results.append({'benchmark': name, 'rows': rows, 'seconds': round(seconds, 4),
+                            'rows_per_s': round(rows / seconds) if seconds else None})
+            print(f"{name:<28}{rows:>12,}{seconds:>10.3f}s{rows / seconds:>14,.0f} rows/s", flush=True)
+    finally:
+        for path in data.get('cleanup', []):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+    return results
+
+def compare(results, baseline):
+    """Print each result next to the same benchmark and size in a baseline run"""
+    previous = {(entry['benchmark'], entry['rows']): entry['seconds'] for entry in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for entry in results:
+        before = previous.get((entry['benchmark'], entry['rows']))
+        if before is None:
+            continue
+        ratio = before / entry['seconds'] if entry['seconds'] else float('inf')
+        print(f"{entry['benchmark']:<28}{entry['rows']:>12,}{before:>10.3f}s →{entry['seconds']:>9.3f}s  {ratio:.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the land list processors on synthetic data")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated row counts (default: 10000,100000,1000000)")
+    parser.add_argument('--only', help=f"Comma-separated benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark; the fastest is reported")
+    parser.add_argument('--excel-max-rows', type=int, default=DEFAULT_EXCEL_MAX_ROWS,
+                        help="Skip Excel read/write above this many rows")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = []
+    for rows in sizes:
+        results.extend(run_size(rows, names, args.repeat, args.excel_max_rows, args.seed))
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': f"{platform.machine()} {os.cpu_count()} cores",
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            compare(results, json.load(handle))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""One contact per owner for landowners that show up once per parcel.
+
+A county pull lists a large landowner once for every parcel they own, so
+the cleaned file would text the same person on the same phones dozens of
+times. Consolidation groups the cleaned rows on a normalized owner name +
+mailing address key and keeps one contact per owner, with:
+
+- ParcelCount, the number of rows merged into it
+- Acreage, the total of their acreage
+- APN, their distinct APNs joined by APN_DELIMITER
+- Phone1-3, their first three distinct phones in row order
+
+Keys are grouped in one hash pass (pd.factorize) and every total is a
+bincount or a hashed groupby over the group codes, so rows are never
+compared with each other and the work grows linearly with the rows. Rows
+without an owner name or a mailing address are kept as they are.
+"""
+import numpy as np
+import pandas as pd
+
+from dedup_index import text_column
+
+# ---------- CONFIGURATION ----------
+APN_DELIMITER = '; '
+
+# Launch Control takes 3 phones per contact
+PHONE_COLUMNS = ['Phone1', 'Phone2', 'Phone3']
+
+# ---------- KEYS ----------
+def owner_keys(df):
+    """Consolidation key of each cleaned-layout row: owner name + mailing address, None where either is missing.
+
+    Names and addresses are compared case-, spacing- and punctuation-
+    insensitively, on the first 5 digits of the ZIP code.
+    """
+    name = (text_column(df, 'FirstName') + ' ' + text_column(df, 'LastName')).str.strip()
+    address = text_column(df, 'MailingAddress').str.replace(r'[^\w ]', '', regex=True).str.strip()
+    zip_code = text_column(df, 'MailingZip').str[:5]
+    keys = name + '|' + address + '|' + text_column(df, 'MailingCity') + '|' + text_column(df, 'MailingState') + \
+        '|' + zip_code
+    return keys.astype(object).where((name != '') & (address != ''), None)
+
+def group_codes(df, by=None):
+    """Owner group of each row (numbered 0, 1... in the order of their first rows) and those first rows' positions.
+
+    by lists columns (or arrays aligned with the rows) that rows must also
+    share to be merged, such as the property county in a place split.
+    Rows without a key get a group of their own.
+    """
+    keys = owner_keys(df)
+    keyed = keys.notna()
+    for labels in by or []:
+        labels = text_column(df, labels) if isinstance(labels, str) else pd.Series(labels, index=df.index).astype(str)
+        keys = keys + '|' + labels
+    codes, uniques = pd.factorize(keys)
+    codes = codes.astype(np.int64)
+    unkeyed = ~keyed.to_numpy()
+    codes[unkeyed] = len(uniques) + np.arange(int(unkeyed.sum()))
+
+    # Renumber groups by their first row, so consolidated contacts keep the file's order
+    rows = np.arange(len(df))
+    first = np.full(len(uniques) + int(unkeyed.sum()), len(df))
+    np.minimum.at(first, codes, rows)
+    first_rows = np.flatnonzero(first[codes] == rows)
+    order = np.empty(len(first), dtype=np.int64)
+    order[codes[first_rows]] = np.arange(len(first_rows))
+    return order[codes], first_rows
+
+def joined_groups(groups, values, group_count, delimiter):
+    """(group numbers, their values joined by delimiter in row order) of the groups that have values.
+
+    Values are laid out group by group with a counting sort and each run
+    concatenated by one np.add.reduceat, so no Python code runs per group.
+    """
+    ranks = pd.Series(groups).groupby(groups, sort=False).cumcount().to_numpy()
+    sizes = np.bincount(groups, minlength=group_count)
+    starts = np.cumsum(sizes) - sizes
+    order = np.empty(len(groups), dtype=np.int64)
+    order[starts[groups] + ranks] = np.arange(len(groups))
+    text = np.asarray(values, dtype=object)[order]
+    last = (ranks == sizes[groups] - 1)[order]
+    text = np.where(last, text, text + delimiter)
+    present = np.flatnonzero(sizes)
+    if not len(present):
+        return present, text
+    return present, np.add.reduceat(text, starts[present])
+
+# ---------- CONSOLIDATION ----------
+def consolidate_owners(cleaned_df, by=None):
+    """Cleaned file with one row per owner (see module docstring), plus a ParcelCount column.
+
+    Each contact keeps the index label and the property details of its
+    owner's first row; owners with a single row are left unchanged.
+    """
+    if cleaned_df.empty:
+        return cleaned_df
+    groups, first_rows = group_codes(cleaned_df, by)
+    counts = np.bincount(groups, minlength=len(first_rows))
+    consolidated = cleaned_df.iloc[first_rows].copy()
+    consolidated['ParcelCount'] = counts
+    merged = counts > 1
+    if not merged.any():
+        return consolidated
+    merged_rows = merged[groups]
+
+    # Acreage totals, where an owner's rows have any acreage
+    if 'Acreage' in cleaned_df.columns:
+        acres = pd.to_numeric(cleaned_df['Acreage'], errors='coerce').to_numpy(dtype='float64')
+        known = ~np.isnan(acres)
+        totals = np.bincount(groups[known], weights=acres[known], minlength=len(counts)).round(4)
+        has_acres = np.bincount(groups[known], minlength=len(counts)) > 0
+        replace = merged & has_acres
+        acreage = consolidated['Acreage']
+        # Whole-acre columns take fractional totals
+        acreage = acreage.to_numpy(dtype='float64', copy=True) if pd.api.types.is_numeric_dtype(acreage.dtype) else \
+            acreage.astype(object).to_numpy().copy()
+        acreage[replace] = totals[replace]
+        consolidated['Acreage'] = acreage
+
+    # Distinct APNs of each owner, in row order
+    if 'APN' in cleaned_df.columns:
+        apns = pd.DataFrame({'group': groups[merged_rows], 'apn': text_column(cleaned_df, 'APN').to_numpy()[merged_rows]})
+        apns = apns[apns['apn'] != ''].drop_duplicates()
+        apn_groups, joined = joined_groups(
+            apns['group'].to_numpy(), apns['apn'].to_numpy(dtype=object), len(counts), APN_DELIMITER
+        )
+        apn_column = consolidated['APN'].astype(object).to_numpy().copy()
+        apn_column[apn_groups] = joined
+        consolidated['APN'] = apn_column
+
+    # Distinct phones of each owner in row order, first three kept; the first row's phones come first,
+    # so slots past an owner's distinct phones were empty in its first row and stay as they are
+    phone_columns = [col for col in PHONE_COLUMNS if col in cleaned_df.columns]
+    if phone_columns:
+        values = cleaned_df[phone_columns].astype(object).to_numpy()[merged_rows]
+        phones = pd.DataFrame({
+            'group': np.repeat(groups[merged_rows], len(phone_columns)), 'phone': values.ravel()
+        })
+        phones = phones[phones['phone'].notna() & (phones['phone'] != '')].drop_duplicates()
+        phones['slot'] = phones.groupby('group', sort=False).cumcount()
+        phones = phones[phones['slot'] < len(phone_columns)]
+        for slot, col in enumerate(phone_columns):
+            picked = phones[phones['slot'] == slot]
+            column = consolidated[col].astype(object).to_numpy().copy()
+            column[picked['group'].to_numpy()] = picked['phone'].to_numpy()
+            consolidated[col] = pd.Series(column, index=consolidated.index).astype(consolidated[col].dtype)
+
+    return consolidated
+
+# ---------- QA ----------
+def parcel_rows(cleaned_df):
+    """Rows a cleaned file stands for: its ParcelCount total once consolidated, else its row count"""
+    if 'ParcelCount' in cleaned_df.columns:
+        return int(cleaned_df['ParcelCount'].sum())
+    return len(cleaned_df)
+
+def consolidation_summary(qa_summary, cleaned_df):
+    """QA summary with the owner contacts of a consolidated cleaned file after its contact count (unchanged otherwise)"""
+    if 'ParcelCount' not in cleaned_df.columns:
+        return qa_summary
+    owners = pd.DataFrame([
+        ['Owner Contacts in Cleaned File (Consolidated)', f"{len(cleaned_df):,}"],
+        ['Parcels Merged into Owner Contacts', f"{parcel_rows(cleaned_df) - len(cleaned_df):,}"],
+    ], columns=qa_summary.columns)
+    position = int(np.flatnonzero(qa_summary['QA CHECK'] == 'Contacts in Cleaned File')[0]) + 1
+    return pd.concat([qa_summary.iloc[:position], owners, qa_summary.iloc[position:]], ignore_index=True)
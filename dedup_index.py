@@ -0,0 +1,266 @@
+"""Persistent index of contacts already exported in cleaned files.
+
+Every downloaded cleaned file adds its match keys; new uploads are checked
+against the index so owners already texted from an overlapping county pull
+go to a separate "previously exported" file. Earlier cleaned files can be
+added by hand:
+
+    python dedup_index.py add processed/*LCT.xlsx
+    python dedup_index.py stats
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ---------- CONFIGURATION ----------
+DEDUP_INDEX_PATH = os.environ.get('LANDLIST_DEDUP_INDEX') or \
+    os.path.join(os.path.expanduser('~'), '.landlist', 'exported_keys.sqlite3')
+
+# Keys per lookup query, under SQLite's limit of 32,766 bound parameters
+LOOKUP_BATCH = 30_000
+
+# 64-bit FNV-1a, run over Unicode code points
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+COUNTY_SUFFIX = r'\s+(?:COUNTY|PARISH|BOROUGH)$'
+
+# Runs of whitespace collapsed in key text (\s as the Arrow-backed string columns match it)
+WHITESPACE = r'[ \t\n\r\f]+'
+
+# ---------- MATCH KEYS ----------
+def _cell_text(value):
+    """Cell as text: missing cells empty, whole-number floats without the .0 (APNs read as numbers)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _label_text(labels):
+    """Distinct cell values as text, vectorized for text, integer and float columns"""
+    if pd.api.types.is_bool_dtype(labels.dtype) or pd.api.types.infer_dtype(labels) not in ('string', 'integer', 'floating'):
+        return pd.Series([_cell_text(value) for value in labels], dtype='str')
+    if pd.api.types.infer_dtype(labels) != 'floating':
+        return labels.astype('str')
+    numbers = labels.to_numpy(dtype='float64')
+    text = labels.astype('str').to_numpy(dtype=object)
+    whole = np.isfinite(numbers) & (numbers == np.trunc(numbers)) & (np.abs(numbers) < 1e18)
+    text[whole] = numbers[whole].astype(np.int64).astype(str)
+    return pd.Series(text, dtype='str')
+
+def key_text(value):
+    """One cell as text_column cleans it: uppercase with single spaces, '' where missing (or a literal 'nan')"""
+    text = re.sub(WHITESPACE, ' ', _cell_text(value)).strip().upper()
+    return '' if text == 'NAN' else text
+
+def text_column(df, col):
+    """Column as uppercase text with single spaces, '' where missing (or a literal 'nan')"""
+    if not col or col not in df.columns:
+        return pd.Series('', index=df.index, dtype='str')
+    # Places repeat a handful of labels and owners own several parcels, so clean each distinct value once
+    codes, uniques = pd.factorize(df[col])
+    labels = pd.concat([_label_text(pd.Series(uniques)), pd.Series([''], dtype='str')], ignore_index=True)
+    labels = labels.str.replace(WHITESPACE, ' ', regex=True).str.strip().str.upper()
+    labels = labels.where(labels != 'NAN', '')
+    # Code -1 (missing) takes the trailing ''
+    return pd.Series(labels.take(codes).array, index=df.index)
+
+def match_keys(df, apn_col='APN', first_col='FirstName', last_col='LastName', full_name_col=None,
+               state_col='PropertyState', county_col='PropertyCounty'):
+    """Columnar get_match_key: the APN, else the owner full name, else first + last name.
+
+    APNs are only unique within a county, so APN keys carry the state and
+    county. Names are compared case- and spacing-insensitively. Rows with
+    neither an APN nor a name get None and never match.
+    """
+    apn = text_column(df, apn_col)
+    county = text_column(df, county_col).str.replace(COUNTY_SUFFIX, '', regex=True)
+    place = text_column(df, state_col) + '|' + county
+    full = text_column(df, full_name_col)
+    name = (text_column(df, first_col) + ' ' + text_column(df, last_col)).str.strip()
+
+    keys = ('NAME:' + name).where(name != '')
+    keys = ('NAME:' + full).where(full != '', keys)
+    keys = ('APN:' + place + '|' + apn).where(apn != '', keys)
+    return keys.astype(object).where(keys.notna(), None)
+
+def match_key(apn, full_name=None, first=None, last=None, state=None, county=None):
+    """match_keys of one contact from its cell values, for callers holding a single row"""
+    apn = key_text(apn)
+    if apn:
+        return f"APN:{key_text(state)}|{re.sub(COUNTY_SUFFIX, '', key_text(county))}|{apn}"
+    full = key_text(full_name)
+    if full:
+        return f"NAME:{full}"
+    name = f"{key_text(first)} {key_text(last)}".strip()
+    return f"NAME:{name}" if name else None
+
+def key_hashes(keys):
+    """64-bit hashes of an array of key strings, computed column by column over the code points"""
+    text = np.asarray(keys, dtype=str)
+    if text.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    width = text.dtype.itemsize // 4
+    lengths = np.char.str_len(text)
+    points = text.view(np.uint32).reshape(len(text), width)
+    hashes = np.full(len(text), FNV_OFFSET, dtype=np.uint64)
+    for i in range(width):
+        hashes = np.where(lengths > i, (hashes ^ points[:, i]) * FNV_PRIME, hashes)
+    return hashes.view(np.int64)
+
+# ---------- INDEX ----------
+def open_index(path=None):
+    """Connection to the index, creating it on first use"""
+    path = path or DEDUP_INDEX_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=60)
+    # WAL lets the apps read while a batch run adds keys
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS exports ('
+        'id INTEGER PRIMARY KEY, exported_at TEXT NOT NULL, source TEXT, keys_added INTEGER NOT NULL)'
+    )
+    # Keys are the rowid, so the table is a single B-tree of 64-bit hashes
+    connection.execute('CREATE TABLE IF NOT EXISTS exported_keys (key INTEGER PRIMARY KEY, export_id INTEGER NOT NULL)')
+    return connection
+
+def _lookup(connection, unique):
+    """Export id of every hash of a sorted unique array already in the index, 0 for new ones"""
+    found = np.zeros(len(unique), dtype=np.int64)
+    # Sorted batches walk the B-tree in order, so each lookup touches few new pages
+    for start in range(0, len(unique), LOOKUP_BATCH):
+        batch = unique[start:start + LOOKUP_BATCH].tolist()
+        rows = connection.execute(
+            f"SELECT key, export_id FROM exported_keys WHERE key IN ({','.join('?' * len(batch))})", batch
+        ).fetchall()
+        if rows:
+            keys, export_ids = zip(*rows)
+            found[np.searchsorted(unique, keys)] = export_ids
+    return found
+
+def _record(connection, unique, source):
+    """Add unique hashes to the index as one export, inside the connection's transaction; returns how many were new"""
+    export_id = connection.execute(
+        'INSERT INTO exports (exported_at, source, keys_added) VALUES (?, ?, 0)',
+        (datetime.now().isoformat(timespec='seconds'), source)
+    ).lastrowid
+    before = connection.total_changes
+    connection.executemany(
+        'INSERT OR IGNORE INTO exported_keys (key, export_id) VALUES (?, ?)',
+        ((key, export_id) for key in unique.tolist())
+    )
+    added = connection.total_changes - before
+    connection.execute('UPDATE exports SET keys_added = ? WHERE id = ?', (added, export_id))
+    return added
+
+def lookup_hashes(hashes, path=None):
+    """Export id of every hash already in the index, 0 for new ones"""
+    unique, positions = np.unique(hashes, return_inverse=True)
+    if not len(unique) or not os.path.exists(path or DEDUP_INDEX_PATH):
+        return np.zeros(len(hashes), dtype=np.int64)
+    with closing(open_index(path)) as connection:
+        return _lookup(connection, unique)[positions]
+
+def record_hashes(hashes, source, path=None):
+    """Add hashes to the index as one export; returns how many were new"""
+    with closing(open_index(path)) as connection, connection:
+        return _record(connection, np.unique(hashes), source)
+
+def lookup_and_record(hashes, source, path=None):
+    """lookup_hashes, then record_hashes of the new hashes, as one transaction.
+
+    The write lock is taken before the lookup, so concurrent runs (batch
+    workers) check and record one after another and never both treat a
+    contact as new.
+    """
+    unique, positions = np.unique(hashes, return_inverse=True)
+    with closing(open_index(path)) as connection, connection:
+        connection.execute('BEGIN IMMEDIATE')
+        found = _lookup(connection, unique)
+        if not found.all():
+            _record(connection, unique[found == 0], source)
+    return found[positions]
+
+def index_stats(path=None):
+    """Keys in the index and the exports they came from, without creating the index"""
+    if not os.path.exists(path or DEDUP_INDEX_PATH):
+        return 0, 0
+    with closing(open_index(path)) as connection:
+        keys, exports = connection.execute('SELECT COALESCE(SUM(keys_added), 0), COUNT(*) FROM exports').fetchone()
+    return keys, exports
+
+# ---------- CLEANED FILES ----------
+def split_previously_exported(cleaned_df, path=None, record_as=None):
+    """Split a cleaned file into new contacts and contacts already in an earlier export.
+
+    The previously exported rows get an ExportedOn column with the date of
+    the export that first contained them. With record_as (a source name),
+    the new contacts are recorded as exported in the same transaction (see
+    lookup_and_record), for runs that export without a download.
+    """
+    if cleaned_df.empty:
+        return cleaned_df, pd.DataFrame()
+
+    keys = match_keys(cleaned_df)
+    keyed = keys.notna().to_numpy()
+    export_ids = np.zeros(len(cleaned_df), dtype=np.int64)
+    hashes = key_hashes(keys[keyed].to_numpy())
+    if record_as is None:
+        export_ids[keyed] = lookup_hashes(hashes, path)
+    elif len(hashes):
+        export_ids[keyed] = lookup_and_record(hashes, record_as, path)
+    previous = export_ids > 0
+    if not previous.any():
+        return cleaned_df, pd.DataFrame()
+
+    with closing(open_index(path)) as connection:
+        dates = dict(connection.execute('SELECT id, substr(exported_at, 1, 10) FROM exports'))
+    previous_df = cleaned_df[previous].copy()
+    previous_df['ExportedOn'] = [dates.get(export_id, '') for export_id in export_ids[previous]]
+    return cleaned_df[~previous], previous_df
+
+def record_exported(cleaned_df, source, path=None):
+    """Add the contacts of an exported cleaned file to the index; returns how many were new"""
+    keys = match_keys(cleaned_df).dropna()
+    if keys.empty:
+        return 0
+    return record_hashes(key_hashes(keys.to_numpy()), source, path)
+
+def record_on_download(cleaned_df, file_name, parcels_df=None):
+    """Download button arguments recording a cleaned file's contacts as exported on click, so later uploads skip them.
+
+    Consolidated owners record every parcel row they were merged from (parcels_df).
+    """
+    return {'on_click': record_exported, 'args': (parcels_df if parcels_df is not None else cleaned_df, file_name)}
+
+# ---------- COMMAND LINE ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the index of previously exported contacts")
+    parser.add_argument('command', choices=['add', 'stats'],
+                        help="add: index the contacts of cleaned files, stats: show the index size")
+    parser.add_argument('files', nargs='*', help="add: cleaned (LCT) .xlsx files")
+    parser.add_argument('--index', default=None, help=f"Index file (default: {DEDUP_INDEX_PATH})")
+    args = parser.parse_args(argv)
+
+    if args.command == 'add':
+        if not args.files:
+            parser.error("add needs at least one cleaned file")
+        for file_path in args.files:
+            cleaned_df = pd.read_excel(file_path)
+            added = record_exported(cleaned_df, os.path.basename(file_path), args.index)
+            print(f"{os.path.basename(file_path)}: {added:,} new of {len(cleaned_df):,} contacts")
+
+    keys, exports = index_stats(args.index)
+    print(f"{keys:,} contacts from {exports:,} exports in {args.index or DEDUP_INDEX_PATH}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
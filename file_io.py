@@ -0,0 +1,746 @@
+import gzip
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from phone_engine import phone_strings
+from sharding import process_pool
+from staging import content_hash, find_staged, read_staged, stage_excel, staged_info
+
+# ---------- CONFIGURATION ----------
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+
+# Upload types the apps accept; .gz uploads are gzip-compressed CSV or TSV
+INPUT_TYPES = ['xlsx', 'xls', 'csv', 'tsv', 'gz', 'parquet']
+
+# Output formats offered for the cleaned, discard and QA files: extension and MIME type
+OUTPUT_FORMATS = {
+    'Excel': ('.xlsx', XLSX_MIME),
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+CSV_WRITE_OPTIONS = pacsv.WriteOptions(quoting_style='needed')
+
+# Rows per chunk when streaming large workbooks
+STREAM_CHUNK_ROWS = 50_000
+
+# Loaded uploads kept in memory for Streamlit reruns, by total frame size
+PARSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Uploads whose sheet lists are kept for reruns
+SHEETS_CACHE_SIZE = 64
+
+# Rows converted per block when streaming a frame into a workbook
+WRITE_BLOCK_ROWS = 10_000
+
+# Exports larger than this spill from memory to a temporary file
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+# Cell strings pd.read_excel reads as missing by default
+EXCEL_NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+# CSV text read as a float: a number with a decimal point and no leading zeros ('0012.30' stays text)
+DECIMAL_TEXT = r'^\s*[-+]?((0|[1-9]\d*)\.\d*|\.\d+)\s*$'
+
+# CSV columns never read as floats, whatever their text: parcel numbers, ZIP codes and other identifiers
+IDENTIFIER_COLUMNS = re.compile(r'apn|parcel|zip|postal|fips|\bid\b', re.IGNORECASE)
+
+# ---------- CSV AND PARQUET INPUT ----------
+def _table_format(source):
+    """'csv', 'tsv' or 'parquet' for delimited text and Parquet files, None for workbooks"""
+    name = _source_name(source).lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith(('.csv', '.tsv')):
+        return name[-3:]
+    return None
+
+def is_excel_file(source):
+    return _table_format(source) is None
+
+def _input_stream(source):
+    """Arrow stream over a path or an upload's bytes, decompressed when the name ends in .gz"""
+    stream = pa.BufferReader(source.getbuffer()) if hasattr(source, 'getbuffer') else pa.OSFile(str(source))
+    if _source_name(source).lower().endswith('.gz'):
+        stream = pa.CompressedInputStream(stream, 'gzip')
+    return stream
+
+def _csv_options(source, columns=None):
+    """pyarrow CSV options reading every cell as text, with the header named like pd.read_excel would.
+
+    Typing every column as text keeps leading zeros in ZIP codes and parcel
+    numbers and means a column that turns from numbers to text further down
+    the file cannot fail the read.
+    """
+    parse = pacsv.ParseOptions(delimiter='\t' if _table_format(source) == 'tsv' else ',')
+    with _input_stream(source) as stream:
+        header = pacsv.open_csv(stream, parse_options=parse).schema.names
+    names = _header_names([name if name != '' else None for name in header])
+    read = pacsv.ReadOptions(column_names=names, skip_rows=1)
+    convert = pacsv.ConvertOptions(
+        column_types={name: pa.string() for name in names},
+        null_values=sorted(EXCEL_NA_VALUES),
+        strings_can_be_null=True,
+        include_columns=None if columns is None else [name for name in names if name in set(columns)],
+    )
+    return read, parse, convert
+
+def _table_batches(source, columns=None, batch_rows=STREAM_CHUNK_ROWS):
+    """Stream a CSV or Parquet file as Arrow record batches"""
+    if _table_format(source) == 'parquet':
+        yield from pq.ParquetFile(_input_stream(source)).iter_batches(
+            batch_size=batch_rows, columns=None if columns is None else list(columns)
+        )
+        return
+    read, parse, convert = _csv_options(source, columns)
+    with _input_stream(source) as stream:
+        yield from pacsv.open_csv(stream, read_options=read, parse_options=parse, convert_options=convert)
+
+def _decimal_names(source, columns=None):
+    """Columns of a CSV file read as floats: those whose first block of rows is all decimal text.
+
+    A phone column pandas wrote as floats reads back as '5551234567.0',
+    which would not normalize as text. Deciding from the first block once
+    types every chunk of a streamed file the same as a whole read; columns
+    of whole numbers and identifier columns (IDENTIFIER_COLUMNS) stay text,
+    so ZIP codes and parcel numbers keep their leading zeros.
+    """
+    read, parse, convert = _csv_options(source, columns)
+    with _input_stream(source) as stream:
+        reader = pacsv.open_csv(stream, read_options=read, parse_options=parse, convert_options=convert)
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            return []
+    return [
+        name for name, column in zip(batch.schema.names, batch.columns)
+        if not IDENTIFIER_COLUMNS.search(name) and column.null_count < len(column)
+        and pc.all(pc.match_substring_regex(column, DECIMAL_TEXT)).as_py()
+    ]
+
+def _decimal_columns(df, table, decimals):
+    """Set the decimal columns of a CSV frame (see _decimal_names) from its Arrow table.
+
+    Text further down that is not decimal stays text, so a value is typed
+    the same way whichever chunk it falls in.
+    """
+    for name in decimals:
+        column = table.column(name)
+        decimal = pc.fill_null(pc.match_substring_regex(column, DECIMAL_TEXT), False)
+        numbers = pc.cast(pc.if_else(decimal, pc.utf8_trim_whitespace(column), None), pa.float64())
+        if pc.all(pc.or_(decimal, pc.is_null(column))).as_py():
+            df[name] = numbers.to_numpy(zero_copy_only=False)
+        else:
+            values = df[name].astype(object)
+            mask = decimal.to_numpy(zero_copy_only=False)
+            values[mask] = numbers.to_numpy(zero_copy_only=False)[mask]
+            df[name] = values
+
+def _arrow_frame(table, offset=0, decimals=()):
+    """Frame of an Arrow table indexed from offset, with the named CSV columns typed as decimals"""
+    df = table.to_pandas()
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    _decimal_columns(df, table, [name for name in decimals if name in table.column_names])
+    return df
+
+def _table_chunks(source, chunk_size, columns=None):
+    """Regroup a file's record batches into frames of chunk_size rows, indexed by row position"""
+    decimals = [] if _table_format(source) == 'parquet' else _decimal_names(source, columns)
+    pending = []
+    pending_rows = 0
+    offset = 0
+    for batch in _table_batches(source, columns, chunk_size):
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield _arrow_frame(table.slice(0, chunk_size), offset, decimals)
+            offset += chunk_size
+            rest = table.slice(chunk_size)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield _arrow_frame(pa.Table.from_batches(pending), offset, decimals)
+
+def read_table_file(source, columns=None, rows=None):
+    """Read a CSV, TSV (optionally gzipped) or Parquet file with pyarrow's multithreaded readers"""
+    if rows is not None:
+        chunks = _table_chunks(source, rows, columns)
+        try:
+            return next(chunks, pd.DataFrame(columns=table_columns(source)))
+        finally:
+            chunks.close()
+    if _table_format(source) == 'parquet':
+        return _arrow_frame(pq.read_table(_input_stream(source), columns=None if columns is None else list(columns)))
+    read, parse, convert = _csv_options(source, columns)
+    with _input_stream(source) as stream:
+        table = pacsv.read_csv(stream, read_options=read, parse_options=parse, convert_options=convert)
+    return _arrow_frame(table, decimals=_decimal_names(source, columns))
+
+def table_columns(source):
+    """Column names of a CSV or Parquet file, from its header or schema"""
+    if _table_format(source) == 'parquet':
+        return pq.ParquetFile(_input_stream(source)).schema_arrow.names
+    return _csv_options(source)[0].column_names
+
+# ---------- STREAMING INPUT ----------
+def _source_name(source):
+    """File name of a path or an uploaded file"""
+    return str(getattr(source, 'name', source))
+
+def _rewind(source):
+    """Seek uploaded files back to the start so they can be read again"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+def _header_names(header):
+    """Column names the way pd.read_excel builds them: blanks become 'Unnamed: i', repeats get .1, .2"""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _excel_value(value):
+    """Convert a cell the way pd.read_excel does: NA strings become missing, whole-number floats ints"""
+    if isinstance(value, str):
+        return None if value in EXCEL_NA_VALUES else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _chunk_frame(rows, columns, offset):
+    """Build one chunk, indexed by row position in the sheet like a full read"""
+    width = len(columns)
+    data = [[_excel_value(value) for value in row[:width]] + [None] * (width - len(row)) for row in rows]
+    return pd.DataFrame(data, columns=columns, index=pd.RangeIndex(offset, offset + len(rows)))
+
+def estimate_excel_rows(source, sheet_name=None):
+    """Data row count from the sheet dimensions (Parquet: file metadata), without reading the cells"""
+    if _table_format(source) == 'parquet':
+        return pq.ParquetFile(_input_stream(source)).metadata.num_rows
+    if _source_name(source).lower().endswith(('.xls', '.csv', '.tsv', '.gz')):
+        return None
+
+    _rewind(source)
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        # Write-only workbooks carry no dimensions, so their size is unknown
+        if sheet.max_row is None:
+            return None
+        return max(sheet.max_row - 1, 0)
+    finally:
+        workbook.close()
+        _rewind(source)
+
+def iter_excel_chunks(source, chunk_size=STREAM_CHUNK_ROWS, sheet_name=None, columns=None):
+    """Yield a sheet as DataFrames of at most chunk_size rows, streaming rows with openpyxl read-only mode.
+
+    With columns, only the cells of those columns are converted and kept.
+    CSV and Parquet files are streamed in record batches instead.
+    """
+    if not is_excel_file(source):
+        yield from _table_chunks(source, chunk_size, columns)
+        return
+    _rewind(source)
+    if _source_name(source).lower().endswith('.xls'):
+        # openpyxl cannot stream legacy .xls files, so these are read whole and sliced
+        df = pd.read_excel(source, sheet_name=sheet_name or 0, usecols=columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            return
+        names = _header_names(header)
+        keep = range(len(names))
+        if columns is not None:
+            wanted = set(columns)
+            keep = [i for i, name in enumerate(names) if name in wanted]
+        names = [names[i] for i in keep]
+
+        buffer = []
+        offset = 0
+        blank_rows = 0
+        for row in rows:
+            # pd.read_excel keeps blank rows between data rows but drops trailing ones,
+            # so blank rows are only counted until a data row follows them
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            if columns is not None:
+                row = tuple(row[i] if i < len(row) else None for i in keep)
+            pending = [()] * blank_rows + [row]
+            blank_rows = 0
+            for line in pending:
+                buffer.append(line)
+                if len(buffer) == chunk_size:
+                    yield _chunk_frame(buffer, names, offset)
+                    offset += len(buffer)
+                    buffer = []
+        if buffer:
+            yield _chunk_frame(buffer, names, offset)
+    finally:
+        workbook.close()
+        _rewind(source)
+
+def preview_excel(source, rows=10):
+    """First rows of a sheet, without reading the rest of it"""
+    chunks = iter_excel_chunks(source, chunk_size=rows)
+    try:
+        return next(chunks, pd.DataFrame())
+    finally:
+        chunks.close()
+
+def excel_header(source, rows=10):
+    """First rows and row count of an upload without parsing the whole workbook.
+
+    Uploads staged earlier are mapped in; others only have their first rows
+    streamed, with the row count taken from the sheet dimensions.
+    """
+    path = find_staged(content_hash(source)) if is_excel_file(source) else None
+    if path is not None:
+        return read_staged(path, rows=rows), staged_info(path)[1]
+    return preview_excel(source, rows), estimate_excel_rows(source)
+
+# ---------- PARSE CACHE ----------
+_parse_cache = OrderedDict()
+_parse_cache_bytes = 0
+_parse_cache_lock = threading.Lock()
+
+def _read_excel_columns(source, columns=None, rows=None):
+    """Read only the given columns (and first rows) of a workbook, without staging it"""
+    _rewind(source)
+    try:
+        return pd.read_excel(source, usecols=None if columns is None else list(columns), nrows=rows)
+    finally:
+        _rewind(source)
+
+def read_excel_cached(source, columns=None, rows=None, stage=True):
+    """Upload as a frame, behind an LRU cache keyed by content hash and the columns/rows read.
+
+    Streamlit re-runs the script on every widget change; with the cache only
+    the first run loads the workbook. Misses map the requested columns in
+    from the upload's staged Arrow file, so the .xlsx itself is parsed only
+    the first time its content is seen. With stage=False an upload that is
+    not staged yet has only the requested columns read instead, which is
+    cheaper when a wide export is processed once. CSV and Parquet files
+    are read directly, never staged. The returned frame is
+    shared between reruns and sessions, so callers must not modify it in place.
+    """
+    global _parse_cache_bytes
+    digest = content_hash(source)
+    key = (digest, None if columns is None else tuple(columns), rows)
+    with _parse_cache_lock:
+        if key in _parse_cache:
+            _parse_cache.move_to_end(key)
+            return _parse_cache[key][0]
+
+    if not is_excel_file(source):
+        df = read_table_file(source, columns, rows)
+    elif stage or find_staged(digest) is not None:
+        df = read_staged(stage_excel(source, digest), columns=columns, rows=rows)
+    else:
+        df = _read_excel_columns(source, columns, rows)
+    size = int(df.memory_usage(index=True, deep=True).sum())
+
+    with _parse_cache_lock:
+        if key not in _parse_cache:
+            _parse_cache[key] = (df, size)
+            _parse_cache_bytes += size
+        # Evict least recently used frames, always keeping the newest one
+        while _parse_cache_bytes > PARSE_CACHE_MAX_BYTES and len(_parse_cache) > 1:
+            _, (_, evicted_size) = _parse_cache.popitem(last=False)
+            _parse_cache_bytes -= evicted_size
+    return df
+
+def excel_info(source):
+    """Column names and row count of an upload, from its staged Arrow file (CSV and Parquet: the read file)"""
+    if _table_format(source) == 'parquet':
+        return table_columns(source), estimate_excel_rows(source)
+    if not is_excel_file(source):
+        df = read_excel_cached(source)
+        return list(df.columns), len(df)
+    return staged_info(stage_excel(source))
+
+# ---------- MULTI-FILE INPUT ----------
+def _stage_source(source, digest, sheet=0):
+    """Worker: stage one workbook (or one of its sheets), given as a path or as the bytes of an upload"""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return stage_excel(source, digest, sheet)
+
+def stage_uploads(sources, workers=None):
+    """Stage several workbooks at once, parsing the ones not staged yet in parallel processes.
+
+    openpyxl parses in pure Python, so threads would take turns on one core;
+    each worker parses a whole workbook into its Arrow file instead, and the
+    workbooks are then read from the staging area like a single upload.
+    """
+    pending = {}
+    # CSV and Parquet files are read directly by pyarrow, so only workbooks are staged
+    for source in filter(is_excel_file, sources):
+        digest = content_hash(source)
+        if find_staged(digest) is None:
+            pending[digest] = bytes(source.getbuffer()) if hasattr(source, 'getbuffer') else source
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        for digest, source in pending.items():
+            _stage_source(source, digest)
+        return
+    with process_pool(workers) as pool:
+        list(pool.map(_stage_source, pending.values(), pending.keys()))
+
+# ---------- MULTI-SHEET INPUT ----------
+_sheets_cache = OrderedDict()
+_sheets_cache_lock = threading.Lock()
+
+def excel_sheets(source):
+    """(name, estimated data rows) of every worksheet of a workbook, in workbook order; [] for CSV and Parquet.
+
+    Row counts come from the sheet dimensions and are None where a sheet has
+    none (and for .xls files). Results are cached by content hash for reruns.
+    """
+    if not is_excel_file(source):
+        return []
+    digest = content_hash(source)
+    with _sheets_cache_lock:
+        if digest in _sheets_cache:
+            return _sheets_cache[digest]
+
+    _rewind(source)
+    try:
+        if _source_name(source).lower().endswith('.xls'):
+            sheets = [(name, None) for name in pd.ExcelFile(source).sheet_names]
+        else:
+            workbook = load_workbook(source, read_only=True, data_only=True)
+            try:
+                sheets = [
+                    (sheet.title, max(sheet.max_row - 1, 0) if sheet.max_row is not None else None)
+                    for sheet in workbook.worksheets
+                ]
+            finally:
+                workbook.close()
+    finally:
+        _rewind(source)
+
+    with _sheets_cache_lock:
+        _sheets_cache[digest] = sheets
+        while len(_sheets_cache) > SHEETS_CACHE_SIZE:
+            _sheets_cache.popitem(last=False)
+    return sheets
+
+def selected_sheet_positions(sheets, selected):
+    """Positions of the selected names among a workbook's sheets (see excel_sheets).
+
+    CSV and Parquet uploads have no sheets but one table, which counts as
+    sheet 0, so they always have something to process.
+    """
+    if not sheets:
+        return [0]
+    names = [name for name, _ in sheets]
+    return [names.index(name) for name in selected]
+
+def _read_sheet(path, columns=None):
+    """Frame of a staged sheet, with only those of the columns the sheet has (in sheet order)"""
+    if columns is None:
+        return read_staged(path)
+    names, _ = staged_info(path)
+    wanted = set(columns)
+    return read_staged(path, columns=[name for name in names if name in wanted])
+
+def iter_sheets(source, sheets=None, columns=None, workers=None):
+    """Yield sheets of a workbook as frames, in workbook order: those at the positions in `sheets`, else all.
+
+    Sheets not staged yet are parsed side by side, one spawned process each,
+    and each sheet is yielded as soon as it and the ones before it are
+    parsed, so the caller processes a sheet while the next ones still parse.
+    With columns, only those of them a sheet has are mapped in.
+    """
+    digest = content_hash(source)
+    positions = list(range(len(excel_sheets(source)))) if sheets is None else list(sheets)
+    pending = [sheet for sheet in positions if find_staged(digest, sheet) is None]
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        for sheet in positions:
+            yield _read_sheet(stage_excel(source, digest, sheet), columns)
+        return
+    data = bytes(source.getbuffer()) if hasattr(source, 'getbuffer') else source
+    with process_pool(workers) as pool:
+        parsing = {sheet: pool.submit(_stage_source, data, digest, sheet) for sheet in pending}
+        for sheet in positions:
+            path = parsing[sheet].result() if sheet in parsing else stage_excel(source, digest, sheet)
+            yield _read_sheet(path, columns)
+
+def sheet_file_names(names):
+    """Sheet names usable in output file names: letters and digits only, numbered where two come out the same"""
+    file_names, seen = [], set()
+    for position, name in enumerate(names, start=1):
+        file_name = re.sub(r'[^0-9A-Za-z]+', '', str(name)) or 'Sheet'
+        if file_name in seen:
+            file_name = f"{file_name}{position}"
+        seen.add(file_name)
+        file_names.append(file_name)
+    return file_names
+
+# ---------- TYPED INGESTION ----------
+def label_category(series):
+    """Text column as a categorical ('' included so fillna('') keeps working); other columns unchanged"""
+    if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.infer_dtype(series, skipna=True) != 'string':
+        return series
+    categorical = series.astype('category')
+    if '' not in categorical.cat.categories:
+        categorical = categorical.cat.add_categories([''])
+    return categorical
+
+def ingest_types(df, phone_columns=(), category_columns=()):
+    """Frame with phone columns as strings and repeated-label columns as categoricals.
+
+    Line types, states, counties and cities repeat a handful of labels, so
+    categoricals store each label once and let the engine check types per
+    category instead of per cell. df itself is left untouched.
+    """
+    typed = df.copy(deep=False)
+    for col in phone_columns:
+        if col in typed.columns:
+            typed[col] = phone_strings(typed[col])
+    for col in category_columns:
+        if col in typed.columns and col not in phone_columns:
+            typed[col] = label_category(typed[col])
+    return typed
+
+# ---------- OUTPUT NAMING ----------
+def output_prefix(cleaned_df):
+    """State and county used to name output files, taken from the first cleaned row that has them"""
+    if cleaned_df.empty:
+        return "Unknown", "Unknown"
+
+    state = cleaned_df.get('PropertyState', pd.Series(dtype=object)).dropna()
+    state = state.iloc[0] if len(state) > 0 else 'Unknown'
+    county_raw = cleaned_df.get('PropertyCounty', pd.Series(dtype=object)).dropna()
+    county = re.sub(r'\s+', '', str(county_raw.iloc[0])) if len(county_raw) > 0 else 'Unknown'
+    return state, county
+
+def place_partitions(states, counties):
+    """(state, county) of each row as output files name them; returns a code per row and the places by code.
+
+    Rows without a state or county get 'Unknown' for it. Places are sorted,
+    and raw values that name the same files (county spacing) share a code.
+    """
+    state_codes, state_values = pd.factorize(pd.Series(states, dtype=object), sort=True)
+    county_codes, county_values = pd.factorize(pd.Series(counties, dtype=object), sort=True)
+    # Code -1 (missing) takes the trailing 'Unknown'
+    state_names = [str(value) for value in state_values] + ['Unknown']
+    county_names = [re.sub(r'\s+', '', str(value)) for value in county_values] + ['Unknown']
+    state_codes = np.where(state_codes < 0, len(state_values), state_codes)
+    county_codes = np.where(county_codes < 0, len(county_values), county_codes)
+
+    pair_codes, pairs = pd.factorize(state_codes * len(county_names) + county_codes)
+    names = [(state_names[pair // len(county_names)], county_names[pair % len(county_names)]) for pair in pairs]
+    places = sorted(set(names))
+    codes = {place: code for code, place in enumerate(places)}
+    place_codes = np.array([codes[name] for name in names], dtype=np.int64)
+    return place_codes[pair_codes], places
+
+def phone_output_names(cleaned_df, date_str=None, place=None, output_format='Excel'):
+    """File names for the outputs of a phone processing run, by the data's place or a given (state, county)"""
+    if date_str is None:
+        date_str = datetime.now().strftime("%b%d")
+    state, county = place if place is not None else output_prefix(cleaned_df)
+    extension = OUTPUT_FORMATS[output_format][0]
+
+    return {
+        'cleaned': f"{state}{county}{date_str}LCT{extension}",
+        'discard': f"{state}{county}{date_str}LandlinesNoNumber{extension}",
+        'qa': f"{state}{county}{date_str}QAReport{extension}",
+        'missing': f"{state}{county}{date_str}MissingPhones{extension}",
+        'metrics': f"{state}{county}{date_str}Metrics.json",
+        'previous': f"{state}{county}{date_str}PreviouslyExported{extension}",
+        'scrubbed': f"{state}{county}{date_str}ScrubbedOwners{extension}",
+        'zip': f"{state}{county}{date_str}Outputs.zip",
+    }
+
+# ---------- EXCEL OUTPUT ----------
+def _header_cell(sheet, value):
+    """Header cell styled like DataFrame.to_excel's (bold, thin border, centered)"""
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.font = HEADER_FONT
+    cell.border = HEADER_BORDER
+    cell.alignment = HEADER_ALIGNMENT
+    return cell
+
+def _column_values(column):
+    """Python values of one column slice, None where DataFrame.to_excel leaves the cell empty"""
+    values = column.astype(object)
+    return values.where(column.notna(), None).tolist()
+
+def _append_frame(workbook, df, sheet_name):
+    """Stream one frame into a new write-only sheet, a block of rows at a time"""
+    sheet = workbook.create_sheet(title=sheet_name)
+    sheet.append([_header_cell(sheet, str(col)) for col in df.columns])
+    for start in range(0, len(df), WRITE_BLOCK_ROWS):
+        block = df.iloc[start:start + WRITE_BLOCK_ROWS]
+        columns = [_column_values(block.iloc[:, i]) for i in range(block.shape[1])]
+        for row in zip(*columns):
+            sheet.append(row)
+
+def excel_file(sheets):
+    """Stream {sheet name: frame} into a spooled temporary .xlsx file, rewound for reading.
+
+    openpyxl's write-only mode keeps one row in memory at a time, and the
+    spooled file only stays in memory while it is small.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        _append_frame(workbook, df, sheet_name)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+def excel_export(df, sheet_name='Sheet1'):
+    """Single-sheet .xlsx export of a frame"""
+    return excel_file({sheet_name: df})
+
+def qa_report_export(qa_summary, qa_details, output_format='Excel'):
+    """QA report: the summary, plus a missing-phone details sheet when there are any.
+
+    CSV and Parquet files hold one table, so in those formats the report is
+    the summary alone and callers export the details as their own file.
+    """
+    if output_format != 'Excel':
+        return table_export(qa_summary, output_format)
+    sheets = {"Summary": qa_summary}
+    if not qa_details.empty:
+        sheets["Missing Phones"] = qa_details
+    return excel_file(sheets)
+
+def zip_file(members):
+    """Stream (file name, file) pairs into a spooled temporary .zip file, rewound for reading.
+
+    Members are copied in and closed one at a time, so a generator of
+    exports only ever holds one workbook besides the zip itself.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    # Workbooks, gzip and Parquet files are compressed already, so only plain CSV is deflated again
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, data in members:
+            info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if name.endswith('.csv') else zipfile.ZIP_STORED
+            # Streamed members have no size up front, and a 2 GB+ CSV needs the zip64 header from the start
+            with data, archive.open(info, 'w', force_zip64=True) as member:
+                shutil.copyfileobj(data, member)
+    output.seek(0)
+    return output
+
+def timed_export(export, *args, **kwargs):
+    """Run an export and return its file together with the seconds it took"""
+    started = time.perf_counter()
+    output = export(*args, **kwargs)
+    return output, time.perf_counter() - started
+
+# ---------- CSV AND PARQUET OUTPUT ----------
+def _arrow_values(series):
+    """Arrow array of a column; columns mixing text and numbers are written as text, their gaps left empty"""
+    try:
+        values = pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        text = series.astype(object).where(series.notna(), None)
+        values = pa.array([value if value is None else str(value) for value in text], type=pa.string())
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    return values
+
+def _arrow_table(df):
+    """Arrow table of a frame in its column order, without the index"""
+    return pa.Table.from_arrays(
+        [_arrow_values(df.iloc[:, i]) for i in range(df.shape[1])], names=[str(col) for col in df.columns]
+    )
+
+def table_export(df, output_format='Excel', sheet_name='Sheet1'):
+    """Export of a frame in one of OUTPUT_FORMATS, as a spooled temporary file rewound for reading"""
+    if output_format == 'Excel':
+        return excel_export(df, sheet_name)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    table = _arrow_table(df)
+    if output_format == 'Parquet':
+        pq.write_table(table, output)
+    elif output_format == 'CSV (gzip)':
+        # GzipFile leaves the spooled file open when it closes
+        with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6) as compressed:
+            pacsv.write_csv(table, compressed, CSV_WRITE_OPTIONS)
+    else:
+        pacsv.write_csv(table, output, CSV_WRITE_OPTIONS)
+    output.seek(0)
+    return output
+
+# ---------- SPLIT OUTPUT ----------
+def outputs_zip(parts, qa_summary, qa_details, output_format):
+    """Zip of a split run: the combined QA report, then one set of files per (file name prefix, outputs...) part"""
+    def qa_members(names, summary, details):
+        yield names['qa'], qa_report_export(summary, details, output_format)
+        if output_format != 'Excel' and not details.empty:
+            yield names['missing'], table_export(details, output_format)
+
+    def members():
+        yield from qa_members(
+            phone_output_names(None, place=('Combined', ''), output_format=output_format), qa_summary, qa_details
+        )
+        # Parts are built one at a time, and their files written into the zip one at a time
+        for prefix, cleaned, discard, previous, scrubbed, part_summary, part_details in parts:
+            part_names = phone_output_names(None, place=prefix, output_format=output_format)
+            if not cleaned.empty:
+                yield part_names['cleaned'], table_export(cleaned, output_format)
+            if not discard.empty:
+                yield part_names['discard'], table_export(discard, output_format)
+            if not previous.empty:
+                yield part_names['previous'], table_export(previous, output_format)
+            if not scrubbed.empty:
+                yield part_names['scrubbed'], table_export(scrubbed, output_format)
+            yield from qa_members(part_names, part_summary, part_details)
+
+    return zip_file(members())
@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# ---------- CONFIGURATION ----------
+# Minimum seconds between progress updates; a new status message always goes through
+PROGRESS_INTERVAL_S = 0.2
+
+# Seconds between resident memory samples while a stage runs
+MEMORY_SAMPLE_S = 0.01
+
+METRICS_MIME = "application/json"
+
+# ---------- MEMORY ----------
+def resident_mb():
+    """Resident memory of this process in MB, None where it cannot be read"""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Without /proc only the peak so far is available (bytes on macOS, KB elsewhere)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def _watch_memory():
+    """Start sampling resident memory in the background until _stop_watch"""
+    start = resident_mb()
+    watch = {'start': start, 'peak': start, 'stop': threading.Event(), 'thread': None}
+    if start is not None:
+        def sample():
+            while not watch['stop'].wait(MEMORY_SAMPLE_S):
+                watch['peak'] = max(watch['peak'], resident_mb())
+        watch['thread'] = threading.Thread(target=sample, daemon=True)
+        watch['thread'].start()
+    return watch
+
+def _stop_watch(watch):
+    watch['stop'].set()
+    if watch['thread'] is not None:
+        watch['thread'].join()
+        watch['peak'] = max(watch['peak'], resident_mb())
+    return watch
+
+# ---------- RUN METRICS ----------
+def start_run(progress, weights, total_rows=None):
+    """Metrics record of one processing run.
+
+    weights maps every stage expected in the run to its rough share of the
+    work. Progress goes to progress(percent, message) as the weighted share
+    of stage work done, by rows where total_rows is known, and at most once
+    every PROGRESS_INTERVAL_S unless the status message changes.
+    """
+    return {
+        'progress': progress,
+        'weights': dict(weights),
+        'total_rows': total_rows,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'started': time.perf_counter(),
+        'total_s': None,
+        'stages': {},
+        'done': {},
+        'message': None,
+        'reported': None,
+    }
+
+def _percent(metrics):
+    total = sum(metrics['weights'].values())
+    if not total:
+        return 0
+    done = sum(weight * metrics['done'].get(name, 0.0) for name, weight in metrics['weights'].items())
+    return min(100, int(100 * done / total))
+
+def report_progress(metrics, message=None):
+    """Send the current percent (and a new status message) to the run's progress callback, throttled"""
+    now = time.perf_counter()
+    if message is None or message == metrics['message']:
+        if metrics['reported'] is not None and now - metrics['reported'] < PROGRESS_INTERVAL_S:
+            return
+        message = metrics['message'] or ''
+    metrics['message'] = message
+    metrics['reported'] = now
+    metrics['progress'](_percent(metrics), message)
+
+def _advance(metrics, name, rows_before, rows, part):
+    """Mark `part` (0..1) of the current pass through a stage as done"""
+    if metrics['total_rows'] and rows is not None:
+        done = (rows_before + rows * part) / metrics['total_rows']
+    else:
+        done = part
+    metrics['done'][name] = min(1.0, max(done, metrics['done'].get(name, 0.0)))
+    report_progress(metrics)
+
+def _record(metrics, name, seconds, rows, watch):
+    """Add one pass through a stage to its totals; repeated passes (one per chunk) accumulate"""
+    entry = metrics['stages'].setdefault(
+        name, {'seconds': 0.0, 'rows': 0, 'calls': 0, 'peak_mb': None, 'added_mb': None}
+    )
+    entry['seconds'] += seconds
+    entry['rows'] += rows or 0
+    entry['calls'] += 1
+    if watch['peak'] is not None:
+        entry['peak_mb'] = max(entry['peak_mb'] or 0.0, watch['peak'])
+        entry['added_mb'] = max(entry['added_mb'] or 0.0, watch['peak'] - watch['start'])
+
+@contextmanager
+def stage(metrics, name, rows=None, message=None):
+    """Time one stage over `rows` rows and record its rows/sec and peak memory.
+
+    Yields tick(done, total) for progress within the stage.
+    """
+    rows_before = metrics['stages'].get(name, {}).get('rows', 0)
+
+    def tick(done, total):
+        _advance(metrics, name, rows_before, rows, done / total if total else 1.0)
+
+    report_progress(metrics, message)
+    watch = _watch_memory()
+    started = time.perf_counter()
+    try:
+        yield tick
+    finally:
+        _record(metrics, name, time.perf_counter() - started, rows, _stop_watch(watch))
+        _advance(metrics, name, rows_before, rows, 1.0)
+
+def stage_chunks(metrics, name, chunks, message=None):
+    """Pass chunks through, timing the work of producing each one as a pass through a stage"""
+    chunks = iter(chunks)
+    while True:
+        rows_before = metrics['stages'].get(name, {}).get('rows', 0)
+        report_progress(metrics, message)
+        watch = _watch_memory()
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks, None)
+        finally:
+            _stop_watch(watch)
+        if chunk is None:
+            return
+        _record(metrics, name, time.perf_counter() - started, len(chunk), watch)
+        _advance(metrics, name, rows_before, len(chunk), 1.0)
+        yield chunk
+
+def finish_run(metrics, message):
+    """Close a run: total wall time, and the progress bar to 100%"""
+    metrics['total_s'] = time.perf_counter() - metrics['started']
+    metrics['done'] = {name: 1.0 for name in metrics['weights']}
+    metrics['reported'] = None
+    report_progress(metrics, message)
+
+# ---------- REPORTING ----------
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+def metrics_report(metrics):
+    """JSON-ready summary of a run: wall time, rows/sec and peak memory per stage"""
+    stages = []
+    for name, entry in metrics['stages'].items():
+        seconds, rows = entry['seconds'], entry['rows']
+        stages.append({
+            'stage': name,
+            'seconds': round(seconds, 4),
+            'rows': rows,
+            'rows_per_s': round(rows / seconds) if rows and seconds else None,
+            'calls': entry['calls'],
+            'peak_mb': _round(entry['peak_mb'], 1),
+            'added_mb': _round(entry['added_mb'], 1),
+        })
+
+    total_s = metrics['total_s'] if metrics['total_s'] is not None else time.perf_counter() - metrics['started']
+    peaks = [entry['peak_mb'] for entry in stages if entry['peak_mb'] is not None]
+    return {
+        'timestamp': metrics['timestamp'],
+        'total_rows': metrics['total_rows'],
+        'total_s': round(total_s, 4),
+        'peak_mb': max(peaks) if peaks else None,
+        'stages': stages,
+    }
+
+def metrics_frame(metrics):
+    """Stage metrics as a table for display"""
+    stages = metrics_report(metrics)['stages']
+    return pd.DataFrame({
+        'Stage': [entry['stage'] for entry in stages],
+        'Seconds': [entry['seconds'] for entry in stages],
+        'Rows': [entry['rows'] for entry in stages],
+        'Rows/s': [entry['rows_per_s'] for entry in stages],
+        'Peak MB': [entry['peak_mb'] for entry in stages],
+        'Added MB': [entry['added_mb'] for entry in stages],
+    })
+
+def metrics_json(metrics):
+    """Run metrics as JSON bytes for download"""
+    return json.dumps(metrics_report(metrics), indent=2).encode('utf-8')
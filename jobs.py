@@ -0,0 +1,146 @@
+"""Background jobs for the Streamlit apps.
+
+Processing runs on a small worker pool shared by every session instead of
+in the script thread, so the page keeps responding while a file is
+processed, simultaneous users queue for a bounded number of workers, and
+a rerun or a reconnecting tab picks its job back up by id instead of
+starting over.
+"""
+import io
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# ---------- CONFIGURATION ----------
+# Jobs that run at once; later ones wait in the queue
+JOB_WORKERS = int(os.environ.get('LANDLIST_JOB_WORKERS', '2'))
+
+# Finished jobs keep their results this long, for reruns and reconnects
+JOB_RESULT_TTL_S = int(os.environ.get('LANDLIST_JOB_TTL_MIN', '60')) * 60
+
+# Seconds between progress polls of a running job
+JOB_POLL_S = 0.5
+
+_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='landlist-job')
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# ---------- JOB RUNNER ----------
+def _evict_finished():
+    """Drop finished jobs older than JOB_RESULT_TTL_S (caller holds the lock)"""
+    now = time.time()
+    for job_id in [job_id for job_id, job in _jobs.items()
+                   if job['finished'] is not None and now - job['finished'] > JOB_RESULT_TTL_S]:
+        del _jobs[job_id]
+
+def submit_job(task, *args, **kwargs):
+    """Queue task(*args, progress=callback, **kwargs) on the worker pool; returns the job id"""
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        'id': job_id,
+        'status': 'queued',
+        'percent': 0,
+        'message': "⏳ Waiting for a free worker...",
+        'submitted': time.time(),
+        'started': None,
+        'finished': None,
+        'result': None,
+        'error': None,
+        'traceback': None,
+    }
+
+    def progress(percent, message):
+        job['percent'], job['message'] = percent, message
+
+    def run():
+        job['status'], job['started'] = 'running', time.time()
+        try:
+            job['result'] = task(*args, progress=progress, **kwargs)
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = f"{type(e).__name__}: {e}"
+            job['traceback'] = traceback.format_exc()
+            job['status'] = 'failed'
+        finally:
+            job['finished'] = time.time()
+
+    with _jobs_lock:
+        _evict_finished()
+        _jobs[job_id] = job
+    _pool.submit(run)
+    return job_id
+
+def job_status(job_id):
+    """Snapshot of a job without its result, plus the jobs queued ahead of it; None if unknown or expired"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        status = {key: value for key, value in job.items() if key != 'result'}
+        status['ahead'] = sum(
+            1 for other in _jobs.values() if other['status'] == 'queued' and other['submitted'] < job['submitted']
+        )
+    return status
+
+def job_result(job_id):
+    """Return value of a finished job, None while it runs or if unknown"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return job['result'] if job is not None else None
+
+def detached_upload(uploaded_file):
+    """Private copy of an upload for a job, since reruns keep reading and seeking the original"""
+    copy = io.BytesIO(uploaded_file.getvalue())
+    copy.name = uploaded_file.name
+    return copy
+
+# ---------- STREAMLIT ----------
+def current_job(key='job'):
+    """Id of this page's job: from the session, else from the URL after a reconnect"""
+    job_id = st.session_state.get(key) or st.query_params.get(key)
+    if job_id and job_status(job_id) is None:
+        forget_job(key)
+        return None
+    return job_id
+
+def remember_job(job_id, key='job'):
+    """Keep a job's id in the session and the URL, so reruns and reloads find it again"""
+    st.session_state[key] = job_id
+    st.query_params[key] = job_id
+
+def forget_job(key='job'):
+    st.session_state.pop(key, None)
+    if key in st.query_params:
+        del st.query_params[key]
+
+@st.fragment(run_every=JOB_POLL_S)
+def _job_progress(job_id):
+    """Progress bar of a queued or running job; only this fragment reruns while polling"""
+    job = job_status(job_id)
+    if job is None or job['status'] in ('done', 'failed'):
+        # Rerun the whole page to show the result
+        st.rerun()
+    message = job['message']
+    if job['status'] == 'queued' and job['ahead']:
+        message = f"⏳ Waiting for a free worker ({job['ahead']} job(s) ahead)..."
+    st.progress(job['percent'], text=message)
+    st.caption("You can keep using the page or reload it; the job keeps running.")
+
+def show_job(job_id, show_result, error_message="❌ Error processing file"):
+    """Poll a job's progress, then show_result(result) once it is done or its error if it failed"""
+    job = job_status(job_id)
+    if job is None:
+        return
+    if job['status'] == 'done':
+        show_result(job_result(job_id))
+    elif job['status'] == 'failed':
+        st.error(f"{error_message}: {job['error']}")
+        with st.expander("Error Details"):
+            st.code(job['traceback'])
+    else:
+        _job_progress(job_id)
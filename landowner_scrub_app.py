@@ -1,7 +1,194 @@
 import streamlit as st
 import pandas as pd
-import re
-import io
+
+from file_io import (
+    INPUT_TYPES, OUTPUT_FORMATS, STREAM_CHUNK_ROWS, ZIP_MIME, estimate_excel_rows, excel_sheets, iter_excel_chunks,
+    iter_sheets, preview_excel, read_excel_cached, selected_sheet_positions, sheet_file_names, table_export, zip_file
+)
+from instrumentation import finish_run, stage, stage_chunks, start_run
+from jobs import current_job, detached_upload, remember_job, show_job
+from results import download_data, job_weights, run_key, show_export_time, submit_run
+from scrub_engine import default_owner_column, generate_filename, get_scrub_patterns, scrub_chunks, scrub_mask
+
+# Rough share of the work in each stage, so the progress bar follows the work done
+stage_weights = {'read': 45, 'scrub': 5, 'write': 50}
+
+def clean_upload(source, selected_column, patterns, output_format, file_name, total_rows=None, chunk_rows=None,
+                 sheets=None, sheet_names=None, progress=None):
+    """Job: scrub the owner column of an upload; returns what the results view shows.
+
+    With sheets (positions of a workbook's sheets, named sheet_names) each
+    of those sheets is scrubbed, see clean_sheets. The cleaned file is
+    written when it is downloaded (see results.py); output_format and
+    file_name are the choices made when the job started.
+    """
+    metrics = start_run(progress, job_weights(stage_weights), total_rows)
+    sheet_table = None
+    if sheets is not None:
+        cleaned_df, removed_names, original_rows, sheet_table = clean_sheets(
+            metrics, source, selected_column, patterns, sheets, sheet_names, chunk_rows
+        )
+    elif chunk_rows:
+        chunks = stage_chunks(
+            metrics, 'read', iter_excel_chunks(source, chunk_size=chunk_rows), "📖 Streaming rows from the workbook..."
+        )
+        with stage(metrics, 'scrub', total_rows, "🧹 Scrubbing owner names..."):
+            cleaned_df, removed_names, original_rows = scrub_chunks(
+                chunks, selected_column, patterns, cached=True
+            )
+    else:
+        with stage(metrics, 'read', total_rows, "📖 Loading your file..."):
+            df = read_excel_cached(source)
+        with stage(metrics, 'scrub', len(df), "🧹 Scrubbing owner names..."):
+            # The loaded frame is cached across reruns, so keep the flags out of it
+            needs_scrub = scrub_mask(df[selected_column], patterns, cached=True)
+            
+            # Get results
+            scrubbed_rows = df[needs_scrub]
+            cleaned_df = df[~needs_scrub].copy()
+            removed_names = scrubbed_rows[selected_column].dropna().tolist()
+            original_rows = len(df)
+    
+    finish_run(metrics, "✅ Cleaning complete!")
+    return {
+        'cleaned_df': cleaned_df,
+        'removed_names': removed_names,
+        'original_rows': original_rows,
+        'sheets': sheet_table,
+        'output_format': output_format,
+        'file_name': file_name,
+        'metrics': metrics,
+    }
+
+def clean_sheets(metrics, source, selected_column, patterns, sheets, sheet_names, chunk_rows=None):
+    """Scrub several sheets of a workbook into one cleaned frame; also returns a table of per-sheet counts.
+
+    Sheets are parsed side by side in worker processes and each is scrubbed
+    as soon as it is parsed (see iter_sheets); in chunked mode they are
+    streamed one after another instead. The table's Start/End columns are
+    each sheet's row positions in the cleaned frame.
+    """
+    if chunk_rows:
+        sheet_chunks = (
+            stage_chunks(
+                metrics, 'read', iter_excel_chunks(source, chunk_size=chunk_rows, sheet_name=name),
+                f"📖 Streaming rows from sheet {name}..."
+            )
+            for name in sheet_names
+        )
+    else:
+        sheet_chunks = (
+            [df] for df in stage_chunks(metrics, 'read', iter_sheets(source, sheets), f"📖 Parsing {len(sheets)} sheets...")
+        )
+    
+    def owner_chunks(chunks, name):
+        for chunk in chunks:
+            if selected_column not in chunk.columns:
+                raise ValueError(f"Column '{selected_column}' not found in sheet '{name}'")
+            yield chunk
+    
+    parts, removed_names, sheet_rows = [], [], []
+    start = 0
+    for name, chunks in zip(sheet_names, sheet_chunks):
+        with stage(metrics, 'scrub', None, f"🧹 Scrubbing owner names in sheet {name}..."):
+            sheet_cleaned, sheet_removed, sheet_total = scrub_chunks(
+                owner_chunks(chunks, name), selected_column, patterns, cached=True
+            )
+        parts.append(sheet_cleaned)
+        removed_names.extend(sheet_removed)
+        sheet_rows.append({
+            'Sheet': name, 'Original Rows': sheet_total, 'Rows Removed': len(sheet_removed),
+            'Remaining Rows': len(sheet_cleaned), 'Start': start, 'End': start + len(sheet_cleaned)
+        })
+        start += len(sheet_cleaned)
+    
+    cleaned_df = pd.concat(parts, ignore_index=True)
+    return cleaned_df, removed_names, sum(row['Original Rows'] for row in sheet_rows), pd.DataFrame(sheet_rows)
+
+def sheets_zip(result, output_format, file_name):
+    """Zip with one cleaned file per sheet, named after the output file and the sheet"""
+    cleaned_df, sheet_table = result['cleaned_df'], result['sheets']
+    extension = OUTPUT_FORMATS[output_format][0]
+    base_name = file_name[:-len(extension)] if file_name.endswith(extension) else file_name
+    members = (
+        (
+            f"{base_name}_{prefix}{extension}",
+            table_export(cleaned_df.iloc[row.Start:row.End], output_format, sheet_name='Cleaned_Data')
+        )
+        for prefix, row in zip(sheet_file_names(sheet_table['Sheet']), sheet_table.itertuples())
+    )
+    return zip_file(members)
+
+def show_scrub_results(result, output_format=None, file_name=None):
+    """Results view of a finished cleaning job, with the file in output_format (default: the job's choices)"""
+    cleaned_df, removed_names = result['cleaned_df'], result['removed_names']
+    output_format = output_format or result['output_format']
+    file_name = file_name or result['file_name']
+    
+    # Display results
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Original Rows", result['original_rows'])
+    
+    with col2:
+        st.metric("Rows Removed", len(removed_names))
+    
+    with col3:
+        st.metric("Remaining Rows", len(cleaned_df))
+    
+    # Show removed entries
+    if len(removed_names) > 0:
+        st.subheader("🗑️ Entries Being Removed")
+        st.write(f"The following {len(removed_names)} entries will be removed:")
+        
+        # Show in expandable section
+        with st.expander(f"View all {len(removed_names)} removed entries"):
+            for i, name in enumerate(removed_names, 1):
+                st.write(f"{i}. {name}")
+    
+    # Download cleaned file
+    st.subheader("💾 Download Cleaned Data")
+    
+    # Create download button; the file is streamed to the chosen format (Excel, CSV, gzip-compressed CSV
+    # or Parquet) on the first click and kept for later clicks
+    key = ('cleaned', output_format)
+    st.download_button(
+        label=f"📥 Download Cleaned {output_format} File",
+        data=download_data(
+            result, key, lambda: table_export(cleaned_df, output_format, sheet_name='Cleaned_Data'), len(cleaned_df)
+        ),
+        file_name=file_name,
+        mime=OUTPUT_FORMATS[output_format][1],
+        use_container_width=True
+    )
+    show_export_time(result, key)
+    
+    # Multi-sheet runs can also be downloaded as one file per sheet
+    sheet_table = result.get('sheets')
+    if sheet_table is not None:
+        st.dataframe(sheet_table.drop(columns=['Start', 'End']), use_container_width=True, hide_index=True)
+        key = ('sheets', output_format, file_name)
+        st.download_button(
+            label=f"🗂️ Download One File per Sheet ({len(sheet_table)} sheets, .zip)",
+            data=download_data(result, key, lambda: sheets_zip(result, output_format, file_name), len(cleaned_df)),
+            file_name=file_name[:-len(OUTPUT_FORMATS[output_format][0])] + ".zip",
+            mime=ZIP_MIME,
+            use_container_width=True
+        )
+        show_export_time(result, key)
+    
+    # Show format-specific info
+    if output_format == "Excel":
+        st.info("📊 Excel format preserves all data types and formatting")
+    elif output_format == "Parquet":
+        st.info("🗃️ Parquet format is compact and loads quickly in pandas, Spark and databases")
+    else:
+        st.info("📄 CSV format is compatible with most spreadsheet applications")
+    
+    # Show preview of cleaned data
+    st.subheader("📋 Cleaned Data Preview")
+    st.dataframe(cleaned_df.head(), use_container_width=True)
 
 # Page configuration
 st.set_page_config(
@@ -35,169 +222,74 @@ with st.sidebar:
             "Enter additional keywords (one per line):",
             placeholder="association\ntrust\nfoundation"
         )
-
-# Define default scrub patterns
-def get_scrub_patterns(custom_keywords=None):
-    default_patterns = [
-        # Gas / Utility / Energy
-        r'\bgas\b',
-        r'\bgas company\b',
-        r'\bgas co\b',
-        r'\bgas utility\b',
-        r'\butility\b',
-        r'\butilities co\b',
-        r'\bmunicipal utility\b',
-        r'\bmunicipal electric\b',
-        r'\belectric co\b',
-        r'\belectric company\b',
-        r'\belectric utility\b',
-        r'\belectric authority\b',
-        r'\belectric corp\b',
-        r'\bpower co\b',
-        r'\bpower company\b',
-        r'\bpower authority\b',
-        r'\bpower & light\b',
-        r'\bpower corp\b',
-        r'\benergy co\b',
-        r'\benergy company\b',
-        r'\brural electric\b',
-        r'\brural co-op\b',
-        r'\belectric co-op\b',
-        r'\bwater authority\b',
-        r'\bwater dept\b',
-        r'\bpwr\b',
-        r'\bpwr co\b',
-        r'\belec\b',
-        r'\btel co\b',
-        r'\btelco\b',
-        r'\btelephone co\b',
-
-        # Government / Municipality
-        r'\bborough of\b',
-        r'\btwp\b',
-        r'\btownship\b',
-        r'\btown of\b',
-        r'\bcity of\b',
-        r'\bcounty of\b',
-        r'\bcounty\b',
-        r'\bcommonwealth of\b',
-        r'\bstate dep\b',
-        r'\bstate highway\b',
-        r'\bdepartment of\b',
-        r'\bdept of\b',
-        r'\bdept\b',
-        r'\bmunicipal\b',
-        r'\bboard of\b',
-        r'\bcommission\b',
-        r'\bdevelopment district\b',
-        r'\broad commission\b',
-
-        # School / Education
-        r'\bschool district\b',
-        r'\bschool dist\b',
-        r'\bsch dis\b',
-        r'\bcity schools\b',
-        r'\bschool system\b',
-
-        # Fire / Emergency Services
-        r'\bfire co\b',
-        r'\bfire company\b',
-        r'\bvolunteer fire\b',
-
-        # Rail / Transport
-        r'\b Rr Co\b',
-        r'\brail car co\b',
-        r'\brailway\b',
-        r'\brr\b',
-
-        # Hospitals / Health
-        r'\bhospital\b',
-
-        # Cemetery / Conservancy
-        r'\bcemetery\b',
-        r'\bconservation authority\b',
-        r'\bconservancy\b',
-
-        # Waste Management
-        r'\bwaste management\b',
-
-        # Churches / Religious Orgs
-        r'\bchurch\b',
-        r'\bcommunity church\b',
-        r'\bfamily church\b',
-        r'\bchurch of\b',
-        r'\bbaptist\b',
-        r'\bmethodist\b',
-
-        # Development / Public Works
-        r'\bpublic works\b',
-        r'\bpub works\b',
-        r'\bdevl\b',
-        r'\bdevl co\b',
-        r'\bindustrial\b',
-    ]
-    
-    # Add custom patterns if provided
-    if custom_keywords:
-        custom_lines = [line.strip() for line in custom_keywords.split('\n') if line.strip()]
-        for keyword in custom_lines:
-            default_patterns.append(rf'\b{re.escape(keyword.lower())}\b')
     
-    return default_patterns
-
-# Function to check if a name needs scrubbing
-def needs_scrub(owner_name, patterns):
-    if pd.isna(owner_name):
-        return False
-    name_lower = str(owner_name).lower()
-    return any(re.search(pattern, name_lower) for pattern in patterns)
-
-# Function to generate output filename
-def generate_filename(original_name, use_custom, custom_name, file_format):
-    if use_custom and custom_name.strip():
-        base_name = custom_name.strip()
-    else:
-        # Remove extension from original name and add SCRUB
-        base_name = original_name.rsplit('.', 1)[0] + "_SCRUB"
-    
-    # Add appropriate extension
-    if file_format == "Excel":
-        return f"{base_name}.xlsx"
-    else:
-        return f"{base_name}.csv"
+    # Option to stream large workbooks
+    stream_mode = st.checkbox(
+        "Process in chunks (large files)",
+        value=False,
+        help="Stream the workbook in fixed-size chunks so memory use depends on the chunk size, not the file size"
+    )
+    chunk_rows = st.number_input(
+        "Rows per chunk",
+        min_value=1_000,
+        max_value=500_000,
+        value=STREAM_CHUNK_ROWS,
+        step=10_000,
+        disabled=not stream_mode
+    )
 
 # Main app interface
-st.header("📁 Upload Your Excel File")
+st.header("📁 Upload Your File")
 
 uploaded_file = st.file_uploader(
-    "Choose an Excel file",
-    type=['xlsx', 'xls'],
-    help="Upload your land owner Excel file to be cleaned"
+    "Choose an Excel, CSV or Parquet file",
+    type=INPUT_TYPES,
+    help="Upload your land owner Excel, CSV/TSV (optionally .gz) or Parquet file to be cleaned"
 )
 
+# A job started earlier (before a rerun or a reconnect) is picked back up
+job_id = current_job()
+output_format = preview_filename = None
+
 if uploaded_file is not None:
     try:
-        # Load the file
-        with st.spinner("Loading your file..."):
-            df = pd.read_excel(uploaded_file)
-        
-        st.success(f"✅ File loaded successfully! Found {len(df)} rows and {len(df.columns)} columns.")
+        # Load the file (only a preview in chunked mode; rows are streamed when cleaning)
+        if stream_mode:
+            with st.spinner("Reading your file header..."):
+                estimated_rows = estimate_excel_rows(uploaded_file)
+                df = preview_excel(uploaded_file, rows=100)
+            row_count = f"about {estimated_rows}" if estimated_rows is not None else "an unknown number of"
+            st.success(f"✅ File opened for chunked processing! Found {row_count} rows and {len(df.columns)} columns.")
+        else:
+            with st.spinner("Loading your file..."):
+                df = read_excel_cached(uploaded_file)
+            
+            st.success(f"✅ File loaded successfully! Found {len(df)} rows and {len(df.columns)} columns.")
         
         # Show preview of the data
         st.subheader("📊 Data Preview")
         st.dataframe(df.head(), use_container_width=True)
         
+        # Workbooks with several sheets can be scrubbed sheet by sheet (the preview shows the first)
+        sheets = excel_sheets(uploaded_file)
+        sheet_names = [name for name, _ in sheets]
+        selected_sheets = sheet_names[:1]
+        if len(sheet_names) > 1:
+            selected_sheets = st.multiselect(
+                f"🗂️ Sheets to clean ({len(sheet_names)} in this workbook):",
+                sheet_names,
+                default=sheet_names,
+                help="Selected sheets are cleaned into one file, with one file per sheet also available as a zip"
+            )
+        sheet_positions = selected_sheet_positions(sheets, selected_sheets)
+        multi_sheet = sheet_positions not in ([], [0])
+        sheet_rows = [rows for name, rows in sheets if name in selected_sheets]
+        
         # Column selection
         st.subheader("🎯 Select Owner Name Column")
         
         # Try to auto-detect owner column
-        potential_cols = [col for col in df.columns if any(keyword in col.lower() 
-                         for keyword in ['owner', 'name', 'mail'])]
-        
-        if potential_cols:
-            default_col = potential_cols[0]
-        else:
-            default_col = df.columns[0]
+        default_col = default_owner_column(df.columns)
         
         selected_column = st.selectbox(
             "Choose the column containing owner names:",
@@ -221,9 +313,9 @@ if uploaded_file is not None:
             # File format selection
             output_format = st.radio(
                 "Select output format:",
-                options=["Excel", "CSV"],
+                options=list(OUTPUT_FORMATS),
                 index=0,
-                help="Choose whether to download as Excel (.xlsx) or CSV file"
+                help="Choose whether to download as Excel (.xlsx), CSV, gzip-compressed CSV (.csv.gz) or Parquet file"
             )
         
         with col2:
@@ -254,92 +346,33 @@ if uploaded_file is not None:
         st.info(f"📄 Output filename will be: **{preview_filename}**")
         
         # Process the data
-        if st.button("🧹 Clean Data", type="primary", use_container_width=True):
-            with st.spinner("Processing your data..."):
-                # Get scrub patterns
-                custom_keywords_input = custom_keywords if customize_patterns else None
-                patterns = get_scrub_patterns(custom_keywords_input)
-                
-                # Apply scrubbing
-                df['needs_scrub'] = df[selected_column].apply(lambda x: needs_scrub(x, patterns))
-                
-                # Get results
-                scrubbed_rows = df[df['needs_scrub']]
-                cleaned_df = df[~df['needs_scrub']].copy()
-                cleaned_df = cleaned_df.drop(columns=['needs_scrub'])
-                
-                # Display results
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.metric("Original Rows", len(df))
-                
-                with col2:
-                    st.metric("Rows Removed", len(scrubbed_rows))
-                
-                with col3:
-                    st.metric("Remaining Rows", len(cleaned_df))
-                
-                # Show removed entries
-                if len(scrubbed_rows) > 0:
-                    st.subheader("🗑️ Entries Being Removed")
-                    st.write(f"The following {len(scrubbed_rows)} entries will be removed:")
-                    
-                    removed_names = scrubbed_rows[selected_column].dropna().tolist()
-                    
-                    # Show in expandable section
-                    with st.expander(f"View all {len(removed_names)} removed entries"):
-                        for i, name in enumerate(removed_names, 1):
-                            st.write(f"{i}. {name}")
-                
-                # Download cleaned file
-                st.subheader("💾 Download Cleaned Data")
-                
-                # Generate final filename
-                final_filename = generate_filename(
-                    uploaded_file.name,
-                    use_custom_name == "Custom filename",
-                    custom_filename,
-                    output_format
-                )
-                
-                # Convert to appropriate format
-                if output_format == "Excel":
-                    # Convert to Excel bytes
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        cleaned_df.to_excel(writer, index=False, sheet_name='Cleaned_Data')
-                    file_data = output.getvalue()
-                    mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                else:
-                    # Convert to CSV
-                    file_data = cleaned_df.to_csv(index=False).encode('utf-8')
-                    mime_type = "text/csv"
-                
-                # Create download button
-                st.download_button(
-                    label=f"📥 Download Cleaned {output_format} File",
-                    data=file_data,
-                    file_name=final_filename,
-                    mime=mime_type,
-                    use_container_width=True
-                )
-                
-                # Show format-specific info
-                if output_format == "Excel":
-                    st.info("📊 Excel format preserves all data types and formatting")
-                else:
-                    st.info("📄 CSV format is compatible with most spreadsheet applications")
-                
-                # Show preview of cleaned data
-                st.subheader("📋 Cleaned Data Preview")
-                st.dataframe(cleaned_df.head(), use_container_width=True)
-                
+        if st.button("🧹 Clean Data", type="primary", use_container_width=True, disabled=not sheet_positions):
+            # Get scrub patterns
+            custom_keywords_input = custom_keywords if customize_patterns else None
+            patterns = get_scrub_patterns(custom_keywords_input)
+            
+            # Cleaning runs as a background job; the page polls its progress below. The same file,
+            # column and patterns show the stored result again
+            chunk_size = int(chunk_rows) if stream_mode else None
+            job_id = submit_run(
+                run_key(
+                    uploaded_file, column=selected_column, patterns=patterns, chunk_rows=chunk_size,
+                    sheets=sheet_positions
+                ),
+                clean_upload, detached_upload(uploaded_file), selected_column, patterns, output_format, preview_filename,
+                # Other sheets' row counts are estimated from their dimensions
+                total_rows=(sum(sheet_rows) if None not in sheet_rows else None) if multi_sheet
+                else estimated_rows if stream_mode else len(df),
+                chunk_rows=chunk_size,
+                sheets=sheet_positions if multi_sheet else None, sheet_names=selected_sheets if multi_sheet else None
+            )
+            remember_job(job_id)
+    
     except Exception as e:
         st.error(f"❌ Error processing file: {str(e)}")
-        st.write("Please make sure your file is a valid Excel file (.xlsx or .xls)")
+        st.write("Please make sure your file is a valid Excel (.xlsx or .xls), CSV/TSV or Parquet file")
 
-else:
+elif job_id is None:
     # Instructions when no file is uploaded
     st.info("👆 Please upload an Excel file to get started")
     
@@ -376,6 +409,12 @@ else:
     - Waste management companies
     """)
 
+# Including a job the button above just started
+job_id = current_job()
+if job_id is not None:
+    # The file is written in the format and under the name picked now, so changing them needs no reprocessing
+    show_job(job_id, lambda result: show_scrub_results(result, output_format, preview_filename))
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -0,0 +1,93 @@
+"""Saved column mappings of the flexible processor, keyed by the file header.
+
+Each data provider exports the same columns in the same order every time,
+so a mapping made once for a layout is saved under a fingerprint of its
+header row. The next upload with that header skips the mapping step:
+
+    python mapping_profiles.py                   # list saved mappings
+    python mapping_profiles.py export.xlsx       # show the mapping saved for a file's header
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+from file_io import preview_excel
+
+# ---------- CONFIGURATION ----------
+MAPPING_DIR = os.environ.get('LANDLIST_MAPPING_DIR') or \
+    os.path.join(os.path.expanduser('~'), '.landlist', 'mappings')
+
+_mapping_lock = threading.Lock()
+
+# ---------- FINGERPRINTS ----------
+def header_fingerprint(columns):
+    """Hash of a header row; files share a mapping only if their columns and column order match"""
+    return hashlib.sha256(json.dumps([str(col) for col in columns]).encode('utf-8')).hexdigest()[:32]
+
+def _profile_path(fingerprint, directory=None):
+    return os.path.join(directory or MAPPING_DIR, f"{fingerprint}.json")
+
+# ---------- SAVED MAPPINGS ----------
+def load_profile(columns, directory=None):
+    """Saved mapping of a header ({'columns', 'phones', 'header', 'saved'}), None if it has none"""
+    path = _profile_path(header_fingerprint(columns), directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+def save_profile(columns, column_mapping, phone_mapping, directory=None):
+    """Save the mapping used for a header, replacing any earlier one"""
+    directory = directory or MAPPING_DIR
+    profile = {
+        'columns': dict(column_mapping),
+        'phones': [list(pair) for pair in phone_mapping],
+        'header': [str(col) for col in columns],
+        'saved': datetime.now().isoformat(timespec='seconds'),
+    }
+    with _mapping_lock:
+        os.makedirs(directory, exist_ok=True)
+        # Write under a temporary name so readers never see a half-written file
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as output:
+            json.dump(profile, output, indent=2)
+        os.replace(temp_path, _profile_path(header_fingerprint(columns), directory))
+    return profile
+
+def delete_profile(columns, directory=None):
+    """Forget the saved mapping of a header"""
+    path = _profile_path(header_fingerprint(columns), directory)
+    if os.path.exists(path):
+        os.remove(path)
+
+# ---------- COMMAND LINE ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the saved column mappings of the flexible processor")
+    parser.add_argument('file', nargs='?', help="Excel file whose header's mapping to show")
+    parser.add_argument('--dir', default=None, help=f"Mapping directory (default: {MAPPING_DIR})")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        profile = load_profile(preview_excel(args.file, rows=1).columns, args.dir)
+        if profile is None:
+            print("No saved mapping for this header")
+            return 1
+        print(json.dumps({'columns': profile['columns'], 'phones': profile['phones']}, indent=2))
+        return 0
+
+    directory = args.dir or MAPPING_DIR
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json')) if os.path.isdir(directory) else []
+    for name in names:
+        with open(os.path.join(directory, name), encoding='utf-8') as handle:
+            profile = json.load(handle)
+        print(f"{name[:-5]}: {len(profile['header'])} columns, saved {profile['saved']}")
+    print(f"{len(names)} saved mapping(s) in {directory}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ---------- CONFIGURATION ----------
+NON_DIGITS = re.compile(r'\D')
+
+# Normalized columns kept for re-runs over the same upload (see memoized_column)
+COLUMN_MEMO_MAX_BYTES = 256 * 1024 * 1024
+
+_column_memo = OrderedDict()
+_column_memo_bytes = 0
+_column_memo_lock = threading.Lock()
+
+# ---------- COLUMN NORMALIZATION ----------
+def _normalize_numbers(numbers):
+    """Normalize an array of numeric phone values the way normalize_phone does for floats/ints"""
+    result = np.full(len(numbers), None, dtype=object)
+
+    # int(phone) truncates toward zero and the digit string drops the sign, so only the
+    # magnitude matters: 10 digits, or 11 digits with a leading 1 (10**10 .. 2*10**10 - 1)
+    with np.errstate(invalid='ignore'):
+        magnitude = np.abs(np.trunc(numbers))
+        ten_digits = (magnitude >= 1e9) & (magnitude < 1e10)
+        eleven_digits = (magnitude >= 1e10) & (magnitude < 2e10)
+
+    if ten_digits.any():
+        result[ten_digits] = magnitude[ten_digits].astype(np.int64).astype(str).astype(object)
+    if eleven_digits.any():
+        trimmed = (magnitude[eleven_digits] - 1e10).astype(np.int64).astype(str)
+        result[eleven_digits] = np.char.zfill(trimmed, 10).astype(object)
+
+    return result
+
+def _normalize_strings(values):
+    """Normalize an object array of non-float phone values the way normalize_phone does"""
+    digits = pd.Series([str(value) for value in values], dtype=object).str.replace(NON_DIGITS, '', regex=True)
+    lengths = digits.str.len().to_numpy()
+
+    digits = digits.to_numpy()
+
+    result = np.full(len(values), None, dtype=object)
+    ten_digits = lengths == 10
+    result[ten_digits] = digits[ten_digits]
+
+    eleven_digits = np.flatnonzero(lengths == 11)
+    trimmed = [value[1:] if value[0] == '1' else None for value in digits[eleven_digits]]
+    result[eleven_digits] = np.array(trimmed, dtype=object)
+    return result
+
+def normalize_phone_column(series):
+    """Columnar normalize_phone: a 10-digit string or None for every cell of a column"""
+    result = np.full(len(series), None, dtype=object)
+    present = series.notna().to_numpy()
+    if not present.any():
+        return result
+
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return result
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        numbers = series.to_numpy(dtype='float64', na_value=np.nan)
+        result[present] = _normalize_numbers(numbers[present])
+        return result
+
+    if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+        # Typed ingestion (phone_strings) leaves a string column: strip digits without a Python call per cell
+        digits = series.str.replace(NON_DIGITS.pattern, '', regex=True)
+        lengths = digits.str.len().to_numpy(dtype='float64', na_value=0)
+        ten_digits = lengths == 10
+        eleven_digits = (lengths == 11) & digits.str.startswith('1').to_numpy(dtype=bool, na_value=False)
+        result[ten_digits] = digits[ten_digits].to_numpy(dtype=object)
+        result[eleven_digits] = digits[eleven_digits].str.slice(1).to_numpy(dtype=object)
+        return result
+
+    values = series.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=True) in ('floating', 'integer', 'mixed-integer-float'):
+        # Excel number cells: same digits as int(phone), without a Python call per cell
+        result[present] = _normalize_numbers(values[present].astype('float64'))
+        return result
+
+    is_float = np.fromiter((isinstance(value, float) for value in values), dtype=bool, count=len(values))
+
+    floats = present & is_float
+    others = present & ~is_float
+    if floats.any():
+        result[floats] = _normalize_numbers(values[floats].astype('float64'))
+    if others.any():
+        # normalize_phone treats '' as missing, which the digit-length check also rejects
+        result[others] = _normalize_strings(values[others])
+    return result
+
+def phone_strings(series):
+    """Phone column as a string column holding the text normalize_phone strips digits from.
+
+    Numbers become str(int(x)), as normalize_phone does before stripping, so
+    the string column normalizes to the same phones as the raw one without
+    the float round trip. Numbers too large to be a phone become missing.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.astype('str')
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        numbers = series.to_numpy(dtype='float64', na_value=np.nan)
+        plausible = np.isfinite(numbers) & (np.abs(numbers) < 1e15)
+        text = np.full(len(numbers), None, dtype=object)
+        text[plausible] = np.trunc(numbers[plausible]).astype(np.int64).astype(str)
+        return pd.Series(text, index=series.index, dtype='str')
+
+    text = []
+    for value in series.to_numpy(dtype=object):
+        if isinstance(value, float):
+            value = str(int(value)) if np.isfinite(value) and abs(value) < 1e15 else None
+        elif value is not None and not isinstance(value, str) and not pd.isna(value):
+            value = str(value)
+        text.append(value if isinstance(value, str) else None)
+    return pd.Series(text, index=series.index, dtype='str')
+
+def type_codes(series):
+    """Line-type column as codes into a label table: (codes, stripped labels, lowercase labels).
+
+    The tables end with '' for missing cells, so checks against a set of
+    types only look at the handful of distinct labels.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) and \
+            pd.api.types.infer_dtype(series.cat.categories, skipna=True) in ('string', 'empty'):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    elif pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        # Line types repeat a handful of labels, so clean each distinct label once
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    else:
+        # Mixed cells (1 == 1.0 == True) would collapse when factorized, so clean them one by one
+        labels = ['' if pd.isnull(value) else str(value).strip() for value in series]
+        codes, uniques = pd.factorize(pd.Series(labels, dtype=object))
+
+    stripped = np.array([str(value).strip() for value in uniques] + [''], dtype=object)
+    lowered = np.array([label.lower() for label in stripped], dtype=object)
+    return np.where(codes < 0, len(stripped) - 1, codes), stripped, lowered
+
+# ---------- COLUMN MEMO ----------
+def rows_key(source_key, df):
+    """Memo key of the rows of a frame read from the upload source_key identifies, None without one.
+
+    Rows an earlier step dropped (the entity scrub) change the key, so cached
+    columns always line up with the frame they are used for.
+    """
+    if source_key is None:
+        return None
+    index_digest = hashlib.sha1(pd.util.hash_pandas_object(df.index, index=False).to_numpy().tobytes()).hexdigest()
+    return source_key, len(df), index_digest
+
+def _memo_size(value):
+    """Rough bytes of a memoized column: its arrays plus ~60 bytes per string cell (a 10-digit str is 59)"""
+    arrays = value if isinstance(value, tuple) else (value,)
+    strings = sum(int(np.count_nonzero(array != None)) for array in arrays if array.dtype == object)  # noqa: E711
+    return int(sum(array.nbytes for array in arrays)) + 60 * strings
+
+def memoized_column(key, compute):
+    """compute() behind an LRU memo of normalized columns; with key None it is just computed.
+
+    Re-processing an upload after a mapping or line-type change then only
+    normalizes the columns it has not seen yet. Memoized values are shared,
+    so callers must not modify them in place.
+    """
+    global _column_memo_bytes
+    if key is None:
+        return compute()
+    with _column_memo_lock:
+        if key in _column_memo:
+            _column_memo.move_to_end(key)
+            return _column_memo[key][0]
+
+    value = compute()
+    size = _memo_size(value)
+    with _column_memo_lock:
+        if key not in _column_memo:
+            _column_memo[key] = (value, size)
+            _column_memo_bytes += size
+        # Evict least recently used columns, always keeping the newest one
+        while _column_memo_bytes > COLUMN_MEMO_MAX_BYTES and len(_column_memo) > 1:
+            _, (_, evicted_size) = _column_memo.popitem(last=False)
+            _column_memo_bytes -= evicted_size
+    return value
+
+# ---------- CLASSIFICATION ----------
+def _first_positions(mask, count):
+    """Column position of the first `count` True cells of every row, -1 where there are fewer"""
+    positions = np.full((mask.shape[0], count), -1, dtype=np.int64)
+    if not mask.shape[1]:
+        return positions
+    rank = np.cumsum(mask, axis=1)
+    for slot in range(count):
+        hit = mask & (rank == slot + 1)
+        positions[:, slot] = np.where(hit.any(axis=1), hit.argmax(axis=1), -1)
+    return positions
+
+def _take(matrix, positions):
+    """Gather one value per row from a 2D object array, None where the position is -1"""
+    rows = np.arange(matrix.shape[0])
+    values = matrix[rows, np.maximum(positions, 0)] if matrix.shape[1] else np.full(len(rows), None, dtype=object)
+    return np.where(positions >= 0, values, None)
+
+def _take_mask(mask, positions):
+    """Gather one flag per row from a 2D bool array, False where the position is -1"""
+    return _take(mask, positions).astype(bool)
+
+def phone_integers(phones):
+    """Normalized (10-digit string) phones as int64, from their digit code points"""
+    digits = np.asarray(phones).astype('U10').view(np.uint32).reshape(len(phones), 10).astype(np.int64) - ord('0')
+    return digits @ (10 ** np.arange(9, -1, -1, dtype=np.int64))
+
+def suppressed_cells(phones, candidates, suppressed):
+    """Mask of the candidate cells of a 2D phone array whose number is in a sorted int64 array"""
+    hits = np.zeros(phones.shape, dtype=bool)
+    if not len(suppressed) or not candidates.any():
+        return hits
+    numbers = phone_integers(phones[candidates])
+    # Binary search of every number at once, in sorted order so successive probes walk the list
+    # forward; a memory-mapped list is only paged in where it is probed
+    order = np.argsort(numbers)
+    numbers = numbers[order]
+    positions = np.minimum(np.searchsorted(suppressed, numbers), len(suppressed) - 1)
+    found = np.empty(len(numbers), dtype=bool)
+    found[order] = suppressed[positions] == numbers
+    hits[candidates] = found
+    return hits
+
+def normalize_phone_pairs(df, phone_pairs, allowed_types=(), landline_types=(), tick=None, memo_key=None):
+    """Normalize every (phone, line type) column pair present in df into 2D arrays.
+
+    Returns the phones, the stripped types, and masks of the cells whose type
+    is allowed / a landline type, looked up once per distinct label. tick, if
+    given, is called with (pairs done, pairs) after each pair.
+
+    With a memo_key (see rows_key) each phone column and line-type column is
+    normalized once per upload; the type masks are always re-derived from the
+    label tables, so changing the type lists costs no normalization.
+    """
+    pairs = [(p, t) for p, t in phone_pairs if p in df.columns and t in df.columns]
+
+    def column_key(kind, col):
+        return None if memo_key is None else (memo_key, kind, col, str(df[col].dtype))
+
+    shape = (len(df), len(pairs))
+    phones = np.empty(shape, dtype=object)
+    types = np.empty(shape, dtype=object)
+    allowed = np.zeros(shape, dtype=bool)
+    landline = np.zeros(shape, dtype=bool)
+    for i, (phone_col, type_col) in enumerate(pairs):
+        phones[:, i] = memoized_column(column_key('phone', phone_col), lambda: normalize_phone_column(df[phone_col]))
+        codes, stripped_labels, lowered_labels = memoized_column(
+            column_key('type', type_col), lambda: type_codes(df[type_col])
+        )
+        types[:, i] = stripped_labels[codes]
+        allowed[:, i] = np.isin(lowered_labels, list(allowed_types))[codes]
+        landline[:, i] = np.isin(lowered_labels, list(landline_types))[codes]
+        if tick is not None:
+            tick(i + 1, len(pairs))
+
+    return phones, types, allowed, landline
+
+def classify_phones(df, phone_pairs, allowed_types, landline_types, max_mobile=3, max_landline=5, tick=None,
+                    suppressed=None, memo_key=None):
+    """Classify every phone of a frame in a single pass instead of row by row.
+
+    Returns a dict with the has-mobile mask, the first `max_mobile` mobile/VoIP
+    picks (Phone1..) and the first `max_landline` landline picks with their
+    types (Phone1.., Phone1_Type..), all indexed like df, plus the QA counters
+    under 'stats' and the same counters per row under 'counts' (see
+    sum_phone_counts), so any subset of the rows gets its counters without
+    classifying again. Each phone cell is normalized exactly once. Pairs whose
+    columns are missing from df are skipped, as in the per-row helpers.
+    tick reports progress per column pair, as in normalize_phone_pairs.
+
+    suppressed, a sorted int64 array of do-not-contact numbers (see
+    suppression.py), drops matching mobile/VoIP numbers before the picks, so
+    the next mobile moves up; the stats then count the suppressed numbers and
+    the contacts left without a mobile.
+
+    memo_key reuses columns normalized in earlier runs over the same rows
+    (see normalize_phone_pairs).
+    """
+    phones, types, allowed, landline = normalize_phone_pairs(
+        df, phone_pairs, allowed_types, landline_types, tick, memo_key
+    )
+    valid = phones != None  # noqa: E711 - elementwise check on an object array
+
+    mobile_mask = valid & allowed
+    landline_mask = valid & landline
+    candidates = mobile_mask.copy()
+    on_list = np.zeros(mobile_mask.shape, dtype=bool)
+    if suppressed is not None:
+        on_list = suppressed_cells(phones, mobile_mask, suppressed)
+        mobile_mask &= ~on_list
+
+    mobile_positions = _first_positions(mobile_mask, max_mobile)
+    landline_positions = _first_positions(landline_mask, max_landline)
+
+    phone_names = [f'Phone{i}' for i in range(1, max_mobile + 1)]
+    # Picks are text even where no row has one, so row ranges classified apart combine to the same columns
+    mobile_df = pd.DataFrame(
+        {name: _take(phones, mobile_positions[:, i]) for i, name in enumerate(phone_names)},
+        index=df.index, dtype='str'
+    )
+
+    landline_data = {}
+    for i in range(max_landline):
+        landline_data[f'Phone{i + 1}'] = _take(phones, landline_positions[:, i])
+    for i in range(max_landline):
+        landline_data[f'Phone{i + 1}_Type'] = _take(types, landline_positions[:, i])
+    landline_df = pd.DataFrame(landline_data, index=df.index, dtype='str')
+
+    has_mobile = mobile_mask.any(axis=1)
+
+    # QA counters from the same arrays: every typed phone, and any accepted type that
+    # ended up among the discard rows' landline picks
+    discard_allowed = np.zeros((len(df), max_landline), dtype=bool)
+    for i in range(max_landline):
+        discard_allowed[:, i] = ~has_mobile & _take_mask(allowed, landline_positions[:, i])
+    counts = _phone_counts(df.index, types, valid & (types != ''), discard_allowed)
+    if suppressed is not None:
+        counts[('suppressed_phones', '')] = on_list.sum(axis=1).astype(counts.dtypes.iloc[-1])
+        counts[('suppressed_contacts', '')] = (candidates.any(axis=1) & ~has_mobile).astype(np.uint8)
+
+    return {
+        'has_mobile': pd.Series(has_mobile, index=df.index),
+        'phones': mobile_df,
+        'landlines': landline_df,
+        'missing': _missing_phones(df.index, phones, candidates, mobile_positions, on_list, max_mobile),
+        'stats': sum_phone_counts(counts),
+        'counts': counts,
+    }
+
+def _phone_counts(index, types, typed, discard_allowed):
+    """Per-row QA counters: typed phones per line type label and accepted phones among a discard row's picks.
+
+    Columns are ('phones', label) for every label found and
+    ('discard_mobile_phones', ''), in the smallest integer type that holds a
+    row's phones.
+    """
+    codes, labels = pd.factorize(types[typed])
+    width = len(labels)
+    rows = np.nonzero(typed)[0]
+    dtype = np.min_scalar_type(max(types.shape[1], discard_allowed.shape[1]))
+    per_type = np.bincount(rows * width + codes, minlength=len(index) * width).reshape(len(index), width)
+    columns = pd.MultiIndex.from_tuples(
+        [('phones', label) for label in labels] + [('discard_mobile_phones', '')], names=['counter', 'type']
+    )
+    data = np.column_stack([per_type, discard_allowed.sum(axis=1)]).astype(dtype)
+    return pd.DataFrame(data, index=index, columns=columns)
+
+def sum_phone_counts(counts):
+    """QA counters of the rows of a per-row counts frame (see classify_phones), or of any slice of one.
+
+    total_rows, total_phones, phone_type_counts, discard_mobile_contacts and
+    discard_mobile_phones, plus suppressed_phones and suppressed_contacts
+    when the rows were checked against a suppression list.
+    """
+    totals = counts.sum(axis=0).astype(np.int64)
+    counters = counts.columns.get_level_values('counter')
+    type_counts = {label: int(total) for (counter, label), total in totals.items() if counter == 'phones' and total}
+    stats = {
+        'total_rows': len(counts),
+        'total_phones': sum(type_counts.values()),
+        'phone_type_counts': type_counts,
+        'discard_mobile_contacts': int((counts[('discard_mobile_phones', '')] > 0).sum()) if len(counts) else 0,
+        'discard_mobile_phones': int(totals.get(('discard_mobile_phones', ''), 0)),
+    }
+    if 'suppressed_phones' in counters:
+        stats['suppressed_phones'] = int(totals[('suppressed_phones', '')])
+        stats['suppressed_contacts'] = int(totals[('suppressed_contacts', '')])
+    return stats
+
+def _missing_phones(index, phones, candidates, positions, on_list, max_mobile):
+    """Mobile/VoIP numbers of each row that did not make the picks, with the reason.
+
+    Only rows with such numbers are returned, as 'Phone 1'.. (at least three
+    columns, more where a row lost more) and 'Reason'.
+    """
+    picked = np.zeros(candidates.shape, dtype=bool)
+    rows = np.arange(candidates.shape[0])
+    for slot in range(positions.shape[1]):
+        hit = positions[:, slot] >= 0
+        picked[rows[hit], positions[hit, slot]] = True
+    unexported = candidates & ~picked
+
+    rows = np.flatnonzero(unexported.any(axis=1))
+    unexported = unexported[rows]
+    width = max(3, int(unexported.sum(axis=1).max())) if len(rows) else 3
+    missing_positions = _first_positions(unexported, width)
+    data = {f'Phone {i + 1}': _take(phones[rows], missing_positions[:, i]) for i in range(width)}
+
+    suppressed = on_list[rows].any(axis=1)
+    beyond_limit = (unexported & ~on_list[rows]).any(axis=1)
+    limit_reason = f'More than {max_mobile} mobile/VoIP numbers'
+    data['Reason'] = np.where(
+        suppressed & beyond_limit, f'Suppressed (DNC); {limit_reason}',
+        np.where(suppressed, 'Suppressed (DNC)', limit_reason)
+    )
+    return pd.DataFrame(data, index=index[rows])
+
+def combine_missing_details(parts):
+    """Missing-phone frames of several chunks as one, Phone n columns in order however many each chunk has"""
+    parts = [part for part in parts if not part.empty] or parts[:1]
+    if not parts:
+        return pd.DataFrame()
+    widest = max(parts, key=lambda part: part.shape[1])
+    # A part whose Phone n column is all empty holds it as object; re-infer so text columns stay text
+    return pd.concat(parts)[list(widest.columns)].infer_objects()
+
+def combine_phone_counts(parts):
+    """Per-row counts frames of consecutive row ranges as one; a line type missing from a range counts 0 there"""
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return pd.DataFrame(
+            np.zeros((0, 1), dtype=np.uint8),
+            columns=pd.MultiIndex.from_tuples([('discard_mobile_phones', '')], names=['counter', 'type'])
+        )
+    combined = pd.concat(parts)
+    if any(part.shape[1] != combined.shape[1] for part in parts):
+        combined = combined.fillna(0)
+    # Every type's phones first, then the fixed counters, in the order each first appears
+    fixed = [col for col in combined.columns if col[0] != 'phones']
+    phones = [col for col in combined.columns if col[0] == 'phones']
+    return combined[phones + fixed].astype(max(part.dtypes.max() for part in parts))
+
+def combine_split_parts(parts):
+    """Outputs of a processor's row split over consecutive row ranges (chunks or shards) as one.
+
+    parts are (cleaned, discard, per-row counts, missing) tuples in row order;
+    returns the same tuple for all rows.
+    """
+    cleaned_parts = [cleaned for cleaned, _, _, _ in parts if not cleaned.empty]
+    discard_parts = [discard for _, discard, _, _ in parts if not discard.empty]
+    return (
+        pd.concat(cleaned_parts) if cleaned_parts else pd.DataFrame(),
+        pd.concat(discard_parts) if discard_parts else pd.DataFrame(),
+        combine_phone_counts([counts for _, _, counts, _ in parts]),
+        combine_missing_details([missing for _, _, _, missing in parts]),
+    )
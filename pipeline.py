@@ -0,0 +1,72 @@
+"""Composable processing pipeline over one in-memory frame.
+
+A pipeline is a list of steps run in order on the frame read from an
+upload. Each step is step(df, outputs, metrics): it adds its outputs to
+the shared dict and returns the rows left for the next step. Scrubbing
+entity owners before the phone step means one read and one write give
+the cleaned, discard, scrubbed-out and QA outputs:
+
+    steps = [scrub_step('Owner 1 Full Name'), app.phone_step(skip_exported=True), consolidate_step()]
+    outputs = run_pipeline(df, steps, metrics)
+"""
+import pandas as pd
+
+from consolidation import consolidate_owners, consolidation_summary
+from dedup_index import split_previously_exported
+from instrumentation import stage
+from scrub_engine import get_scrub_patterns, scrub_mask
+
+# ---------- RUNNER ----------
+def run_pipeline(df, steps, metrics):
+    """Run the steps over a frame; returns the outputs they added, plus the rows left at the end as 'rows'"""
+    outputs = {}
+    for step in steps:
+        df = step(df, outputs, metrics)
+    outputs['rows'] = df
+    return outputs
+
+# ---------- STEPS ----------
+def scrub_step(owner_column, keywords=None, cached=True):
+    """Step dropping entity owners (utilities, governments, churches...); they go to outputs['scrubbed']"""
+    patterns = get_scrub_patterns(keywords)
+
+    def step(df, outputs, metrics):
+        if owner_column not in df.columns:
+            raise ValueError(f"Owner column '{owner_column}' not found")
+        with stage(metrics, 'scrub', len(df), "🧹 Removing entity owners..."):
+            scrub = scrub_mask(df[owner_column], patterns, cached=cached).to_numpy()
+            outputs['scrubbed'] = df[scrub]
+            return df[~scrub]
+    return step
+
+def consolidate_step(by=None):
+    """Step merging the cleaned rows of owners with several parcels into one contact each (see consolidation.py).
+
+    Runs after the phone step; the rows it merged stay in outputs['parcels']
+    so downloads record every parcel as exported.
+    """
+    def step(df, outputs, metrics):
+        parcels_df = outputs['cleaned']
+        with stage(metrics, 'consolidate', len(parcels_df), "🧩 Consolidating owners with several parcels..."):
+            outputs['parcels'] = parcels_df
+            outputs['cleaned'] = consolidate_owners(parcels_df, by)
+            outputs['qa_summary'] = consolidation_summary(outputs['qa_summary'], outputs['cleaned'])
+            return outputs['cleaned']
+    return step
+
+def set_aside_exported(cleaned_df, metrics, skip_exported, record_as=None):
+    """Cleaned rows of a run and, with skip_exported, the contacts already in an earlier cleaned export.
+
+    Those go to their own output; with record_as the new ones are recorded
+    as exported as they are checked (see split_previously_exported).
+    """
+    if not skip_exported:
+        return cleaned_df, pd.DataFrame()
+    with stage(metrics, 'dedup', len(cleaned_df), "🔁 Checking previously exported contacts..."):
+        return split_previously_exported(cleaned_df, record_as=record_as)
+
+def consolidate_outputs(cleaned_df, qa_summary, metrics, by=None):
+    """consolidate_step for runs outside a pipeline (chunked runs): consolidated rows, parcel rows, QA summary"""
+    outputs = {'cleaned': cleaned_df, 'qa_summary': qa_summary}
+    consolidate_step(by)(cleaned_df, outputs, metrics)
+    return outputs['cleaned'], outputs['parcels'], outputs['qa_summary']
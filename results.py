@@ -0,0 +1,84 @@
+"""Processed results kept across reruns, with their files written on demand.
+
+Jobs return frames rather than files. A download button gets a callable
+that writes its file in the output format picked at that moment on the
+first click and keeps the bytes with the result, so downloading every
+file, or switching the format, costs one processing run. Runs are also
+remembered per session by the content of their inputs and their
+settings, so pressing the process button again with nothing changed
+shows the stored result instead of starting over.
+"""
+import hashlib
+import threading
+
+import numpy as np
+import streamlit as st
+
+from file_io import timed_export
+from instrumentation import stage
+from jobs import job_status, submit_job
+from staging import content_hash
+
+_exports_lock = threading.Lock()
+
+# ---------- RESULT STORE ----------
+def run_key(sources, **settings):
+    """Key of a run: the content hashes of its uploads and its settings (arrays by a digest of their values)"""
+    sources = sources if isinstance(sources, list) else [sources]
+    parts = [content_hash(source) for source in sources]
+    for name, value in sorted(settings.items()):
+        if isinstance(value, np.ndarray):
+            value = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        parts.append(f"{name}={value!r}")
+    return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
+
+def submit_run(key, task, *args, **kwargs):
+    """submit_job, unless this session already has a job for the same run key; returns the job id.
+
+    Jobs that failed or expired (see LANDLIST_JOB_TTL_MIN) are submitted again.
+    """
+    runs = st.session_state.setdefault('runs', {})
+    job_id = runs.get(key)
+    status = job_status(job_id) if job_id else None
+    if status is None or status['status'] == 'failed':
+        job_id = submit_job(task, *args, **kwargs)
+        runs[key] = job_id
+    return job_id
+
+def job_weights(weights):
+    """Stage weights of a job: its files are written on download, after the job is done"""
+    return {name: weight for name, weight in weights.items() if name != 'write'}
+
+# ---------- EXPORTS ----------
+def export_bytes(export, *args, **kwargs):
+    """Run an export and return its bytes together with the seconds it took"""
+    output, export_s = timed_export(export, *args, **kwargs)
+    with output:
+        return output.read(), export_s
+
+def exported(result, key, export, rows=None):
+    """(bytes, seconds) of export(), written once per result and key (an output name and format).
+
+    The write is recorded in the result's metrics as a 'write' pass.
+    """
+    with _exports_lock:
+        exports = result.setdefault('exports', {})
+        if key in exports:
+            return exports[key]
+    with stage(result['metrics'], 'write', rows):
+        data = export_bytes(export)
+    with _exports_lock:
+        return exports.setdefault(key, data)
+
+def download_data(result, key, export, rows=None):
+    """Data for a download button: the bytes of export(), written when the button is first clicked"""
+    return lambda: exported(result, key, export, rows)[0]
+
+def show_export_time(result, key):
+    """Caption with the seconds a file took to write, once it has been downloaded"""
+    with _exports_lock:
+        entry = result.get('exports', {}).get(key)
+    if entry is None:
+        st.caption("⏱️ Written when you download it")
+    else:
+        st.caption(f"⏱️ Exported in {entry[1]:.2f}s")
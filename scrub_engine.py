@@ -0,0 +1,237 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from file_io import OUTPUT_FORMATS
+from verdict_cache import cached_verdicts
+
+# Define default scrub patterns
+def get_scrub_patterns(custom_keywords=None):
+    default_patterns = [
+        # Gas / Utility / Energy
+        r'\bgas\b',
+        r'\bgas company\b',
+        r'\bgas co\b',
+        r'\bgas utility\b',
+        r'\butility\b',
+        r'\butilities co\b',
+        r'\bmunicipal utility\b',
+        r'\bmunicipal electric\b',
+        r'\belectric co\b',
+        r'\belectric company\b',
+        r'\belectric utility\b',
+        r'\belectric authority\b',
+        r'\belectric corp\b',
+        r'\bpower co\b',
+        r'\bpower company\b',
+        r'\bpower authority\b',
+        r'\bpower & light\b',
+        r'\bpower corp\b',
+        r'\benergy co\b',
+        r'\benergy company\b',
+        r'\brural electric\b',
+        r'\brural co-op\b',
+        r'\belectric co-op\b',
+        r'\bwater authority\b',
+        r'\bwater dept\b',
+        r'\bpwr\b',
+        r'\bpwr co\b',
+        r'\belec\b',
+        r'\btel co\b',
+        r'\btelco\b',
+        r'\btelephone co\b',
+
+        # Government / Municipality
+        r'\bborough of\b',
+        r'\btwp\b',
+        r'\btownship\b',
+        r'\btown of\b',
+        r'\bcity of\b',
+        r'\bcounty of\b',
+        r'\bcounty\b',
+        r'\bcommonwealth of\b',
+        r'\bstate dep\b',
+        r'\bstate highway\b',
+        r'\bdepartment of\b',
+        r'\bdept of\b',
+        r'\bdept\b',
+        r'\bmunicipal\b',
+        r'\bboard of\b',
+        r'\bcommission\b',
+        r'\bdevelopment district\b',
+        r'\broad commission\b',
+
+        # School / Education
+        r'\bschool district\b',
+        r'\bschool dist\b',
+        r'\bsch dis\b',
+        r'\bcity schools\b',
+        r'\bschool system\b',
+
+        # Fire / Emergency Services
+        r'\bfire co\b',
+        r'\bfire company\b',
+        r'\bvolunteer fire\b',
+
+        # Rail / Transport
+        r'\b Rr Co\b',
+        r'\brail car co\b',
+        r'\brailway\b',
+        r'\brr\b',
+
+        # Hospitals / Health
+        r'\bhospital\b',
+
+        # Cemetery / Conservancy
+        r'\bcemetery\b',
+        r'\bconservation authority\b',
+        r'\bconservancy\b',
+
+        # Waste Management
+        r'\bwaste management\b',
+
+        # Churches / Religious Orgs
+        r'\bchurch\b',
+        r'\bcommunity church\b',
+        r'\bfamily church\b',
+        r'\bchurch of\b',
+        r'\bbaptist\b',
+        r'\bmethodist\b',
+
+        # Development / Public Works
+        r'\bpublic works\b',
+        r'\bpub works\b',
+        r'\bdevl\b',
+        r'\bdevl co\b',
+        r'\bindustrial\b',
+    ]
+    
+    # Add custom patterns if provided
+    if custom_keywords:
+        custom_lines = [line.strip() for line in custom_keywords.split('\n') if line.strip()]
+        for keyword in custom_lines:
+            default_patterns.append(rf'\b{re.escape(keyword.lower())}\b')
+    
+    return default_patterns
+
+# Function to generate output filename
+def generate_filename(original_name, use_custom, custom_name, file_format):
+    if use_custom and custom_name.strip():
+        base_name = custom_name.strip()
+    else:
+        # Remove extension from original name (both parts of .csv.gz) and add SCRUB
+        base_name = re.sub(r'(\.(csv|tsv))?\.[^.]+$', '', original_name, flags=re.IGNORECASE) + "_SCRUB"
+    
+    # Add appropriate extension
+    return base_name + OUTPUT_FORMATS[file_format][0]
+
+# Function to pick the most likely owner name column
+def default_owner_column(columns):
+    potential_cols = [col for col in columns if any(keyword in str(col).lower()
+                     for keyword in ['owner', 'name', 'mail'])]
+    
+    return potential_cols[0] if potential_cols else columns[0]
+
+# ---------- COMPILED MATCHER ----------
+WORD_PATTERN = re.compile(r'\\b(.*)\\b', re.DOTALL)
+REGEX_METACHARS = set('.^$*+?{}[]|()')
+
+def _pattern_literal(pattern):
+    r"""Return the literal text of a \b...\b pattern, or None if it uses regex syntax"""
+    match = WORD_PATTERN.fullmatch(pattern)
+    if not match:
+        return None
+
+    literal = []
+    chars = iter(match.group(1))
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, None)
+            # \d, \s, \b... are character classes or anchors, not escaped literals
+            if escaped is None or escaped.isalnum() or escaped == '_':
+                return None
+            literal.append(escaped)
+        elif char in REGEX_METACHARS:
+            return None
+        else:
+            literal.append(char)
+    return ''.join(literal)
+
+def _trie_regex(node):
+    """Turn a character trie into a prefix-factored regex alternation"""
+    branches = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+
+    optional = '' in node
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')' + ('?' if optional else '')
+
+@lru_cache(maxsize=32)
+def compile_scrub_patterns(patterns):
+    """Compile a tuple of scrub patterns into one regex that matches if any pattern matches"""
+    trie = {}
+    others = []
+    for pattern in patterns:
+        literal = _pattern_literal(pattern)
+        if not literal:
+            others.append(pattern)
+            continue
+
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    # Keywords share one \b(...)\b trie so the cost per name stays flat as the list grows
+    alternatives = [rf'\b{_trie_regex(trie)}\b'] if trie else []
+    alternatives.extend(f'(?:{pattern})' for pattern in others)
+    return re.compile('|'.join(alternatives) if alternatives else r'(?!)')
+
+# Function to check if a name needs scrubbing
+def needs_scrub(owner_name, patterns):
+    if pd.isna(owner_name):
+        return False
+    name_lower = str(owner_name).lower()
+    return compile_scrub_patterns(tuple(patterns)).search(name_lower) is not None
+
+def scrub_mask(owner_names, patterns, cached=False, cache_dir=None):
+    """Vectorized needs_scrub over a whole owner name column.
+
+    Entity owners repeat thousands of times, so each distinct lowercased
+    name is matched once and its verdict broadcast back to the rows. With
+    cached=True the verdicts come from (and go to) the saved verdicts of
+    the pattern set, so names seen in earlier files are not matched again.
+    """
+    matcher = compile_scrub_patterns(tuple(patterns))
+    codes, uniques = pd.factorize(owner_names)
+    # Case variants of a name share one verdict
+    name_codes, names = pd.factorize(pd.Series([str(name).lower() for name in uniques], dtype=object))
+    names = np.asarray(names, dtype=object)
+
+    def match(names):
+        return pd.Series(names, dtype=object).str.contains(matcher, regex=True).to_numpy(dtype=bool)
+
+    verdicts = cached_verdicts(names, patterns, match, cache_dir) if cached else match(names)
+    # Code -1 (missing) takes the trailing False
+    unique_verdicts = np.append(verdicts[name_codes], False)
+    return pd.Series(unique_verdicts[codes], index=owner_names.index)
+
+def scrub_chunks(chunks, owner_column, patterns, cached=False):
+    """Scrub a stream of chunks; returns the kept rows, the removed owner names and the rows read"""
+    kept = []
+    removed_names = []
+    total_rows = 0
+    for chunk in chunks:
+        scrub = scrub_mask(chunk[owner_column], patterns, cached)
+        if not kept or (~scrub).any():
+            kept.append(chunk[~scrub])
+        removed_names.extend(chunk.loc[scrub, owner_column].tolist())
+        total_rows += len(chunk)
+
+    kept = [part for part in kept if not part.empty] or kept[:1]
+    cleaned_df = pd.concat(kept) if kept else pd.DataFrame()
+    return cleaned_df, removed_names, total_rows
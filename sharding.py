@@ -0,0 +1,96 @@
+"""Row-sharded processing of one large frame on several cores.
+
+Classifying phones and building the cleaned and discard layouts works row
+by row, so a large frame is cut into contiguous row shards that worker
+processes split side by side. Their outputs are put back together in shard
+order and their QA counters summed, which gives the same result as one
+serial pass:
+
+    parts = map_shards(__file__, 'split_shard', row_shards(df, 16), (suppressed,), workers=16)
+
+Sharding is opt-in: batch_process.py --shards for batch runs, and
+LANDLIST_APP_SHARDS for the apps. App jobs run in threads next to other
+sessions' jobs, so only one of them at a time shards (see shard_slot);
+the others stay serial. The processors are Streamlit scripts (NEWSCRUBBER has no
+.py extension), so workers load the script by its path and call the named
+function.
+"""
+import importlib.machinery
+import importlib.util
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+# ---------- CONFIGURATION ----------
+# Worker processes of a sharded run without a worker count (default: all cores)
+SHARD_WORKERS = int(os.environ.get('LANDLIST_SHARD_WORKERS') or os.cpu_count() or 1)
+
+# Frames with fewer rows are processed serially; starting workers and copying shards to them costs more
+SHARD_MIN_ROWS = int(os.environ.get('LANDLIST_SHARD_MIN_ROWS', '250000'))
+
+# Row shards of a large frame in the apps' jobs, on up to SHARD_WORKERS processes (0: the apps stay serial)
+APP_SHARDS = int(os.environ.get('LANDLIST_APP_SHARDS', '0'))
+
+_scripts = {}
+_sharded_run = threading.Lock()
+
+# ---------- PLANNING ----------
+def shard_plan(rows, shards=None, workers=None):
+    """(shards, workers) for a frame of `rows` rows, or None when it should be processed serially.
+
+    Only runs asking for shards are sharded. Frames under SHARD_MIN_ROWS and
+    plans with a single shard or worker stay serial.
+    """
+    if not shards:
+        return None
+    workers = min(workers or SHARD_WORKERS, shards)
+    if rows < SHARD_MIN_ROWS or shards <= 1 or workers <= 1:
+        return None
+    return shards, workers
+
+@contextmanager
+def shard_slot(plan):
+    """Hold a shard plan while no other sharded split runs in this process; yields None (serial) when one does"""
+    if plan is None or not _sharded_run.acquire(blocking=False):
+        yield None
+        return
+    try:
+        yield plan
+    finally:
+        _sharded_run.release()
+
+def row_shards(df, shards):
+    """Cut a frame into `shards` contiguous row ranges of near-equal size, in row order"""
+    bounds = np.linspace(0, len(df), shards + 1).astype(np.int64)
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+# ---------- WORKERS ----------
+def _script(path):
+    """Module of a processor script, loaded once per worker process"""
+    if path not in _scripts:
+        name = 'landlist_shard_' + os.path.basename(path).replace('.', '_')
+        loader = importlib.machinery.SourceFileLoader(name, path)
+        spec = importlib.util.spec_from_loader(name, loader)
+        module = importlib.util.module_from_spec(spec)
+        loader.exec_module(module)
+        _scripts[path] = module
+    return _scripts[path]
+
+def _run_shard(path, name, shard, args):
+    return getattr(_script(path), name)(shard, *args)
+
+def process_pool(workers):
+    """Pool of `workers` worker processes, spawned rather than forked: forking a process that runs Streamlit's
+    threads can deadlock"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def map_shards(path, name, shards, args=(), workers=None):
+    """Yield name(shard, *args) of each shard, called in worker processes on the script at path, in shard order"""
+    workers = min(workers or SHARD_WORKERS, len(shards))
+    with process_pool(workers) as pool:
+        yield from pool.map(_run_shard, itertools.repeat(path), itertools.repeat(name), shards, itertools.repeat(args))
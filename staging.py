@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+# ---------- CONFIGURATION ----------
+# Parsed workbooks are staged here as Arrow IPC files, one per distinct file content
+STAGING_DIR = os.environ.get('LANDLIST_STAGING_DIR') or os.path.join(tempfile.gettempdir(), 'landlist_staging')
+
+# Staged files are evicted least recently used first once they take more than this
+STAGING_MAX_BYTES = int(os.environ.get('LANDLIST_STAGING_MAX_MB', '2048')) * 1024 * 1024
+
+# Rows per Arrow record batch; a preview only maps the first batch
+STAGING_BATCH_ROWS = 65_536
+
+_staging_lock = threading.Lock()
+
+# ---------- HASHING ----------
+def content_hash(source):
+    """SHA-256 of an uploaded file's bytes or a file on disk"""
+    digest = hashlib.sha256()
+    if hasattr(source, 'getbuffer'):
+        digest.update(source.getbuffer())
+    else:
+        with open(source, 'rb') as handle:
+            for block in iter(lambda: handle.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+# ---------- ARROW CONVERSION ----------
+def _name_tag(name):
+    """JSON-safe column name that remembers whether the header was a number"""
+    if isinstance(name, bool) or not isinstance(name, (int, float)):
+        return ['str', str(name)]
+    return ['int' if isinstance(name, int) else 'float', name]
+
+def _name_value(tag):
+    kind, value = tag
+    return {'int': int, 'float': float}.get(kind, str)(value)
+
+def _object_array(values):
+    """Dense union of an object column, one child per Python type, so every cell keeps its type"""
+    children = {}
+    type_ids = []
+    offsets = []
+    for value in values:
+        kind = type(value)
+        if kind not in children:
+            children[kind] = []
+        type_ids.append(list(children).index(kind))
+        offsets.append(len(children[kind]))
+        children[kind].append(value)
+
+    if not children:
+        return pa.array([], type=pa.null())
+    return pa.UnionArray.from_dense(
+        pa.array(type_ids, type=pa.int8()),
+        pa.array(offsets, type=pa.int32()),
+        [pa.array(child) for child in children.values()]
+    )
+
+def _arrow_column(series):
+    """Arrow array of one column; object columns become dense unions (Excel columns mix types)"""
+    if series.dtype == object:
+        return _object_array(series.tolist())
+    return pa.Array.from_pandas(series)
+
+def _pandas_column(column, dtype):
+    """Column back from Arrow with the dtype it was read with"""
+    if pa.types.is_union(column.type) or pa.types.is_null(column.type):
+        return pd.Series(column.to_pylist(), dtype=object)
+    series = column.to_pandas()
+    return series if str(series.dtype) == dtype else series.astype(dtype)
+
+# ---------- STAGING ----------
+def _staged_path(digest, sheet=0):
+    """Staged file of a workbook's sheet at position `sheet` (the first sheet keeps the bare content hash)"""
+    return os.path.join(STAGING_DIR, f"{digest}.arrow" if not sheet else f"{digest}.{sheet}.arrow")
+
+def _evict(keep):
+    """Remove least recently used staged files until the staging area fits its size cap"""
+    staged = []
+    for name in os.listdir(STAGING_DIR):
+        path = os.path.join(STAGING_DIR, name)
+        if name.endswith('.arrow') and path != keep:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Evicted by another process (sheets are staged in worker processes) since the listing
+                continue
+            staged.append((stat.st_mtime, stat.st_size, path))
+
+    try:
+        total = sum(size for _, size, _ in staged) + os.path.getsize(keep)
+    except FileNotFoundError:
+        total = sum(size for _, size, _ in staged)
+    for _, size, path in sorted(staged):
+        if total <= STAGING_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            total -= size
+        except OSError:
+            # Still mapped by another session on platforms that lock open files
+            continue
+
+def find_staged(digest, sheet=0):
+    """Path of the staged file of a content hash (and sheet position), None if it has not been parsed yet"""
+    path = _staged_path(digest, sheet)
+    return path if os.path.exists(path) else None
+
+def stage_excel(source, digest=None, sheet=0):
+    """Parse a workbook's sheet (by position, the first by default) once into a staged Arrow file; returns its path.
+
+    Files are keyed by content hash, so the same county export uploaded again
+    (or reprocessed with other settings) skips the .xlsx parse entirely.
+    """
+    digest = digest or content_hash(source)
+    path = _staged_path(digest, sheet)
+    if os.path.exists(path):
+        # Touch on every use so eviction drops the least recently used files
+        os.utime(path)
+        return path
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    df = pd.read_excel(source, sheet_name=sheet)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+    arrays = [_arrow_column(df.iloc[:, i]) for i in range(df.shape[1])]
+    metadata = {
+        'names': json.dumps([_name_tag(name) for name in df.columns]),
+        'dtypes': json.dumps([str(dtype) for dtype in df.dtypes]),
+    }
+    schema = pa.schema([pa.field(f"c{i}", array.type) for i, array in enumerate(arrays)], metadata=metadata)
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    with _staging_lock:
+        os.makedirs(STAGING_DIR, exist_ok=True)
+        # Write under a temporary name so readers never see a half-written file
+        handle, temp_path = tempfile.mkstemp(dir=STAGING_DIR, suffix='.tmp')
+        os.close(handle)
+        with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table, max_chunksize=STAGING_BATCH_ROWS)
+        os.replace(temp_path, path)
+        _evict(path)
+    return path
+
+def _open_staged(path):
+    """Arrow IPC reader over a memory map of a staged file"""
+    # The map stays open as long as any column read from it is alive
+    return pa.ipc.open_file(pa.memory_map(path, 'r'))
+
+def staged_info(path):
+    """Column names and row count of a staged file, without reading any cells"""
+    reader = _open_staged(path)
+    names = [_name_value(tag) for tag in json.loads(reader.schema.metadata[b'names'])]
+    rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return names, rows
+
+def read_staged(path, columns=None, rows=None):
+    """Frame from a staged file, mapping in only the requested columns (and first rows)"""
+    reader = _open_staged(path)
+    names = [_name_value(tag) for tag in json.loads(reader.schema.metadata[b'names'])]
+    dtypes = json.loads(reader.schema.metadata[b'dtypes'])
+
+    if rows is None:
+        table = reader.read_all()
+    else:
+        batches = []
+        remaining = rows
+        for i in range(reader.num_record_batches):
+            if remaining <= 0:
+                break
+            batch = reader.get_batch(i).slice(0, remaining)
+            batches.append(batch)
+            remaining -= batch.num_rows
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+
+    positions = range(len(names)) if columns is None else [names.index(name) for name in columns]
+    data = {names[i]: _pandas_column(table.column(i), dtypes[i]) for i in positions}
+    return pd.DataFrame(data, index=pd.RangeIndex(table.num_rows))
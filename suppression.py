@@ -0,0 +1,103 @@
+"""Do-not-contact suppression lists as sorted phone arrays on disk.
+
+A suppression file (.csv, .txt or .xlsx, any layout; every cell holding a
+phone number counts) is normalized once into a sorted int64 array saved as
+.npy and keyed by the file's content hash. Later runs memory-map the saved
+array, so a list of millions of numbers loads instantly and is only paged
+in where the binary search touches it:
+
+    python suppression.py dnc_list.csv
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from phone_engine import normalize_phone_column, phone_integers
+from staging import content_hash
+
+# ---------- CONFIGURATION ----------
+SUPPRESSION_DIR = os.environ.get('LANDLIST_SUPPRESSION_DIR') or \
+    os.path.join(os.path.expanduser('~'), '.landlist', 'suppression')
+
+TEXT_EXTENSIONS = ('.csv', '.txt', '.tsv')
+FIELD_DELIMITERS = re.compile(r'[,;|\t]')
+
+_suppression_lock = threading.Lock()
+
+# ---------- PARSING ----------
+def _source_name(source):
+    return str(getattr(source, 'name', source))
+
+def read_suppression_file(source):
+    """Cells of a suppression file as a frame; text files give one column holding every field as a string"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if _source_name(source).lower().endswith(TEXT_EXTENSIONS):
+        if hasattr(source, 'read'):
+            data = source.read()
+        else:
+            with open(source, 'rb') as handle:
+                data = handle.read()
+        # Every cell counts the same wherever it sits, so each field of any common delimiter becomes a row
+        text = FIELD_DELIMITERS.sub('\n', data.decode('utf-8-sig', errors='replace'))
+        df = pd.DataFrame({0: pd.Series(text.splitlines(), dtype='str')})
+    else:
+        df = pd.read_excel(source, header=None)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return df
+
+def phone_numbers(df):
+    """Sorted unique 10-digit numbers (as int64) found in any cell of a frame"""
+    parts = []
+    for i in range(df.shape[1]):
+        phones = normalize_phone_column(df.iloc[:, i])
+        phones = phones[phones != None]  # noqa: E711 - elementwise check on an object array
+        if len(phones):
+            parts.append(phone_integers(phones))
+    if not parts:
+        return np.zeros(0, dtype=np.int64)
+    numbers = np.sort(np.concatenate(parts))
+    return numbers[np.concatenate(([True], numbers[1:] != numbers[:-1]))]
+
+# ---------- SAVED ARRAYS ----------
+def _saved_path(digest):
+    return os.path.join(SUPPRESSION_DIR, f"{digest}.npy")
+
+def load_suppression(source):
+    """Sorted int64 array of the numbers in a suppression file, memory-mapped from disk.
+
+    The file is parsed only the first time its content is seen; after that
+    the saved array is mapped in without reading it.
+    """
+    digest = content_hash(source)
+    path = _saved_path(digest)
+    if not os.path.exists(path):
+        numbers = phone_numbers(read_suppression_file(source))
+        with _suppression_lock:
+            os.makedirs(SUPPRESSION_DIR, exist_ok=True)
+            # Write under a temporary name so readers never see a half-written file
+            handle, temp_path = tempfile.mkstemp(dir=SUPPRESSION_DIR, suffix='.tmp')
+            with os.fdopen(handle, 'wb') as output:
+                np.save(output, numbers)
+            os.replace(temp_path, path)
+    return np.load(path, mmap_mode='r')
+
+# ---------- COMMAND LINE ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare a do-not-contact list for phone suppression")
+    parser.add_argument('file', help="Suppression list (.csv, .txt or .xlsx)")
+    args = parser.parse_args(argv)
+
+    numbers = load_suppression(args.file)
+    print(f"{len(numbers):,} distinct numbers in {_saved_path(content_hash(args.file))}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
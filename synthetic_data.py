@@ -0,0 +1,211 @@
+"""Synthetic land lists for benchmarks and manual testing.
+
+Generates LandPortal-style exports (the column names app.py expects) or a
+custom layout with arbitrary column names plus the NEWSCRUBBER mapping for it:
+
+    python synthetic_data.py 100000 -o landportal_100k.xlsx
+    python synthetic_data.py 100000 -o custom_100k.xlsx --layout custom --mapping-out custom_mapping.json
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+# ---------- CONFIGURATION ----------
+# Line types as LandPortal spells them, with their share of all typed phones
+DEFAULT_LINE_TYPE_MIX = {
+    'Mobile': 0.46,
+    'Landline': 0.30,
+    'Voip': 0.12,
+    'Pager': 0.02,
+    'SpecialService': 0.03,
+    'Wireline': 0.03,
+    'Unknown': 0.04,
+}
+
+FIRST_NAMES = ['JOHN', 'MARY', 'JAMES', 'PATRICIA', 'ROBERT', 'JENNIFER', 'MICHAEL', 'LINDA', 'DAVID', 'SUSAN']
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS', 'WILSON', 'MOORE']
+ENTITY_OWNERS = [
+    'COUNTY OF {county}', 'CITY OF {city}', 'FIRST BAPTIST CHURCH', '{county} SCHOOL DISTRICT',
+    '{city} GAS COMPANY', 'STATE HIGHWAY DEPT', 'ROSEHILL CEMETERY ASSN', '{county} RURAL ELECTRIC CO-OP',
+    'UNITED METHODIST CHURCH', 'TOWNSHIP OF {city}', 'VOLUNTEER FIRE CO', 'WATER AUTHORITY OF {county}',
+]
+PLACES = [
+    ('TX', 'Travis County', 'AUSTIN'), ('TX', 'Bexar', 'SAN ANTONIO'), ('OK', 'Canadian', 'YUKON'),
+    ('PA', 'Bucks', 'DOYLESTOWN'), ('TN', 'Maury', 'COLUMBIA'), ('NC', 'Wake', 'RALEIGH'),
+]
+STREETS = ['MAIN ST', 'OAK AVE', 'COUNTY ROAD 12', 'RANCH RD', 'HIGHWAY 71', 'MILL CREEK LN']
+
+# LandPortal export columns, as app.py reads them
+LANDPORTAL_PHONES = [
+    ('Phone', 'Phone (Line Type)'),
+    ('Alt Phone 1', 'Alt Phone 1 (Line Type)'),
+    ('Alt Phone 2', 'Alt Phone 2 (Line Type)'),
+    ('Alt Phone 3', 'Alt Phone 3 (Line Type)'),
+    ('Alt Phone 4', 'Alt Phone 4 (Line Type)'),
+    ('Alt Phone 5', 'Alt Phone 5 (Line Type)'),
+]
+LANDPORTAL_FIELDS = {
+    'first': 'Owner 1 First Name', 'last': 'Owner 1 Last Name', 'full': 'Owner 1 Full Name',
+    'mail_address': 'Mail Full Address', 'mail_city': 'Mail City', 'mail_state': 'Mail State', 'mail_zip': 'Mail Zip',
+    'parcel_address': 'Parcel Full Address', 'parcel_city': 'Parcel City', 'parcel_state': 'Parcel State',
+    'parcel_zip': 'Parcel Zip', 'apn': 'APN', 'county': 'Parcel County', 'acres': 'Lot Acres',
+}
+
+# A broker layout none of the smart suggestions were written for
+CUSTOM_PHONES = [(f'Contact Number {i}', f'Contact Number {i} Kind') for i in range(1, 6)]
+CUSTOM_FIELDS = {
+    'first': 'Owner Given', 'last': 'Owner Family', 'full': 'Owner Full Name',
+    'mail_address': 'Postal Street', 'mail_city': 'Postal Town', 'mail_state': 'Postal Region', 'mail_zip': 'Postal Code',
+    'parcel_address': 'Situs Street', 'parcel_city': 'Situs Town', 'parcel_state': 'Situs Region',
+    'parcel_zip': 'Situs Code', 'apn': 'Parcel Ref', 'county': 'Jurisdiction', 'acres': 'Area Ac',
+}
+CUSTOM_MAPPING = {
+    'FirstName': 'Owner Given', 'LastName': 'Owner Family', 'Email': None,
+    'MailingAddress': 'Postal Street', 'MailingCity': 'Postal Town', 'MailingState': 'Postal Region',
+    'MailingZip': 'Postal Code', 'PropertyAddress': 'Situs Street', 'PropertyCity': 'Situs Town',
+    'PropertyState': 'Situs Region', 'PropertyZip': 'Situs Code', 'APN': 'Parcel Ref',
+    'PropertyCounty': 'Jurisdiction', 'Acreage': 'Area Ac',
+}
+
+# ---------- GENERATION ----------
+def _blank(rng, values, rate):
+    """Blank out a share of an object array the way empty Excel cells read back (NaN)"""
+    values = values.astype(object)
+    values[rng.random(len(values)) < rate] = np.nan
+    return values
+
+def _phone_numbers(rng, count):
+    """Phone cells: mostly Excel numbers, some formatted text, a few 11-digit and junk values"""
+    numbers = rng.integers(2_000_000_000, 9_999_999_999, size=count)
+    style = rng.random(count)
+    cells = numbers.astype('float64').astype(object)
+
+    formatted = style >= 0.75
+    text = numbers[formatted].astype(str)
+    cells[formatted] = np.array([f"({t[:3]}) {t[3:6]}-{t[6:]}" for t in text], dtype=object)
+
+    with_prefix = (style >= 0.70) & (style < 0.75)
+    cells[with_prefix] = (numbers[with_prefix] + 10_000_000_000).astype('float64')
+
+    junk = (style >= 0.68) & (style < 0.70)
+    cells[junk] = 'N/A PHONE'
+    return cells
+
+def make_land_list(rows, seed=0, layout='landportal', phone_density=0.8, line_type_mix=None,
+                   blank_rate=0.05, entity_rate=0.1):
+    """Synthetic land list of `rows` rows.
+
+    phone_density is the share of phone slots that hold a number, falling off
+    for the later alternate phones; line_type_mix maps line-type labels to
+    their share; blank_rate blanks out that share of the name, address and
+    line-type cells; entity_rate is the share of owners that are churches,
+    counties, utilities and other entities the scrubber removes.
+    """
+    rng = np.random.default_rng(seed)
+    mix = line_type_mix or DEFAULT_LINE_TYPE_MIX
+    labels = np.array(list(mix), dtype=object)
+    weights = np.array(list(mix.values()), dtype='float64')
+    weights /= weights.sum()
+
+    phones = LANDPORTAL_PHONES if layout == 'landportal' else CUSTOM_PHONES
+    fields = LANDPORTAL_FIELDS if layout == 'landportal' else CUSTOM_FIELDS
+
+    place = rng.integers(0, len(PLACES), size=rows)
+    states = np.array([p[0] for p in PLACES], dtype=object)[place]
+    counties = np.array([p[1] for p in PLACES], dtype=object)[place]
+    cities = np.array([p[2] for p in PLACES], dtype=object)[place]
+
+    first = np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), size=rows)]
+    last = np.array(LAST_NAMES, dtype=object)[rng.integers(0, len(LAST_NAMES), size=rows)]
+    full = np.char.add(np.char.add(first.astype(str), ' '), last.astype(str)).astype(object)
+
+    entity = rng.random(rows) < entity_rate
+    if entity.any():
+        templates = np.array(ENTITY_OWNERS, dtype=object)[rng.integers(0, len(ENTITY_OWNERS), size=entity.sum())]
+        full[entity] = [t.format(county=c.upper(), city=ci) for t, c, ci in zip(templates, counties[entity], cities[entity])]
+        first[entity] = np.nan
+        last[entity] = np.nan
+
+    house = rng.integers(1, 9999, size=rows).astype(str)
+    street = np.array(STREETS, dtype=object)[rng.integers(0, len(STREETS), size=rows)].astype(str)
+    zips = rng.integers(10_000, 99_999, size=rows)
+
+    data = {
+        fields['first']: _blank(rng, first, blank_rate),
+        fields['last']: _blank(rng, last, blank_rate),
+        fields['full']: full,
+        fields['mail_address']: _blank(rng, np.char.add(np.char.add(house, ' '), street), blank_rate),
+        fields['mail_city']: _blank(rng, cities, blank_rate),
+        fields['mail_state']: _blank(rng, states, blank_rate),
+        fields['mail_zip']: zips,
+        fields['parcel_address']: _blank(rng, np.char.add('0 ', street), blank_rate),
+        fields['parcel_city']: _blank(rng, cities, blank_rate),
+        fields['parcel_state']: states,
+        fields['parcel_zip']: zips,
+        fields['apn']: np.char.add('R', rng.integers(100_000, 999_999, size=rows).astype(str)),
+        fields['county']: counties,
+        fields['acres']: np.round(rng.gamma(2.0, 12.0, size=rows), 2),
+    }
+
+    for slot, (phone_col, type_col) in enumerate(phones):
+        # Later alternate phones are filled less often, as in real skip-traced exports
+        present = rng.random(rows) < phone_density * (0.85 ** slot)
+        numbers = np.full(rows, np.nan, dtype=object)
+        numbers[present] = _phone_numbers(rng, int(present.sum()))
+        types = np.full(rows, np.nan, dtype=object)
+        types[present] = labels[rng.choice(len(labels), size=int(present.sum()), p=weights)]
+        data[phone_col] = numbers
+        data[type_col] = _blank(rng, types, blank_rate)
+
+    return pd.DataFrame(data)
+
+def column_mapping(layout='landportal'):
+    """NEWSCRUBBER column and phone mapping for a generated layout"""
+    if layout == 'landportal':
+        mapping = {output_col: None for output_col in CUSTOM_MAPPING}
+        reverse = {custom: landportal for landportal, custom in zip(LANDPORTAL_FIELDS.values(), CUSTOM_FIELDS.values())}
+        mapping.update({output_col: reverse[col] for output_col, col in CUSTOM_MAPPING.items() if col})
+        phones = LANDPORTAL_PHONES[:5]
+    else:
+        mapping = dict(CUSTOM_MAPPING)
+        phones = CUSTOM_PHONES
+    return {'columns': mapping, 'phones': [list(pair) for pair in phones]}
+
+# ---------- COMMAND LINE ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic land list")
+    parser.add_argument('rows', type=int, help="Number of rows")
+    parser.add_argument('-o', '--output', required=True, help="Output .xlsx or .csv file")
+    parser.add_argument('--layout', choices=['landportal', 'custom'], default='landportal',
+                        help="landportal: app.py column names, custom: arbitrary names for NEWSCRUBBER")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--phone-density', type=float, default=0.8, help="Share of phone slots holding a number")
+    parser.add_argument('--line-types', help='JSON line-type mix, e.g. \'{"Mobile": 0.5, "Landline": 0.5}\'')
+    parser.add_argument('--blank-rate', type=float, default=0.05, help="Share of blank name/address/type cells")
+    parser.add_argument('--entity-rate', type=float, default=0.1, help="Share of entity owners (churches, counties...)")
+    parser.add_argument('--mapping-out', help="Also write the NEWSCRUBBER mapping JSON for the layout here")
+    args = parser.parse_args(argv)
+
+    df = make_land_list(
+        args.rows, seed=args.seed, layout=args.layout, phone_density=args.phone_density,
+        line_type_mix=json.loads(args.line_types) if args.line_types else None,
+        blank_rate=args.blank_rate, entity_rate=args.entity_rate,
+    )
+    if args.output.lower().endswith('.csv'):
+        df.to_csv(args.output, index=False)
+    else:
+        from file_io import excel_export
+        with excel_export(df) as data, open(args.output, 'wb') as handle:
+            handle.write(data.read())
+
+    if args.mapping_out:
+        with open(args.mapping_out, 'w', encoding='utf-8') as handle:
+            json.dump(column_mapping(args.layout), handle, indent=2)
+    print(f"Wrote {len(df):,} rows to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
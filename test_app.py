@@ -0,0 +1,172 @@
+"""LandPortal processor (app.py) outputs against the row-by-row helpers it was built from"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import sharding
+from file_io import excel_sheets, read_table_file, selected_sheet_positions
+from pipeline import run_pipeline
+from phone_engine import sum_phone_counts
+from test_phone_engine import mixed_frame, nones
+
+
+def quiet_progress(percent, message):
+    pass
+
+
+def process(df, **kwargs):
+    return app.process_excel_file(df, progress=quiet_progress, **kwargs)
+
+
+@pytest.fixture(params=[1, 2, 3])
+def frame(request):
+    return mixed_frame(400, request.param)
+
+
+def row_by_row(df):
+    """Rows, phone picks and landline picks of the cleaned and discard files, one row at a time"""
+    rows = [(index, row) for index, row in df.iterrows()]
+    with_phones = [(index, row) for index, row in rows if app.has_valid_phones(row)]
+    without_phones = [(index, row) for index, row in rows if not app.has_valid_phones(row)]
+    phones = pd.DataFrame(
+        [app.extract_valid_phones(row) for _, row in with_phones], index=[index for index, _ in with_phones]
+    )
+    landlines = pd.DataFrame(
+        [app.extract_landlines_with_types(row) for _, row in without_phones],
+        index=[index for index, _ in without_phones]
+    )
+    return phones, landlines
+
+
+@pytest.mark.parametrize('typed', [False, True])
+def test_process_excel_file_matches_row_helpers(frame, typed):
+    cleaned_df, discard_df, qa_summary, _, previous_df = process(app.typed_input(frame) if typed else frame)
+    phones, landlines = row_by_row(frame)
+
+    assert cleaned_df.index.tolist() == phones.index.tolist()
+    assert discard_df.index.tolist() == landlines.index.tolist()
+    pd.testing.assert_frame_equal(nones(cleaned_df[list(phones.columns)]), nones(phones))
+    pd.testing.assert_frame_equal(nones(discard_df[list(landlines.columns)]), nones(landlines))
+    assert previous_df.empty
+    verification = qa_summary.set_index('QA CHECK').loc['Contact Count Verification', 'RESULT']
+    assert verification == '✅ MATCH'
+
+
+def test_process_excel_file_names_fall_back_to_full_name(frame):
+    cleaned_df, discard_df, _, _, _ = process(frame)
+    for output in (cleaned_df, discard_df):
+        no_name = frame.loc[output.index, 'Owner 1 First Name'].isna()
+        assert (output.loc[no_name, 'FirstName'] == frame.loc[output.index[no_name], 'Owner 1 Full Name']).all()
+
+
+def row_by_row_phone_stats(df, discard_df, phone_types):
+    """generate_qa_data's original counters: typed phones per line type, and discard contacts/phones of phone_types"""
+    type_counts = {}
+    for phone_col, type_col in app.phone_columns:
+        for _, row in df.iterrows():
+            phone_type = str(row[type_col]).strip() if pd.notnull(row[type_col]) else ''
+            if app.normalize_phone(row[phone_col]) and phone_type:
+                type_counts[phone_type] = type_counts.get(phone_type, 0) + 1
+    discard_contacts = discard_phones = 0
+    for _, row in discard_df.iterrows():
+        hits = sum(
+            1 for i in range(1, 6)
+            if pd.notnull(row[f'Phone{i}']) and row[f'Phone{i}'] != ''
+            and str(row[f'Phone{i}_Type']).strip().lower() in phone_types
+        )
+        discard_contacts += hits > 0
+        discard_phones += hits
+    return {
+        'total_rows': len(df),
+        'total_phones': sum(type_counts.values()),
+        'phone_type_counts': type_counts,
+        'discard_mobile_contacts': discard_contacts,
+        'discard_mobile_phones': discard_phones,
+    }
+
+
+def test_fused_phone_stats_match_fallback_and_row_counts(frame):
+    _, discard_df, phone_counts, _ = app.split_phone_rows(frame, app.processing_run(quiet_progress, len(frame)))
+    expected = row_by_row_phone_stats(frame, discard_df, app.allowed_types)
+    assert sum_phone_counts(phone_counts) == expected
+    assert app.count_phone_stats(frame) == expected
+
+
+def test_place_qa_matches_each_place_alone(frame):
+    suppressed = np.array([5551234567], dtype=np.int64)
+    df = app.typed_input(frame)
+    steps = app.processing_steps(suppressed=suppressed)
+    outputs = run_pipeline(df, steps, app.processing_run(quiet_progress, len(df)))
+    places = app.place_outputs(
+        df, outputs['cleaned'], outputs['discard'], outputs['previous'], outputs['qa_details'], outputs['phone_counts']
+    )
+    seen = 0
+    for (state, county), cleaned, discard, _, _, qa_summary, qa_details in places:
+        rows = df[(df['Parcel State'] == state) & (df['Parcel County'] == county)]
+        alone = process(rows, suppressed=suppressed)
+        assert cleaned.index.tolist() == alone[0].index.tolist()
+        assert discard.index.tolist() == alone[1].index.tolist()
+        pd.testing.assert_frame_equal(qa_summary, alone[2])
+        # The run's missing-phones columns fit its widest row, so a place may have extra empty ones
+        pd.testing.assert_frame_equal(nones(qa_details[alone[3].columns]), nones(alone[3]))
+        assert qa_details.drop(columns=alone[3].columns).isna().all().all()
+        seen += len(rows)
+    assert seen == len(df)
+    assert 'Contacts Moved to Discard by Suppression' in qa_summary['QA CHECK'].tolist()
+
+
+def test_sharded_outputs_match_serial(frame, monkeypatch):
+    monkeypatch.setattr(sharding, 'SHARD_MIN_ROWS', 0)
+    suppressed = np.array([5551234567], dtype=np.int64)
+    serial = process(app.typed_input(frame), suppressed=suppressed)
+    sharded = process(app.typed_input(frame), suppressed=suppressed, shards=3, workers=2)
+    for serial_output, sharded_output in zip(serial, sharded):
+        pd.testing.assert_frame_equal(sharded_output, serial_output)
+
+
+def test_csv_upload_is_processed(frame):
+    upload = io.BytesIO(frame.to_csv(index=False).encode('utf-8'))
+    upload.name = 'county.csv'
+    sheets = excel_sheets(upload)
+    assert sheets == [] and selected_sheet_positions(sheets, []) == [0]
+
+    result = app.process_upload(upload, columns=list(frame.columns), total_rows=len(frame), progress=quiet_progress)
+    cleaned_df, discard_df, _, _, _ = process(app.typed_input(read_table_file(upload)))
+    assert len(result['cleaned_df']) > 0
+    pd.testing.assert_frame_equal(result['cleaned_df'], cleaned_df)
+    pd.testing.assert_frame_equal(result['discard_df'], discard_df)
+
+
+def test_one_sharded_split_at_a_time():
+    with sharding.shard_slot((3, 2)) as plan:
+        assert plan == (3, 2)
+        with sharding.shard_slot((4, 2)) as other:
+            assert other is None
+    with sharding.shard_slot((4, 2)) as plan:
+        assert plan == (4, 2)
+    with sharding.shard_slot(None) as plan:
+        assert plan is None
+
+
+def test_app_jobs_shard_when_configured(frame, monkeypatch):
+    monkeypatch.setattr(sharding, 'SHARD_MIN_ROWS', 0)
+    monkeypatch.setattr(sharding, 'SHARD_WORKERS', 2)
+    monkeypatch.setattr(app, 'APP_SHARDS', 3)
+    sharded = []
+
+    def map_shards(*args):
+        sharded.append(len(args[2]))
+        return sharding.map_shards(*args)
+
+    monkeypatch.setattr(app, 'map_shards', map_shards)
+    upload = io.BytesIO(frame.to_csv(index=False).encode('utf-8'))
+    upload.name = 'county.csv'
+    result = app.process_upload(upload, columns=list(frame.columns), total_rows=len(frame), progress=quiet_progress)
+    cleaned_df, discard_df, qa_summary, _, _ = process(app.typed_input(read_table_file(upload)))
+    assert sharded == [3]
+    pd.testing.assert_frame_equal(result['cleaned_df'], cleaned_df)
+    pd.testing.assert_frame_equal(result['discard_df'], discard_df)
+    pd.testing.assert_frame_equal(result['qa_summary'], qa_summary)
@@ -0,0 +1,118 @@
+"""Owner consolidation against grouping the cleaned rows by hand"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from consolidation import APN_DELIMITER, consolidate_owners
+from dedup_index import key_text
+from pipeline import consolidate_outputs, run_pipeline
+from sharding import row_shards
+from test_phone_engine import mixed_frame, nones
+
+
+def cleaned_frame(rows, seed):
+    """Cleaned-layout rows of a few owners written several ways, with gaps in every column"""
+    rng = np.random.default_rng(seed)
+
+    def pick(values):
+        return [values[i] for i in rng.integers(len(values), size=rows)]
+
+    phones = ['2105550100', '2105550101', '2105550102', '2105550103', '2105550104', None, '']
+    return pd.DataFrame({
+        'FirstName': pick(['Ann', ' ann', 'ANN ', 'Bo', 'Cy', '', None]),
+        'LastName': pick(['Lee', 'LEE', 'Diaz', '']),
+        'MailingAddress': pick(['1 Main St.', '1 main  st', '2 Oak Rd', '2 Oak Rd #4', '', None]),
+        'MailingCity': pick(['Austin', 'austin']),
+        'MailingState': pick(['TX', 'tx']),
+        'MailingZip': pick(['78701', '78701-1234', '78702']),
+        'Phone1': pick(phones[:5]),
+        'Phone2': pick(phones),
+        'Phone3': pick(phones),
+        'APN': pick(['R100', 'r100', 'R200', 'R300', 'R400', '', None]),
+        'PropertyCounty': pick(['Travis', 'Bexar']),
+        'Acreage': pick([1.5, 2.25, 10.0, np.nan]),
+    }, index=pd.RangeIndex(1000, 1000 + rows))
+
+
+def by_hand(df, by=None):
+    """consolidate_owners one row at a time: owners keyed in a dict, their rows merged in row order"""
+    groups = {}
+    for position, (_, row) in enumerate(df.iterrows()):
+        name = (key_text(row['FirstName']) + ' ' + key_text(row['LastName'])).strip()
+        address = re.sub(r'[^\w ]', '', key_text(row['MailingAddress'])).strip()
+        key = (name, address, key_text(row['MailingCity']), key_text(row['MailingState']),
+               key_text(row['MailingZip'])[:5]) + tuple(key_text(row[col]) for col in by or [])
+        groups.setdefault(key if name and address else position, []).append(position)
+
+    contacts = []
+    for positions in groups.values():
+        rows = df.iloc[positions]
+        contact = rows.iloc[0].copy()
+        contact['ParcelCount'] = len(positions)
+        if len(positions) > 1:
+            acres = rows['Acreage'].dropna()
+            if len(acres):
+                contact['Acreage'] = round(acres.sum(), 4)
+            apns = list(dict.fromkeys(key_text(apn) for apn in rows['APN'] if key_text(apn)))
+            if apns:
+                contact['APN'] = APN_DELIMITER.join(apns)
+            distinct = list(dict.fromkeys(
+                phone for _, row in rows.iterrows() for phone in row[['Phone1', 'Phone2', 'Phone3']]
+                if pd.notna(phone) and phone != ''
+            ))
+            for slot, phone in enumerate(distinct[:3]):
+                contact[f'Phone{slot + 1}'] = phone
+        contacts.append(contact)
+    return pd.DataFrame(contacts)
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('by', [None, ['PropertyCounty']])
+def test_consolidate_owners_matches_grouping_by_hand(seed, by):
+    df = cleaned_frame(300, seed)
+    consolidated = consolidate_owners(df, by)
+    expected = by_hand(df, by)
+    assert consolidated['ParcelCount'].sum() == len(df)
+    assert (consolidated['ParcelCount'] > 1).any()
+    pd.testing.assert_frame_equal(nones(consolidated), nones(expected))
+
+
+def test_rows_without_a_key_stay_as_they_are():
+    df = cleaned_frame(200, 4)
+    unkeyed = df['FirstName'].fillna('').str.strip().eq('') & df['LastName'].eq('') | \
+        df['MailingAddress'].fillna('').eq('')
+    consolidated = consolidate_owners(df)
+    kept = consolidated.loc[df.index[unkeyed]]
+    assert (kept['ParcelCount'] == 1).all()
+    pd.testing.assert_frame_equal(nones(kept.drop(columns='ParcelCount')), nones(df[unkeyed]))
+
+
+def owner_frame(rows, seed):
+    """LandPortal-style input whose owners own several parcels at the same mailing address"""
+    df = mixed_frame(rows, seed)
+    df['Owner 1 First Name'] = [f'First{i % 20}' for i in range(rows)]
+    df['Owner 1 Last Name'] = 'Doe'
+    df['Mail Full Address'] = [f'{i % 20} Main St' if i % 11 else None for i in range(rows)]
+    df['Mail City'], df['Mail State'], df['Mail Zip'] = 'Austin', 'TX', '78701'
+    return df
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_pipeline_and_chunked_runs_consolidate_alike(seed):
+    df = app.typed_input(owner_frame(400, seed))
+    quiet = app.processing_run(lambda percent, message: None, len(df))
+    outputs = run_pipeline(df, app.processing_steps(consolidate=True), quiet)
+
+    cleaned_df, _, qa_summary, _, _ = app.process_excel_chunks(row_shards(df, 3), metrics=quiet)
+    consolidated, parcels_df, qa_summary = consolidate_outputs(cleaned_df, qa_summary, quiet)
+
+    pd.testing.assert_frame_equal(consolidated, outputs['cleaned'])
+    pd.testing.assert_frame_equal(parcels_df, outputs['parcels'])
+    pd.testing.assert_frame_equal(qa_summary, outputs['qa_summary'])
+    results = qa_summary.set_index('QA CHECK')['RESULT']
+    assert results['Contact Count Verification'] == '✅ MATCH'
+    assert int(results['Parcels Merged into Owner Contacts'].replace(',', '')) == \
+        len(parcels_df) - len(consolidated) > 0
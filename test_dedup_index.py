@@ -0,0 +1,101 @@
+"""Match keys and the previously exported index"""
+import numpy as np
+import pandas as pd
+
+import app
+import batch_process
+import dedup_index
+from dedup_index import match_keys, record_exported, record_on_download, split_previously_exported
+from file_io import read_table_file
+from pipeline import set_aside_exported
+from test_phone_engine import mixed_frame
+
+
+def messy_frame():
+    """Input rows whose key cells need cleaning: numeric APNs, spacing, case, 'nan' text and county suffixes"""
+    return pd.DataFrame({
+        'APN': [123.0, ' 0045-A ', None, 'nan', '', 7, 2.5, None, None],
+        'Owner 1 Full Name': ['x', None, ' Jane   DOE ', None, 'NaN', None, 'Smith\tTrust', None, None],
+        'Owner 1 First Name': ['a', 'b', None, ' Ann ', 'Bo', None, None, 'Cy', None],
+        'Owner 1 Last Name': ['z', None, None, 'lee', None, None, None, None, None],
+        'Parcel State': ['tx', 'TX', 'OK', None, 'TX', 'TX', 'ok', None, None],
+        'Parcel County': ['Travis County', ' travis ', None, 'Bexar', 'Bexar', 'Caddo  Parish', 'Osage', None, None],
+    }, dtype=object)
+
+
+def test_get_match_key_matches_match_keys():
+    for df in (messy_frame(), mixed_frame(200, 4)):
+        expected = match_keys(
+            df, apn_col='APN', first_col='Owner 1 First Name', last_col='Owner 1 Last Name',
+            full_name_col='Owner 1 Full Name', state_col='Parcel State', county_col='Parcel County'
+        ).tolist()
+        assert [app.get_match_key(row) for _, row in df.iterrows()] == expected
+
+
+def test_get_match_key_cleanup():
+    keys = [app.get_match_key(row) for _, row in messy_frame().iterrows()]
+    assert keys[:4] == ['APN:TX|TRAVIS|123', 'APN:TX|TRAVIS|0045-A', 'NAME:JANE DOE', 'NAME:ANN LEE']
+    assert keys[-1] is None
+
+
+def cleaned_rows(names):
+    return pd.DataFrame({
+        'FirstName': names, 'LastName': ['Doe'] * len(names), 'APN': [None] * len(names),
+        'PropertyState': ['TX'] * len(names), 'PropertyCounty': ['Travis'] * len(names),
+    })
+
+
+def test_recorded_contacts_are_set_aside(tmp_path):
+    path = str(tmp_path / 'index.sqlite3')
+    first = cleaned_rows(['Ann', 'Bo'])
+    assert split_previously_exported(first, path)[1].empty
+    assert record_exported(first, 'first.xlsx', path) == 2
+
+    new_df, previous_df = split_previously_exported(cleaned_rows(['bo', 'Cy']), path)
+    assert new_df['FirstName'].tolist() == ['Cy']
+    assert previous_df['FirstName'].tolist() == ['bo']
+    assert np.all(previous_df['ExportedOn'].str.len() == 10)
+
+
+def test_lookup_and_record_in_one_step(tmp_path):
+    path = str(tmp_path / 'index.sqlite3')
+    new_df, _ = split_previously_exported(cleaned_rows(['Ann', 'Bo']), path, record_as='first.csv')
+    assert len(new_df) == 2
+    new_df, previous_df = split_previously_exported(cleaned_rows(['Bo', 'Cy']), path, record_as='second.csv')
+    assert new_df['FirstName'].tolist() == ['Cy']
+    assert previous_df['FirstName'].tolist() == ['Bo']
+
+
+def test_batch_files_in_parallel_keep_each_contact_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup_index, 'DEDUP_INDEX_PATH', str(tmp_path / 'index.sqlite3'))
+    df = mixed_frame(300, 5)
+    for name in ('north.csv', 'south.csv'):
+        df.to_csv(tmp_path / name, index=False)
+    out_dir = tmp_path / 'out'
+
+    assert batch_process.main([
+        'phones', str(tmp_path / 'north.csv'), str(tmp_path / 'south.csv'), '-o', str(out_dir),
+        '--skip-exported', '-w', '2', '--format', 'csv'
+    ]) == 0
+    cleaned = [pd.read_csv(path) for path in out_dir.glob('*LCT*.csv')]
+    previous = [pd.read_csv(path) for path in out_dir.glob('*PreviouslyExported*.csv')]
+    # The other file's contacts were all set aside, so it has no cleaned file
+    single, _, _, _, _ = app.process_excel_file(
+        app.typed_input(read_table_file(str(tmp_path / 'north.csv'))), progress=lambda percent, message: None
+    )
+    assert len(cleaned) == 1 and len(previous) == 1
+    assert len(cleaned[0]) == len(previous[0]) == len(single) > 0
+
+
+def test_set_aside_and_record_on_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup_index, 'DEDUP_INDEX_PATH', str(tmp_path / 'index.sqlite3'))
+    metrics = app.processing_run(lambda percent, message: None, 2)
+    first = cleaned_rows(['Ann', 'Bo'])
+    new_df, previous_df = set_aside_exported(first, metrics, skip_exported=False)
+    assert new_df is first and previous_df.empty
+
+    button = record_on_download(first.iloc[:1], 'first.xlsx', parcels_df=first)
+    button['on_click'](*button['args'])
+    new_df, previous_df = set_aside_exported(cleaned_rows(['Bo', 'Cy']), metrics, skip_exported=True)
+    assert new_df['FirstName'].tolist() == ['Cy']
+    assert previous_df['FirstName'].tolist() == ['Bo']
@@ -0,0 +1,223 @@
+"""CSV and Parquet input and output, the parse cache, and zipped outputs"""
+import gzip
+import io
+import struct
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import file_io
+import staging
+from test_phone_engine import mixed_frame, nones
+from file_io import iter_excel_chunks, place_partitions, read_excel_cached, read_table_file, table_export, zip_file
+
+
+def csv_upload(text, name='county.csv'):
+    upload = io.BytesIO(text.encode('utf-8'))
+    upload.name = name
+    return upload
+
+
+def decimal_csv(rows):
+    """Float-written phones, identifiers that look like decimals, and acreage that turns to text past the first block"""
+    rng = np.random.default_rng(7)
+    lines = ['Phone,APN,Mail Zip,Lot Acres,Owner']
+    for i in range(rows):
+        phone = f'{5550000000 + i}.0' if i % 9 else ''
+        apn = ['0012.30', '12E45', f'{i:05d}', '7.5'][i % 4]
+        acres = f'{rng.integers(1, 99)}.{i % 10}' if i < rows - 5 else 'see deed'
+        lines.append(f'{phone},{apn},0{i % 9999:04d},{acres},Owner {i}')
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.parametrize('chunk_size', [997, 25_000])
+def test_chunked_csv_reads_match_the_whole_read(chunk_size):
+    upload = csv_upload(decimal_csv(60_000))
+    whole = read_table_file(upload)
+    chunks = pd.concat(iter_excel_chunks(upload, chunk_size=chunk_size))
+    pd.testing.assert_frame_equal(chunks, whole)
+
+    assert whole['Phone'].dtype == np.float64
+    assert whole['Phone'].iloc[1] == 5550000001.0
+    # Identifier columns keep their text exactly as written
+    assert whole['APN'].iloc[:4].tolist() == ['0012.30', '12E45', '00002', '7.5']
+    assert whole['Mail Zip'].iloc[1] == '00001'
+    # Acreage is decimal in the first block, so its later text stays text and its numbers stay numbers
+    assert whole['Lot Acres'].iloc[0] == float(whole['Lot Acres'].iloc[0])
+    assert whole['Lot Acres'].iloc[-1] == 'see deed'
+
+
+@pytest.mark.parametrize('output_format', ['CSV', 'CSV (gzip)', 'Parquet'])
+def test_mixed_columns_keep_their_gaps(output_format):
+    df = pd.DataFrame({
+        'APN': pd.Series(['R100', 12345, None, 7.5, np.nan, pd.NA], dtype=object),
+        'Acreage': [1.5, np.nan, 2.0, 3.0, None, 4.0],
+    })
+    output = table_export(df, output_format)
+    if output_format == 'Parquet':
+        written = pd.read_parquet(output)
+    else:
+        # Only empty cells read as missing, so gaps written as 'nan' or 'None' would show
+        written = pd.read_csv(
+            output, compression='gzip' if output_format == 'CSV (gzip)' else None, dtype={'APN': str},
+            keep_default_na=False, na_values=['']
+        )
+    assert written['APN'].tolist()[:2] == ['R100', '12345']
+    assert written['APN'].tolist()[3] == '7.5'
+    assert written['APN'].isna().tolist() == [False, False, True, False, True, True]
+    assert written['Acreage'].isna().tolist() == df['Acreage'].isna().tolist()
+
+
+def test_place_partitions_name_each_row():
+    rng = np.random.default_rng(5)
+    states = [['TX', 'OK', None, np.nan][i] for i in rng.integers(4, size=20_000)]
+    counties = [f'County {i}' if i % 50 else 'County  0' for i in rng.integers(3000, size=20_000)]
+    codes, places = place_partitions(states, counties)
+    assert places == sorted(set(places))
+    expected = [
+        (state if isinstance(state, str) else 'Unknown', county.replace(' ', ''))
+        for state, county in zip(states, counties)
+    ]
+    assert [places[code] for code in codes] == expected
+
+
+@pytest.fixture
+def parse_cache(tmp_path, monkeypatch):
+    """An empty parse cache and staging area, with the reads that miss it counted by file name"""
+    monkeypatch.setattr(file_io, '_parse_cache', file_io.OrderedDict())
+    monkeypatch.setattr(file_io, '_parse_cache_bytes', 0)
+    monkeypatch.setattr(staging, 'STAGING_DIR', str(tmp_path))
+    reads = []
+    for name in ['read_table_file', 'read_staged']:
+        read = getattr(file_io, name)
+        monkeypatch.setattr(file_io, name, lambda source, *args, read=read, **kwargs: reads.append(1) or read(
+            source, *args, **kwargs
+        ))
+    return reads
+
+
+def county_csv(seed, rows=200):
+    return csv_upload(pd.DataFrame({
+        'APN': [f'{seed}-{i:05d}' for i in range(rows)], 'Phone': [5551230000 + i for i in range(rows)]
+    }).to_csv(index=False))
+
+
+def test_parse_cache_hits_on_the_same_content(parse_cache):
+    first = read_excel_cached(county_csv(1))
+    # Another upload object with the same bytes, as a Streamlit rerun hands over
+    assert read_excel_cached(county_csv(1)) is first
+    assert len(parse_cache) == 1
+    assert read_excel_cached(county_csv(1), columns=['APN']).columns.tolist() == ['APN']
+    assert read_excel_cached(county_csv(2)) is not first
+    assert len(parse_cache) == 3
+
+    upload = io.BytesIO()
+    pd.read_csv(county_csv(3)).to_excel(upload, index=False)
+    upload.name = 'county.xlsx'
+    frame = read_excel_cached(upload, columns=['Phone'])
+    assert read_excel_cached(upload, columns=['Phone']) is frame
+    assert len(parse_cache) == 4
+    pd.testing.assert_frame_equal(frame, pd.read_excel(upload, usecols=['Phone']), check_dtype=False)
+
+
+def test_parse_cache_evicts_the_least_recently_used(parse_cache, monkeypatch):
+    size = int(read_excel_cached(county_csv(1)).memory_usage(index=True, deep=True).sum())
+    monkeypatch.setattr(file_io, 'PARSE_CACHE_MAX_BYTES', int(size * 2.5))
+    read_excel_cached(county_csv(2))
+    read_excel_cached(county_csv(1))
+    read_excel_cached(county_csv(3))
+    assert len(parse_cache) == 3
+    # The second upload was used least recently, so it went; the first is still a hit
+    read_excel_cached(county_csv(1))
+    assert len(parse_cache) == 3
+    read_excel_cached(county_csv(2))
+    assert len(parse_cache) == 4
+
+    # A frame larger than the whole cache is kept until the next one comes
+    monkeypatch.setattr(file_io, 'PARSE_CACHE_MAX_BYTES', 1)
+    big = read_excel_cached(county_csv(4, rows=5000))
+    assert read_excel_cached(county_csv(4, rows=5000)) is big
+    assert list(file_io._parse_cache) == [next(reversed(file_io._parse_cache))]
+
+
+LAUNCH_CONTROL_COLUMNS = [
+    'FirstName', 'LastName', 'Email', 'MailingAddress', 'MailingCity', 'MailingState', 'MailingZip',
+    'PropertyAddress', 'PropertyCity', 'PropertyState', 'PropertyZip', 'Phone1', 'Phone2', 'Phone3', 'APN',
+    'PropertyCounty', 'Acreage'
+]
+
+
+def upload_as(frame, name):
+    """An upload of a frame in the format its name says"""
+    if name.endswith('.parquet'):
+        data = table_export(frame, 'Parquet').read()
+    else:
+        data = frame.to_csv(index=False, sep='\t' if '.tsv' in name else ',').encode('utf-8')
+        if name.endswith('.gz'):
+            data = gzip.compress(data)
+    upload = io.BytesIO(data)
+    upload.name = name
+    return upload
+
+
+def processed(upload, frame):
+    return app.process_upload(
+        upload, columns=list(frame.columns), total_rows=len(frame), progress=lambda percent, message: None
+    )
+
+
+@pytest.mark.parametrize('name', ['county.tsv', 'county.csv.gz', 'county.tsv.gz', 'county.parquet'])
+def test_every_input_format_processes_like_csv(name):
+    frame = mixed_frame(300, 2)
+    expected = processed(upload_as(frame, 'county.csv'), frame)
+    result = processed(upload_as(frame, name), frame)
+    for output in ['cleaned_df', 'discard_df']:
+        assert result[output].columns.tolist() == expected[output].columns.tolist()
+        pd.testing.assert_frame_equal(nones(result[output]), nones(expected[output]), check_dtype=False)
+    pd.testing.assert_frame_equal(result['qa_summary'], expected['qa_summary'])
+    assert result['cleaned_df'].columns.tolist() == LAUNCH_CONTROL_COLUMNS
+
+
+def csv_text(value):
+    """A cell as the CSV writer writes it: gaps and '' empty, whole numbers without a decimal point"""
+    if value is None or value == '' or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+@pytest.mark.parametrize('output_format', ['CSV', 'CSV (gzip)', 'Parquet'])
+def test_outputs_keep_the_launch_control_columns(output_format):
+    frame = mixed_frame(300, 3)
+    cleaned_df = processed(upload_as(frame, 'county.csv'), frame)['cleaned_df']
+    assert cleaned_df.columns.tolist() == LAUNCH_CONTROL_COLUMNS
+    written = table_export(cleaned_df, output_format)
+    if output_format == 'Parquet':
+        back = pd.read_parquet(written)
+        assert back.columns.tolist() == LAUNCH_CONTROL_COLUMNS
+        pd.testing.assert_frame_equal(nones(back), nones(cleaned_df.reset_index(drop=True)), check_dtype=False)
+        return
+    if output_format == 'CSV (gzip)':
+        written = io.BytesIO(gzip.decompress(written.read()))
+    back = pd.read_csv(written, dtype=str, keep_default_na=False)
+    assert back.columns.tolist() == LAUNCH_CONTROL_COLUMNS
+    expected = cleaned_df.astype(object).map(csv_text).reset_index(drop=True)
+    pd.testing.assert_frame_equal(back, expected, check_dtype=False)
+
+
+def test_zip_file_members_are_zip64_from_the_start():
+    members = [('a.csv', io.BytesIO(b'x,y\n1,2\n' * 1000)), ('b.xlsx', io.BytesIO(b'PK' + bytes(500)))]
+    with zip_file(iter(members)) as output, zipfile.ZipFile(output) as archive:
+        assert archive.read('a.csv') == b'x,y\n1,2\n' * 1000
+        assert archive.getinfo('a.csv').compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo('b.xlsx').compress_type == zipfile.ZIP_STORED
+        for info in archive.infolist():
+            # The local header's extra field holds the zip64 sizes (header id 1)
+            output.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', output.read(4))
+            extra = output.read(name_length + extra_length)[name_length:]
+            assert struct.unpack('<H', extra[:2])[0] == 1
@@ -0,0 +1,94 @@
+"""Stage metrics and the progress they report"""
+import io
+import json
+
+import pytest
+
+import app
+import instrumentation
+from instrumentation import finish_run, metrics_frame, metrics_json, metrics_report, stage, stage_chunks, start_run
+from test_phone_engine import mixed_frame
+
+STAGE_KEYS = {'stage', 'seconds', 'rows', 'rows_per_s', 'calls', 'peak_mb', 'added_mb'}
+
+
+@pytest.fixture
+def reports(monkeypatch):
+    """Every progress report of a run, unthrottled"""
+    monkeypatch.setattr(instrumentation, 'PROGRESS_INTERVAL_S', 0)
+    calls = []
+    return calls, lambda percent, message: calls.append((percent, message))
+
+
+def test_progress_is_the_weighted_share_of_rows_done(reports):
+    calls, progress = reports
+    metrics = start_run(progress, {'read': 1, 'classify': 3}, total_rows=100)
+    with stage(metrics, 'read', 100, "Reading"):
+        pass
+    assert calls[-1] == (25, "Reading")
+
+    chunks = list(stage_chunks(metrics, 'classify', [list(range(25))] * 4, "Classifying"))
+    assert len(chunks) == 4
+    # Each chunk is a quarter of the rows, so it adds a quarter of classify's three quarters of the run
+    classifying = [percent for percent, message in calls if message == "Classifying"]
+    assert list(dict.fromkeys(classifying)) == [25, 43, 62, 81, 100]
+
+    finish_run(metrics, "Done")
+    assert calls[-1] == (100, "Done")
+    percents = [percent for percent, _ in calls]
+    assert percents == sorted(percents)
+
+
+def test_ticks_within_a_stage_and_unknown_row_counts(reports):
+    calls, progress = reports
+    metrics = start_run(progress, {'classify': 1, 'qa': 1})
+    with stage(metrics, 'classify', None, "Classifying") as tick:
+        tick(1, 4)
+        assert calls[-1][0] == 12
+        tick(3, 4)
+        assert calls[-1][0] == 37
+    assert calls[-1][0] == 50
+
+
+def test_progress_is_throttled_but_new_messages_go_through(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'PROGRESS_INTERVAL_S', 3600)
+    calls = []
+    metrics = start_run(lambda percent, message: calls.append(message), {'classify': 1}, total_rows=10)
+    with stage(metrics, 'classify', 10, "Classifying") as tick:
+        for done in range(10):
+            tick(done, 10)
+    assert calls == ["Classifying"]
+    finish_run(metrics, "Done")
+    assert calls == ["Classifying", "Done"]
+
+
+def test_metrics_report_keys_and_accumulated_passes(reports):
+    _, progress = reports
+    metrics = start_run(progress, {'read': 1, 'classify': 1}, total_rows=30)
+    list(stage_chunks(metrics, 'read', [[0] * 10] * 3))
+    with stage(metrics, 'classify', 30):
+        pass
+    finish_run(metrics, "Done")
+
+    report = metrics_report(metrics)
+    assert set(report) == {'timestamp', 'total_rows', 'total_s', 'peak_mb', 'stages'}
+    assert [entry['stage'] for entry in report['stages']] == ['read', 'classify']
+    assert all(set(entry) == STAGE_KEYS for entry in report['stages'])
+    read = report['stages'][0]
+    assert (read['rows'], read['calls']) == (30, 3)
+    assert json.loads(metrics_json(metrics)) == json.loads(json.dumps(report))
+    assert metrics_frame(metrics).columns.tolist() == ['Stage', 'Seconds', 'Rows', 'Rows/s', 'Peak MB', 'Added MB']
+
+
+def test_a_job_reports_every_stage_it_ran(reports):
+    calls, progress = reports
+    frame = mixed_frame(300, 1)
+    upload = io.BytesIO(frame.to_csv(index=False).encode('utf-8'))
+    upload.name = 'county.csv'
+    result = app.process_upload(upload, columns=list(frame.columns), total_rows=len(frame), progress=progress)
+    stages = {entry['stage']: entry for entry in metrics_report(result['metrics'])['stages']}
+    assert {'read', 'classify', 'qa'} <= set(stages)
+    assert set(stages) <= set(app.stage_weights) - {'write'}
+    assert stages['read']['rows'] == len(frame)
+    percents = [percent for percent, _ in calls]
+    assert percents == sorted(percents) and percents[-1] == 100
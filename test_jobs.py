@@ -0,0 +1,88 @@
+"""Background jobs picked back up after a rerun, a lost session or a reload"""
+import threading
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import jobs
+
+
+def page(task):
+    """A page that starts a job on a button, and otherwise shows the job named in its session or URL"""
+    import streamlit as st
+
+    from jobs import current_job, remember_job, show_job
+    from results import submit_run
+
+    job_id = current_job()
+    if st.button("Process"):
+        job_id = submit_run('county run', task, 'county.csv')
+        remember_job(job_id)
+    st.text(f"job={job_id}")
+    show_job(job_id, lambda result: st.text(f"result={result}"))
+
+
+@pytest.fixture
+def slow_task():
+    release = threading.Event()
+
+    def task(name, progress=None):
+        progress(50, f"Processing {name}...")
+        release.wait(10)
+        return f"{name} done"
+    return task, release
+
+
+def wait_for(job_id, status):
+    deadline = time.time() + 10
+    while jobs.job_status(job_id)['status'] != status:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def texts(at):
+    return [element.value for element in at.text]
+
+
+def test_a_job_survives_the_session_that_started_it(slow_task):
+    task, release = slow_task
+    first = AppTest.from_function(page, args=(task,)).run()
+    first.button[0].click().run()
+    job_id = first.query_params['job']
+    assert isinstance(job_id, str)
+    assert f"job={job_id}" in texts(first)
+    wait_for(job_id, 'running')
+
+    # A rerun in the same session does not start the job again
+    first.button[0].click().run()
+    assert f"job={job_id}" in texts(first)
+
+    # A new session (a reload, or a dropped connection) finds the job from the URL alone
+    reloaded = AppTest.from_function(page, args=(task,))
+    reloaded.query_params['job'] = job_id
+    reloaded.run()
+    assert f"job={job_id}" in texts(reloaded)
+    assert jobs.job_status(job_id)['message'] == "Processing county.csv..."
+
+    release.set()
+    wait_for(job_id, 'done')
+    reloaded.run()
+    assert "result=county.csv done" in texts(reloaded)
+
+
+def test_an_expired_job_is_forgotten():
+    at = AppTest.from_function(page, args=(None,))
+    at.query_params['job'] = 'not-a-job'
+    at.run()
+    assert "job=None" in texts(at)
+    assert 'job' not in at.query_params
+
+
+def test_finished_jobs_expire(monkeypatch):
+    job_id = jobs.submit_job(lambda progress=None: 'done')
+    wait_for(job_id, 'done')
+    assert jobs.job_result(job_id) == 'done'
+    monkeypatch.setattr(jobs, 'JOB_RESULT_TTL_S', -1)
+    jobs.submit_job(lambda progress=None: None)
+    assert jobs.job_status(job_id) is None
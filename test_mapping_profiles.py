@@ -0,0 +1,60 @@
+"""Saved column mappings of the flexible processor"""
+import pandas as pd
+import pytest
+
+import batch_process
+import mapping_profiles
+from mapping_profiles import delete_profile, header_fingerprint, load_profile, save_profile
+from test_phone_engine import mixed_frame
+
+
+@pytest.fixture(autouse=True)
+def mapping_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(mapping_profiles, 'MAPPING_DIR', str(tmp_path / 'mappings'))
+    return tmp_path / 'mappings'
+
+
+def test_saved_mapping_round_trips():
+    columns = list(mixed_frame(1, 1).columns)
+    column_mapping, phone_mapping = batch_process.suggested_mapping(columns)
+    assert load_profile(columns) is None
+
+    save_profile(columns, column_mapping, [tuple(pair) for pair in phone_mapping])
+    profile = load_profile(columns)
+    assert profile['columns'] == column_mapping
+    assert profile['phones'] == [list(pair) for pair in phone_mapping]
+    assert profile['header'] == columns
+    # The batch runner and the app pick it up for the same header
+    assert batch_process.default_mapping(columns) == (column_mapping, profile['phones'])
+
+    edited = dict(column_mapping, Email='Owner 1 Full Name')
+    save_profile(columns, edited, phone_mapping[:1])
+    assert load_profile(columns)['columns'] == edited
+    assert load_profile(columns)['phones'] == [list(phone_mapping[0])]
+
+    delete_profile(columns)
+    assert load_profile(columns) is None
+    delete_profile(columns)
+
+
+def test_headers_share_a_mapping_only_in_the_same_order():
+    columns = list(mixed_frame(1, 1).columns)
+    save_profile(columns, *batch_process.suggested_mapping(columns))
+    assert load_profile(list(reversed(columns))) is None
+    assert load_profile(columns[:-1]) is None
+    assert load_profile(pd.Index(columns)) is not None
+    assert header_fingerprint(columns) != header_fingerprint(list(reversed(columns)))
+
+
+def test_command_line_lists_and_shows_mappings(tmp_path, capsys):
+    frame = mixed_frame(5, 1)
+    path = tmp_path / 'county.xlsx'
+    frame.to_excel(path, index=False)
+    assert mapping_profiles.main([str(path)]) == 1
+
+    save_profile(frame.columns, *batch_process.suggested_mapping(list(frame.columns)))
+    capsys.readouterr()
+    assert mapping_profiles.main([str(path)]) == 0
+    assert '"phones"' in capsys.readouterr().out
+    assert mapping_profiles.main([]) == 0
+    assert "1 saved mapping(s)" in capsys.readouterr().out
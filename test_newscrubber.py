@@ -0,0 +1,206 @@
+"""Flexible-mapping processor (NEWSCRUBBER) jobs and their downloads"""
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+import batch_process
+import file_io
+import mapping_profiles
+import staging
+from file_io import excel_header, iter_excel_chunks, iter_sheets, read_table_file, table_export
+from mapping_profiles import save_profile
+from results import download_data
+from test_phone_engine import mixed_frame
+
+newscrubber = batch_process.load_newscrubber()
+
+
+def quiet_progress(percent, message):
+    pass
+
+
+def csv_upload(df, name='county.csv'):
+    upload = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+    upload.name = name
+    return upload
+
+
+@pytest.fixture(autouse=True)
+def saved_mappings(tmp_path, monkeypatch):
+    """No saved mappings but the ones a test saves"""
+    monkeypatch.setattr(mapping_profiles, 'MAPPING_DIR', str(tmp_path / 'mappings'))
+
+
+@pytest.fixture(params=[1, 2])
+def frame(request):
+    return mixed_frame(300, request.param)
+
+
+def mapped_job(upload, columns, **kwargs):
+    column_mapping, phone_mapping = batch_process.default_mapping(columns)
+    input_columns = newscrubber.mapped_input_columns(columns, column_mapping, phone_mapping)
+    return newscrubber.process_mapped_upload(
+        upload, column_mapping, phone_mapping, input_columns, progress=quiet_progress, **kwargs
+    )
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 70])
+def test_mapped_job_matches_processing_the_frame(frame, chunk_rows):
+    upload = csv_upload(frame)
+    result = mapped_job(upload, list(frame.columns), total_rows=len(frame), chunk_rows=chunk_rows)
+
+    column_mapping, phone_mapping = batch_process.default_mapping(list(frame.columns))
+    df = newscrubber.typed_input_flexible(read_table_file(upload), column_mapping, phone_mapping)
+    cleaned_df, discard_df, qa_summary, _, _ = newscrubber.process_data_with_mapping(
+        df, column_mapping, phone_mapping, progress=quiet_progress
+    )
+    assert len(result['cleaned_df']) > 0
+    pd.testing.assert_frame_equal(result['cleaned_df'], cleaned_df)
+    pd.testing.assert_frame_equal(result['discard_df'], discard_df)
+    pd.testing.assert_frame_equal(result['qa_summary'], qa_summary)
+    assert result['column_mapping'] == column_mapping
+
+
+def test_downloads_are_written_once_per_format(frame):
+    result = mapped_job(csv_upload(frame), list(frame.columns), total_rows=len(frame))
+    writes = []
+
+    def export():
+        writes.append(1)
+        return table_export(result['cleaned_df'], 'CSV')
+
+    data = download_data(result, ('cleaned', 'CSV'), export, len(result['cleaned_df']))
+    assert data() == data()
+    assert len(writes) == 1
+    assert pd.read_csv(io.BytesIO(data())).columns.tolist() == result['cleaned_df'].columns.tolist()
+
+
+def workbook(sheets):
+    upload = io.BytesIO()
+    with pd.ExcelWriter(upload) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    upload.seek(0)
+    upload.name = 'county.xlsx'
+    return upload
+
+
+@pytest.fixture
+def saved_places(tmp_path, monkeypatch):
+    monkeypatch.setattr(staging, 'STAGING_DIR', str(tmp_path / 'staging'))
+
+
+def sheet_by_itself(sheet_df):
+    column_mapping, phone_mapping = batch_process.default_mapping(list(sheet_df.columns))
+    df = newscrubber.typed_input_flexible(sheet_df, column_mapping, phone_mapping)
+    return newscrubber.process_data_with_mapping(df, column_mapping, phone_mapping, progress=quiet_progress)
+
+
+def renamed(df):
+    return df.rename(columns=lambda col: 'Owner ' + col)
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 40])
+def test_each_sheet_is_mapped_and_split_on_its_own(saved_places, chunk_rows):
+    north, south = mixed_frame(120, 1), renamed(mixed_frame(150, 2))
+    upload = workbook({'North': north, 'South Ranch': south})
+    # The second sheet's header differs from the first's; its mapping comes from its saved profile
+    column_mapping, phone_mapping = batch_process.default_mapping(list(north.columns))
+    south_mapping = (
+        {field: 'Owner ' + col if col else col for field, col in column_mapping.items()},
+        [['Owner ' + phone, 'Owner ' + kind] for phone, kind in phone_mapping]
+    )
+    save_profile(south.columns, *south_mapping)
+
+    result = newscrubber.process_mapped_sheets(
+        upload, column_mapping, phone_mapping, [0, 1], ['North', 'South Ranch'], total_rows=270,
+        chunk_rows=chunk_rows, progress=quiet_progress
+    )
+    assert result['sheets']['Mapping'].tolist() == ['This upload', 'Saved']
+
+    # Each sheet by itself, read the way the run read it
+    if chunk_rows:
+        sheets = [pd.concat(iter_excel_chunks(upload, chunk_size=chunk_rows, sheet_name=name), ignore_index=True)
+                  for name in ['North', 'South Ranch']]
+    else:
+        sheets = iter_sheets(upload, [0, 1])
+    for sheet_df, (name, cleaned, discard, previous, _, qa_summary, _) in zip(
+        sheets, newscrubber.mapped_sheet_outputs(result)
+    ):
+        if name == 'South Ranch':
+            column_mapping, phone_mapping = south_mapping
+            sheet_df = newscrubber.typed_input_flexible(sheet_df, column_mapping, phone_mapping)
+            expected = newscrubber.process_data_with_mapping(
+                sheet_df, column_mapping, phone_mapping, progress=quiet_progress
+            )
+        else:
+            expected = sheet_by_itself(sheet_df)
+        assert len(cleaned) > 0
+        pd.testing.assert_frame_equal(cleaned.reset_index(drop=True), expected[0].reset_index(drop=True))
+        pd.testing.assert_frame_equal(discard.reset_index(drop=True), expected[1].reset_index(drop=True))
+        pd.testing.assert_frame_equal(qa_summary, expected[2])
+
+    results = result['qa_summary'].set_index('QA CHECK')['RESULT']
+    assert results['Total Contacts in Original File'] == '270'
+    assert results['Contact Count Verification'] == '✅ MATCH'
+
+
+def test_sheet_without_the_mapped_columns_is_reported(saved_places):
+    north = mixed_frame(30, 1)
+    upload = workbook({'North': north, 'Other': north.drop(columns='APN')})
+    column_mapping, phone_mapping = batch_process.default_mapping(list(north.columns))
+    with pytest.raises(ValueError, match="'APN' not found in sheet 'Other'"):
+        newscrubber.process_mapped_sheets(
+            upload, column_mapping, phone_mapping, [0, 1], ['North', 'Other'], progress=quiet_progress
+        )
+
+
+def test_sheet_zip_has_a_set_of_files_per_sheet(saved_places):
+    north = mixed_frame(60, 3)
+    upload = workbook({'North': north, 'South Ranch': mixed_frame(60, 4)})
+    result = newscrubber.process_mapped_sheets(
+        upload, *batch_process.default_mapping(list(north.columns)), [0, 1], ['North', 'South Ranch'],
+        progress=quiet_progress
+    )
+    with zipfile.ZipFile(newscrubber.mapped_sheet_zip(result, 'CSV')) as archive:
+        names = archive.namelist()
+    assert any(name.startswith('Combined') for name in names)
+    assert any(name.startswith('North') for name in names)
+    assert any(name.startswith('SouthRanch') for name in names)
+
+
+def test_wide_uploads_read_only_the_mapped_columns(saved_places, monkeypatch):
+    frame = mixed_frame(200, 5)
+    wide = pd.concat([frame, pd.DataFrame({f'Extra {i}': range(len(frame)) for i in range(60)})], axis=1)
+    upload = workbook({'Sheet1': wide})
+
+    # The mapping step sees the header and a sample, without parsing (or staging) the workbook
+    header, total_rows = excel_header(upload, rows=10)
+    assert header.columns.tolist() == wide.columns.tolist() and len(header) == 10
+    assert total_rows == len(wide)
+
+    read = []
+    read_columns = file_io._read_excel_columns
+
+    def counted(source, columns=None, rows=None):
+        read.append(columns)
+        return read_columns(source, columns, rows)
+
+    monkeypatch.setattr(file_io, '_read_excel_columns', counted)
+    columns = header.columns.tolist()
+    result = mapped_job(upload, columns, total_rows=total_rows)
+    column_mapping, phone_mapping = batch_process.default_mapping(columns)
+    projected = newscrubber.mapped_input_columns(columns, column_mapping, phone_mapping)
+    assert read == [projected]
+    assert not any(col.startswith('Extra') for col in projected)
+
+    upload.seek(0)
+    df = newscrubber.typed_input_flexible(pd.read_excel(upload), column_mapping, phone_mapping)
+    cleaned_df, discard_df, qa_summary, _, _ = newscrubber.process_data_with_mapping(
+        df, column_mapping, phone_mapping, progress=quiet_progress
+    )
+    pd.testing.assert_frame_equal(result['cleaned_df'], cleaned_df)
+    pd.testing.assert_frame_equal(result['discard_df'], discard_df)
+    pd.testing.assert_frame_equal(result['qa_summary'], qa_summary)
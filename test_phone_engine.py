@@ -0,0 +1,144 @@
+"""Columnar phone engine against the row-by-row helpers it replaced (app.py keeps them as the reference)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import batch_process
+from phone_engine import classify_phones, combine_phone_counts, normalize_phone_column, sum_phone_counts
+
+# Phone cells as Excel and CSV exports hold them: floats, ints, formatted text, junk and every kind of missing
+PHONE_VALUES = [
+    5551234567.0, 15551234567.0, 25551234567.0, 555123456.0, 5551234567, 15551234567,
+    '5551234567', '(555) 123-4567', '1-555-123-4567', '+1 555 123 4567', '2-555-123-4567', '555-1234', 'n/a',
+    '', None, np.nan, -5551234567.0, 5551234567.9, True,
+]
+TYPE_VALUES = ['Mobile', ' VOIP ', 'mobile', 'Landline', 'landline ', 'Pager', 'SpecialService', 'Unknown', '', None,
+               np.nan, 1]
+
+
+def nones(frame):
+    """Frame with every missing value as None, so NaN and None compare equal"""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None)
+
+
+def mixed_frame(rows, seed):
+    """LandPortal-style frame whose phone and line-type cells mix types, as read from real exports"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for phone_col, type_col in app.phone_columns:
+        data[phone_col] = [PHONE_VALUES[i] for i in rng.integers(len(PHONE_VALUES), size=rows)]
+        data[type_col] = [TYPE_VALUES[i] for i in rng.integers(len(TYPE_VALUES), size=rows)]
+    df = pd.DataFrame(data, dtype=object)
+    df['Owner 1 First Name'] = [f'First{i}' if i % 7 else None for i in range(rows)]
+    df['Owner 1 Last Name'] = [f'Last{i % 50}' if i % 7 else None for i in range(rows)]
+    df['Owner 1 Full Name'] = [f'First{i} Last{i % 50}' for i in range(rows)]
+    df['APN'] = [f'{i:05d}' if i % 3 else None for i in range(rows)]
+    df['Parcel State'] = ['TX' if i % 4 else 'OK' for i in range(rows)]
+    df['Parcel County'] = ['Travis' if i % 5 else 'Bexar' for i in range(rows)]
+    df['Lot Acres'] = [float(i % 13) for i in range(rows)]
+    return df
+
+
+@pytest.fixture(params=[1, 2, 3])
+def frame(request):
+    return mixed_frame(400, request.param)
+
+
+def test_normalize_phone_column_matches_normalize_phone(frame):
+    for phone_col, _ in app.phone_columns:
+        expected = [app.normalize_phone(value) for value in frame[phone_col]]
+        assert list(normalize_phone_column(frame[phone_col])) == expected
+
+
+def test_normalize_phone_column_typed_columns():
+    values = pd.Series([5551234567.0, 15551234567.0, np.nan, 555.0, 25551234567.0])
+    expected = [app.normalize_phone(value) for value in values]
+    assert list(normalize_phone_column(values)) == expected
+    assert list(normalize_phone_column(app.typed_input(pd.DataFrame({'Phone': values}))['Phone'])) == expected
+
+
+@pytest.mark.parametrize('typed', [False, True])
+def test_classify_phones_matches_row_helpers(frame, typed):
+    df = app.typed_input(frame) if typed else frame
+    classified = classify_phones(df, app.phone_columns, app.allowed_types, app.landline_types)
+    rows = [row for _, row in frame.iterrows()]
+
+    assert classified['has_mobile'].tolist() == [app.has_valid_phones(row) for row in rows]
+    pd.testing.assert_frame_equal(
+        nones(classified['phones']), nones(pd.DataFrame([app.extract_valid_phones(row) for row in rows], index=df.index))
+    )
+    pd.testing.assert_frame_equal(
+        nones(classified['landlines']),
+        nones(pd.DataFrame([app.extract_landlines_with_types(row) for row in rows], index=df.index))
+    )
+
+
+def test_classify_phones_skips_missing_columns(frame):
+    df = frame.drop(columns=['Alt Phone 2', 'Alt Phone 4 (Line Type)'])
+    classified = classify_phones(df, app.phone_columns, app.allowed_types, app.landline_types)
+    rows = [row for _, row in df.iterrows()]
+    assert classified['has_mobile'].tolist() == [app.has_valid_phones(row) for row in rows]
+    pd.testing.assert_frame_equal(
+        nones(classified['phones']), nones(pd.DataFrame([app.extract_valid_phones(row) for row in rows], index=df.index))
+    )
+
+
+def discard_type_counts(landlines, phone_types):
+    """Contacts of a discard layout holding a phone of one of phone_types, and those phones, one row at a time"""
+    contacts = phones = 0
+    for _, row in landlines.iterrows():
+        hits = sum(
+            1 for i in range(1, 6)
+            if pd.notnull(row[f'Phone{i}']) and str(row[f'Phone{i}_Type']).strip().lower() in phone_types
+        )
+        contacts += hits > 0
+        phones += hits
+    return contacts, phones
+
+
+def test_discard_counters_with_overlapping_types(frame):
+    # VoIP is both accepted and a discard type, and the suppressed number leaves VoIP phones in discard rows
+    allowed_types, landline_types = ['mobile', 'voip'], ['landline', 'voip']
+    suppressed = np.array([5551234567], dtype=np.int64)
+    classified = classify_phones(frame, app.phone_columns, allowed_types, landline_types, suppressed=suppressed)
+    discards = classified['landlines'][~classified['has_mobile']]
+    contacts, phones = discard_type_counts(discards, allowed_types)
+
+    assert phones > 0
+    assert (classified['stats']['discard_mobile_contacts'], classified['stats']['discard_mobile_phones']) == \
+        (contacts, phones)
+
+
+def test_fallback_counters_are_the_classification_pass(frame):
+    newscrubber = batch_process.load_newscrubber()
+    pairs = [list(pair) for pair in app.phone_columns]
+    run = app.processing_run(lambda percent, message: None, len(frame))
+    _, _, phone_counts, _ = newscrubber.split_phone_rows_flexible(frame, {}, pairs, run)
+    assert newscrubber.count_phone_stats_flexible(frame, pairs) == sum_phone_counts(phone_counts)
+
+
+def test_classify_phones_without_phone_columns():
+    stats = classify_phones(pd.DataFrame(index=range(3)), app.phone_columns, app.allowed_types, app.landline_types)['stats']
+    assert stats == {
+        'total_rows': 3, 'total_phones': 0, 'phone_type_counts': {},
+        'discard_mobile_contacts': 0, 'discard_mobile_phones': 0,
+    }
+
+
+def test_phone_counts_of_any_rows_are_their_classification(frame):
+    suppressed = np.array([5551234567], dtype=np.int64)
+    counts = classify_phones(
+        frame, app.phone_columns, app.allowed_types, app.landline_types, suppressed=suppressed
+    )['counts']
+    rows = frame.index[frame['Parcel State'] == 'OK']
+    expected = classify_phones(
+        frame.loc[rows], app.phone_columns, app.allowed_types, app.landline_types, suppressed=suppressed
+    )['stats']
+    assert sum_phone_counts(counts.loc[rows]) == expected
+    halves = [
+        classify_phones(part, app.phone_columns, app.allowed_types, app.landline_types, suppressed=suppressed)['counts']
+        for part in (frame.iloc[:150], frame.iloc[150:])
+    ]
+    assert sum_phone_counts(combine_phone_counts(halves)) == sum_phone_counts(counts)
@@ -0,0 +1,121 @@
+"""Vectorized and cached scrub verdicts against the pattern-by-pattern check, and the saved verdict arrays"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import scrub_engine
+import verdict_cache
+from scrub_engine import get_scrub_patterns, needs_scrub, scrub_mask
+
+CUSTOM_KEYWORDS = "A&M\nco-op\nSt. Mary's\nc++ holdings\n(trust)\n$tar ranch\nfoo|bar\nsmith [ltd]\n  \nJ.R. & Sons"
+
+NAME_PARTS = [
+    'John', 'SMITH', 'Gas', 'gas co', 'Gas Company', 'Electric Co-op', 'Rural Co-Op', 'power & light', 'Power&Light',
+    'City of', 'county', 'School District', 'Baptist', 'church', 'Churches', 'a&m', 'A & M', 'Co-op', 'coop',
+    "st. mary's", 'St Marys', 'C++ Holdings', 'c+ holdings', '(Trust)', 'trust', '$tar Ranch', 'star ranch',
+    'foo|bar', 'foo', 'Smith [LTD]', 'smith ltd', 'j.r. & sons', 'JR & Sons', 'Utility', 'utilities co', 'Devl',
+    'industrial', '', '-', '&', 'Ünïcode Church', 'gasoline', 'UTILITY-EASEMENT',
+]
+
+
+def owner_names(rows, seed):
+    rng = np.random.default_rng(seed)
+    names = [
+        ' '.join(NAME_PARTS[i] for i in rng.integers(len(NAME_PARTS), size=rng.integers(1, 4)))
+        for _ in range(rows)
+    ]
+    for i in rng.integers(rows, size=rows // 10):
+        names[i] = [None, np.nan, 12345, 7.5][i % 4]
+    return pd.Series(names, dtype=object, index=pd.RangeIndex(100, 100 + rows))
+
+
+def by_pattern(owner_name, patterns):
+    """needs_scrub before the patterns were compiled into one regex: each pattern searched in turn"""
+    if pd.isna(owner_name):
+        return False
+    return any(re.search(pattern, str(owner_name).lower()) for pattern in patterns)
+
+
+@pytest.mark.parametrize('keywords', [None, CUSTOM_KEYWORDS])
+@pytest.mark.parametrize('seed', [1, 2])
+def test_scrub_mask_matches_each_pattern_in_turn(keywords, seed):
+    patterns = get_scrub_patterns(keywords)
+    names = owner_names(2000, seed)
+    expected = [by_pattern(name, patterns) for name in names]
+    mask = scrub_mask(names, patterns)
+    assert mask.index.equals(names.index)
+    assert mask.tolist() == expected
+    assert [needs_scrub(name, patterns) for name in names] == expected
+    assert 0 < sum(expected) < len(expected)
+
+
+def test_custom_keywords_match_literally():
+    patterns = get_scrub_patterns(CUSTOM_KEYWORDS)
+    names = pd.Series(['A&M Ranch', 'c++ holdings', 'cx holdings', 'foo', 'foo|bar farms', 'St. Mary’s', "st. mary's",
+                       'stx mary', 'Rural co-op', 'rural coop', 'J.R. & Sons Farms', 'jr & sons'])
+    assert scrub_mask(names, patterns).tolist() == [
+        True, True, False, False, True, False, True, False, True, False, True, False
+    ]
+
+
+@pytest.mark.parametrize('keywords', [None, CUSTOM_KEYWORDS])
+def test_cached_verdicts_match_fresh_ones(keywords, tmp_path, monkeypatch):
+    monkeypatch.setattr(verdict_cache, 'VERDICT_DIR', str(tmp_path))
+    patterns = get_scrub_patterns(keywords)
+    first, second = owner_names(1500, 3), owner_names(1500, 4)
+
+    assert scrub_mask(first, patterns, cached=True).tolist() == scrub_mask(first, patterns).tolist()
+    saved = verdict_cache.load_verdicts(verdict_cache.pattern_set_key(patterns))
+    assert len(saved) > 0
+
+    # Names seen in the first file come from the saved verdicts, the others are matched and added
+    matched = []
+    original = scrub_engine.cached_verdicts
+
+    def counting(names, patterns, match, directory=None):
+        return original(names, patterns, lambda new: matched.append(len(new)) or match(new), directory)
+
+    monkeypatch.setattr(scrub_engine, 'cached_verdicts', counting)
+    assert scrub_mask(second, patterns, cached=True).tolist() == [by_pattern(name, patterns) for name in second]
+    distinct = len({str(name).lower() for name in second.dropna()})
+    assert 0 < sum(matched) < distinct
+    assert scrub_mask(second, patterns, cached=True).tolist() == scrub_mask(second, patterns).tolist()
+    assert sum(matched) < distinct
+
+    # Another pattern set keeps verdicts of its own
+    other = get_scrub_patterns('ranch')
+    assert scrub_mask(first, other, cached=True).tolist() == [by_pattern(name, other) for name in first]
+
+
+def test_cached_chunked_scrub_matches_the_uncached_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(verdict_cache, 'VERDICT_DIR', str(tmp_path))
+    patterns = get_scrub_patterns(CUSTOM_KEYWORDS)
+    df = pd.DataFrame({'Owner': owner_names(3000, 5), 'APN': [f'{i:05d}' for i in range(3000)]},
+                      index=pd.RangeIndex(100, 3100))
+
+    def chunks():
+        return (df.iloc[start:start + 700] for start in range(0, len(df), 700))
+
+    expected = scrub_engine.scrub_chunks(chunks(), 'Owner', patterns)
+    # The second run reads every verdict from the array the first one saved
+    for _ in range(2):
+        cleaned_df, removed_names, total_rows = scrub_engine.scrub_chunks(chunks(), 'Owner', patterns, cached=True)
+        pd.testing.assert_frame_equal(cleaned_df, expected[0])
+        assert removed_names == expected[1]
+        assert total_rows == expected[2] == len(df)
+
+
+def test_verdict_command_line_lists_each_pattern_set(tmp_path, capsys):
+    names = np.array(['gas co', 'john smith', 'city of austin'], dtype=object)
+    for keywords in [None, 'ranch']:
+        patterns = get_scrub_patterns(keywords)
+        verdict_cache.cached_verdicts(names, patterns, lambda new: scrub_mask(pd.Series(new), patterns).to_numpy(),
+                                      str(tmp_path))
+
+    assert verdict_cache.main(['--dir', str(tmp_path)]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert f"{verdict_cache.pattern_set_key(get_scrub_patterns(None))}: 3 names, 2 scrubbed" in lines
+    assert f"{verdict_cache.pattern_set_key(get_scrub_patterns('ranch'))}: 3 names, 2 scrubbed" in lines
+    assert lines[-1] == f"2 pattern set(s) in {tmp_path}"
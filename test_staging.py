@@ -0,0 +1,27 @@
+"""Staged Arrow files and their eviction"""
+import os
+
+import staging
+
+
+def test_eviction_skips_files_removed_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(staging, 'STAGING_DIR', str(tmp_path))
+    monkeypatch.setattr(staging, 'STAGING_MAX_BYTES', 150)
+    paths = []
+    for i, name in enumerate(['old.arrow', 'newer.arrow', 'kept.arrow']):
+        path = tmp_path / name
+        path.write_bytes(bytes(100))
+        os.utime(path, (1000 + i, 1000 + i))
+        paths.append(str(path))
+    listing = os.listdir
+
+    def listdir(directory):
+        # Listed here, then evicted by another process before it is looked at
+        return listing(directory) + ['gone.arrow']
+
+    monkeypatch.setattr(staging.os, 'listdir', listdir)
+    staging._evict(paths[2])
+    assert [os.path.exists(path) for path in paths] == [False, False, True]
+
+    os.remove(paths[2])
+    staging._evict(paths[2])
@@ -0,0 +1,76 @@
+"""Workbooks streamed in chunks against reading them whole with pd.read_excel"""
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from file_io import estimate_excel_rows, iter_excel_chunks, preview_excel
+from test_phone_engine import nones
+
+
+def workbook(name='county.xlsx', trailing_blanks=2):
+    """A sheet as exports come: a blank and a repeated header, blank rows between and after the data,
+    NA strings, whole-number floats and gaps"""
+    book = Workbook()
+    sheet = book.active
+    sheet.append(['Owner', None, 'Phone', 'Phone', 'Phone Type', 'APN', 'Acres', 'Note'])
+    for i in range(40):
+        if i % 9 == 4:
+            sheet.append([])
+            continue
+        sheet.append([
+            f'Owner {i}' if i % 5 else None,
+            i if i % 3 else None,
+            5551230000 + i,
+            float(5551240000 + i) if i % 4 else None,
+            ['Mobile', 'Landline', 'VoIP', 'N/A'][i % 4],
+            f'{i:05d}' if i % 2 else f'R-{i}',
+            i / 4 if i % 6 else None,
+            ['', 'NULL', 'ok', 'n/a', 'late'][i % 5],
+        ])
+    for _ in range(trailing_blanks):
+        sheet.append([None] * 8)
+    upload = io.BytesIO()
+    book.save(upload)
+    upload.seek(0)
+    upload.name = name
+    return upload
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 50])
+@pytest.mark.parametrize('name', ['county.xlsx', 'county.xls'])
+def test_chunks_match_reading_the_whole_sheet(chunk_size, name):
+    # pandas picks the reader from the bytes, so the .xls name takes the read-whole-then-slice path
+    upload = workbook(name)
+    whole = pd.read_excel(upload)
+    upload.seek(0)
+    chunks = list(iter_excel_chunks(upload, chunk_size=chunk_size))
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    streamed = pd.concat(chunks)
+    assert streamed.index.equals(pd.RangeIndex(len(whole)))
+    # Blank rows between data rows are kept, the trailing ones dropped
+    assert len(whole) == 40
+    pd.testing.assert_frame_equal(nones(streamed), nones(whole), check_dtype=False)
+
+
+@pytest.mark.parametrize('name', ['county.xlsx', 'county.xls'])
+def test_chunks_of_some_columns(name):
+    upload = workbook(name)
+    whole = pd.read_excel(upload)
+    upload.seek(0)
+    columns = ['Phone.1', 'APN', 'Owner']
+    streamed = pd.concat(iter_excel_chunks(upload, chunk_size=6, columns=columns))
+    # Columns keep their sheet order
+    assert streamed.columns.tolist() == ['Owner', 'Phone.1', 'APN']
+    pd.testing.assert_frame_equal(nones(streamed), nones(whole[streamed.columns]), check_dtype=False)
+
+
+def test_preview_and_row_estimate():
+    upload = workbook()
+    whole = pd.read_excel(upload)
+    upload.seek(0)
+    pd.testing.assert_frame_equal(nones(preview_excel(upload, rows=5)), nones(whole.head(5)), check_dtype=False)
+    # The sheet dimensions count the trailing blank rows too
+    assert estimate_excel_rows(upload) == 42
+    assert estimate_excel_rows(workbook('county.xls')) is None
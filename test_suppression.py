@@ -0,0 +1,73 @@
+"""Do-not-contact suppression against a row-by-row reference that skips numbers on the list"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import suppression
+from phone_engine import classify_phones
+from test_phone_engine import nones
+
+
+def numbered_frame(rows, seed):
+    """LandPortal-style frame drawing from a small pool of numbers, written as floats or formatted text"""
+    rng = np.random.default_rng(seed)
+    types = ['Mobile', 'VoIP', 'Landline', 'Pager', None]
+    data = {}
+    for phone_col, type_col in app.phone_columns:
+        numbers = 2105550100 + rng.integers(40, size=rows)
+        data[phone_col] = [
+            float(number) if i % 3 == 0 else f'({str(number)[:3]}) {str(number)[3:6]}-{str(number)[6:]}' if i % 3 == 1
+            else None
+            for i, number in zip(rng.integers(3, size=rows), numbers)
+        ]
+        data[type_col] = [types[i] for i in rng.integers(len(types), size=rows)]
+    return pd.DataFrame(data, dtype=object)
+
+
+def suppressed_picks(row, on_list):
+    """extract_valid_phones of one row, skipping numbers on the list; also how many it skipped"""
+    picks, skipped = [], 0
+    for phone_col, type_col in app.phone_columns:
+        phone = app.normalize_phone(row[phone_col])
+        phone_type = str(row[type_col]).strip().lower() if pd.notnull(row[type_col]) else ''
+        if phone and phone_type in app.allowed_types:
+            if int(phone) in on_list:
+                skipped += 1
+            elif len(picks) < 3:
+                picks.append(phone)
+    return picks, skipped
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_suppressed_numbers_are_skipped_before_the_picks(seed):
+    df = numbered_frame(300, seed)
+    on_list = {2105550100 + i for i in range(0, 40, 3)}
+    classified = classify_phones(
+        df, app.phone_columns, app.allowed_types, app.landline_types,
+        suppressed=np.array(sorted(on_list), dtype=np.int64)
+    )
+
+    picks = [suppressed_picks(row, on_list) for _, row in df.iterrows()]
+    expected = pd.DataFrame([phones + [None] * (3 - len(phones)) for phones, _ in picks],
+                            index=df.index, columns=['Phone1', 'Phone2', 'Phone3'])
+    pd.testing.assert_frame_equal(nones(classified['phones']), nones(expected))
+    assert classified['has_mobile'].tolist() == [bool(phones) for phones, _ in picks]
+    assert classified['stats']['suppressed_phones'] == sum(skipped for _, skipped in picks)
+    assert classified['stats']['suppressed_contacts'] == sum(1 for phones, skipped in picks if skipped and not phones)
+
+    reasons = classified['missing']['Reason']
+    suppressed_rows = [i for i, (_, skipped) in enumerate(picks) if skipped]
+    assert set(reasons.index[reasons.str.startswith('Suppressed')]) == set(suppressed_rows)
+
+
+def test_load_suppression_parses_every_cell(tmp_path, monkeypatch):
+    monkeypatch.setattr(suppression, 'SUPPRESSION_DIR', str(tmp_path / 'saved'))
+    source = tmp_path / 'dnc.csv'
+    source.write_text('phone,notes\n(210) 555-0100,x\n1-210-555-0101;210.555.0102\n555-0100\n', encoding='utf-8')
+
+    expected = np.array([2105550100, 2105550101, 2105550102], dtype=np.int64)
+    np.testing.assert_array_equal(suppression.load_suppression(str(source)), expected)
+    # Seen before: mapped in from the saved array
+    np.testing.assert_array_equal(suppression.load_suppression(str(source)), expected)
+    assert len(list((tmp_path / 'saved').iterdir())) == 1
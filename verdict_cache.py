@@ -0,0 +1,100 @@
+"""Scrub verdicts of owner names, saved on disk per pattern set.
+
+Land lists from the same region repeat the same entity owners, so every
+owner name matched against a pattern set is remembered: its 64-bit hash
+and whether it is scrubbed go into a sorted array saved as .npy, keyed by
+a hash of the patterns. Later files map the array in and only match the
+names it has not seen. Changing the keywords starts a new array.
+
+    python verdict_cache.py
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from dedup_index import key_hashes
+
+# ---------- CONFIGURATION ----------
+VERDICT_DIR = os.environ.get('LANDLIST_VERDICT_DIR') or \
+    os.path.join(os.path.expanduser('~'), '.landlist', 'verdicts')
+
+_verdict_lock = threading.Lock()
+
+# ---------- SAVED ARRAYS ----------
+def pattern_set_key(patterns):
+    """Hash of a pattern set; verdicts are only shared between runs with the same patterns"""
+    return hashlib.sha256('\n'.join(patterns).encode('utf-8')).hexdigest()[:32]
+
+def _saved_path(key, directory=None):
+    return os.path.join(directory or VERDICT_DIR, f"{key}.npy")
+
+def load_verdicts(key, directory=None):
+    """Saved (name hash, verdict) rows of a pattern set, sorted by hash and memory-mapped"""
+    path = _saved_path(key, directory)
+    if not os.path.exists(path):
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.load(path, mmap_mode='r')
+
+def _save_verdicts(key, saved, hashes, verdicts, directory=None):
+    """Merge new (hash, verdict) rows into a pattern set's array and replace it on disk"""
+    directory = directory or VERDICT_DIR
+    rows = np.concatenate([saved, np.column_stack([hashes, verdicts.astype(np.int64)])])
+    rows = rows[np.argsort(rows[:, 0], kind='stable')]
+    with _verdict_lock:
+        os.makedirs(directory, exist_ok=True)
+        # Write under a temporary name so readers never see a half-written file
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as output:
+            np.save(output, rows)
+        os.replace(temp_path, _saved_path(key, directory))
+
+def cached_verdicts(names, patterns, match, directory=None):
+    """Verdict of each distinct name: from the saved array where known, else match(names) for the rest.
+
+    names are the lowercased strings the patterns run on; the newly matched
+    ones are added to the saved array. Two runs adding at the same moment
+    may drop each other's additions, which only costs a rematch later.
+    """
+    verdicts = np.zeros(len(names), dtype=bool)
+    if not len(names):
+        return verdicts
+
+    key = pattern_set_key(patterns)
+    saved = load_verdicts(key, directory)
+    hashes = key_hashes(names)
+    # Probes are looked up in sorted order, so the search walks the map forwards
+    order = np.argsort(hashes)
+    positions = np.searchsorted(saved[:, 0], hashes[order])
+    found = np.zeros(len(names), dtype=bool)
+    hit = positions < len(saved)
+    hit[hit] = saved[positions[hit], 0] == hashes[order][hit]
+    found[order[hit]] = True
+    verdicts[order[hit]] = saved[positions[hit], 1].astype(bool)
+
+    new = np.flatnonzero(~found)
+    if len(new):
+        verdicts[new] = match(names[new])
+        _save_verdicts(key, saved, hashes[new], verdicts[new], directory)
+    return verdicts
+
+# ---------- COMMAND LINE ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the saved owner-name scrub verdicts")
+    parser.add_argument('--dir', default=None, help=f"Verdict directory (default: {VERDICT_DIR})")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or VERDICT_DIR
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.npy')) if os.path.isdir(directory) else []
+    for name in names:
+        rows = np.load(os.path.join(directory, name), mmap_mode='r')
+        print(f"{name[:-4]}: {len(rows):,} names, {int(rows[:, 1].sum()):,} scrubbed")
+    print(f"{len(names)} pattern set(s) in {directory}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())